@@ -1,6 +1,20 @@
--- Create holdings table
+-- Full schema for a fresh database. Existing databases are upgraded with the
+-- versioned migrations in supabase/migrations/ instead.
+
+-- Create portfolios table
+CREATE TABLE IF NOT EXISTS portfolios (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    name TEXT NOT NULL,
+    tenant_id TEXT NOT NULL DEFAULT 'default',  -- Owner, API keys map to tenants
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_portfolios_tenant ON portfolios(tenant_id);
+
+-- Create holdings table (one row per stock per portfolio)
 CREATE TABLE IF NOT EXISTS holdings (
-    isin TEXT PRIMARY KEY,
+    portfolio_id UUID NOT NULL REFERENCES portfolios(id) ON DELETE CASCADE,
+    isin TEXT NOT NULL,
     stock_name TEXT NOT NULL,
     quantity INTEGER NOT NULL,
     average_buy_price NUMERIC NOT NULL,
@@ -8,18 +22,130 @@ CREATE TABLE IF NOT EXISTS holdings (
     date_of_exit TEXT,
     target NUMERIC,
     stop_loss NUMERIC,
+    basis_date DATE DEFAULT CURRENT_DATE,  -- Date quantity and cost basis refer to, later corporate actions restate them
     created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    PRIMARY KEY (portfolio_id, isin)
+);
+
+-- The primary key serves lookups by portfolio_id
+CREATE INDEX IF NOT EXISTS idx_holdings_ticker ON holdings(ticker);
+-- Auto-discovery only looks at holdings without a ticker
+CREATE INDEX IF NOT EXISTS idx_holdings_missing_ticker ON holdings(portfolio_id) WHERE ticker IS NULL;
+
+-- Create quotes table (latest market data, one row per ticker, shared by every portfolio)
+CREATE TABLE IF NOT EXISTS quotes (
+    ticker TEXT PRIMARY KEY,
+    price NUMERIC,
+    day_change_amount NUMERIC,
+    day_change_percent NUMERIC,
     updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
 );
 
--- Create index on stock_name for faster searches
-CREATE INDEX IF NOT EXISTS idx_holdings_stock_name ON holdings(stock_name);
+-- Create corporate actions table (splits, bonuses and dividends per ticker)
+CREATE TABLE IF NOT EXISTS corporate_actions (
+    ticker TEXT NOT NULL,
+    ex_date DATE NOT NULL,
+    action TEXT NOT NULL CHECK (action IN ('split', 'bonus', 'dividend')),
+    ratio NUMERIC,   -- Shares held after the action per share before it (splits, bonuses)
+    amount NUMERIC,  -- Dividend per share as paid
+    PRIMARY KEY (ticker, ex_date, action)
+);
+
+-- Create transactions table (buy, sell and dividend ledger per portfolio)
+CREATE TABLE IF NOT EXISTS transactions (
+    id BIGINT GENERATED ALWAYS AS IDENTITY PRIMARY KEY,
+    portfolio_id UUID NOT NULL REFERENCES portfolios(id) ON DELETE CASCADE,
+    isin TEXT NOT NULL,
+    stock_name TEXT,
+    ticker TEXT,
+    type TEXT NOT NULL CHECK (type IN ('buy', 'sell', 'dividend')),
+    trade_date DATE NOT NULL,
+    quantity NUMERIC,
+    price NUMERIC,
+    fees NUMERIC DEFAULT 0,
+    amount NUMERIC,  -- Dividend received in total
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_transactions_portfolio ON transactions(portfolio_id, isin);
+
+-- Create position snapshots table (ledger state per ISIN, only later transactions are folded on rebuild)
+CREATE TABLE IF NOT EXISTS position_snapshots (
+    portfolio_id UUID NOT NULL REFERENCES portfolios(id) ON DELETE CASCADE,
+    isin TEXT NOT NULL,
+    stock_name TEXT,
+    ticker TEXT,
+    quantity NUMERIC,
+    lots JSONB,  -- Open FIFO lots: [[quantity, cost per share]], oldest first
+    weighted_cost NUMERIC,
+    realized_fifo NUMERIC,
+    realized_weighted NUMERIC,
+    dividends NUMERIC,
+    last_id BIGINT,  -- Highest transaction id folded in
+    last_date DATE,  -- Latest trade date folded in
+    split_factor NUMERIC DEFAULT 1,  -- Product of the splits and bonuses folded in
+    PRIMARY KEY (portfolio_id, isin)
+);
+
+-- Create daily bars table (adjusted closes for risk analytics)
+CREATE TABLE IF NOT EXISTS daily_bars (
+    ticker TEXT NOT NULL,
+    date DATE NOT NULL,
+    close NUMERIC NOT NULL,
+    PRIMARY KEY (ticker, date)
+);
 
 -- Enable Row Level Security (RLS)
+ALTER TABLE portfolios ENABLE ROW LEVEL SECURITY;
 ALTER TABLE holdings ENABLE ROW LEVEL SECURITY;
+ALTER TABLE quotes ENABLE ROW LEVEL SECURITY;
+ALTER TABLE corporate_actions ENABLE ROW LEVEL SECURITY;
+ALTER TABLE transactions ENABLE ROW LEVEL SECURITY;
+ALTER TABLE position_snapshots ENABLE ROW LEVEL SECURITY;
+ALTER TABLE daily_bars ENABLE ROW LEVEL SECURITY;
 
 -- Create policy to allow all operations (you can restrict this later)
+CREATE POLICY "Enable all access for authenticated users" ON portfolios
+    FOR ALL
+    USING (true)
+    WITH CHECK (true);
+
 CREATE POLICY "Enable all access for authenticated users" ON holdings
     FOR ALL
     USING (true)
     WITH CHECK (true);
+
+CREATE POLICY "Enable all access for authenticated users" ON quotes
+    FOR ALL
+    USING (true)
+    WITH CHECK (true);
+
+CREATE POLICY "Enable all access for authenticated users" ON corporate_actions
+    FOR ALL
+    USING (true)
+    WITH CHECK (true);
+
+CREATE POLICY "Enable all access for authenticated users" ON transactions
+    FOR ALL
+    USING (true)
+    WITH CHECK (true);
+
+CREATE POLICY "Enable all access for authenticated users" ON position_snapshots
+    FOR ALL
+    USING (true)
+    WITH CHECK (true);
+
+CREATE POLICY "Enable all access for authenticated users" ON daily_bars
+    FOR ALL
+    USING (true)
+    WITH CHECK (true);
+
+-- Change feed for the holdings cache (HOLDINGS_REALTIME=1)
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_publication WHERE pubname = 'supabase_realtime')
+       AND NOT EXISTS (SELECT 1 FROM pg_publication_tables WHERE pubname = 'supabase_realtime' AND tablename = 'holdings') THEN
+        ALTER PUBLICATION supabase_realtime ADD TABLE holdings;
+    END IF;
+END $$;
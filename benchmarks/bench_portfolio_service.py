@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+"""
+Offline benchmark for PortfolioService. Supabase, yfinance and the Yahoo search
+endpoint are replaced by in-process fakes (benchmarks/fakes.py) with configurable
+latency, and synthetic portfolios of 10 to 10,000 holdings are run through
+get_holdings, save_excel_file and auto_discover_all.
+
+Reports p50/p99 latency, throughput and peak traced memory per operation:
+
+    python benchmarks/bench_portfolio_service.py
+    python benchmarks/bench_portfolio_service.py --sizes 100 1000 --ops holdings_poll --iterations 50
+    python benchmarks/bench_portfolio_service.py --db-latency-ms 30 --yahoo-latency-ms 200 --json out.json
+    python benchmarks/bench_portfolio_service.py --storage sqlite
+"""
+import argparse
+import json
+import math
+import os
+import random
+import sys
+import time
+import tracemalloc
+import types
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+import portfolio_tracker.service as ps  # noqa: E402
+from portfolio_tracker.alerts import Sink  # noqa: E402
+from portfolio_tracker.instruments import InstrumentMaster  # noqa: E402
+from portfolio_tracker.paging import HoldingsQuery  # noqa: E402
+from portfolio_tracker.storage import CachedStorage, SQLiteStorage, SupabaseStorage  # noqa: E402
+from fakes import (FakeRequests, FakeSupabase, FakeYFinance, synthetic_excel, synthetic_holdings,  # noqa: E402
+                   synthetic_instruments, synthetic_quotes, synthetic_transactions)
+
+PORTFOLIO_ID = 'bench-portfolio'
+
+
+class NullSink(Sink):
+    name = 'null'
+
+    def send(self, alerts):
+        pass
+
+
+def percentile(samples, p: float) -> float:
+    ordered = sorted(samples)
+    return ordered[max(0, math.ceil(p * len(ordered)) - 1)]
+
+
+class Bench:
+    def __init__(self, args):
+        self.args = args
+        self.db = FakeSupabase(latency=args.db_latency_ms / 1000)
+        self.storage = SupabaseStorage(self.db)
+        self.portfolio_id = PORTFOLIO_ID
+        self.yf = FakeYFinance(download_latency=args.yahoo_latency_ms / 1000,
+                               info_latency=args.info_latency_ms / 1000,
+                               missing_rate=args.missing_rate)
+        self.requests = FakeRequests(latency=args.yahoo_latency_ms / 1000)
+
+        # Route the service module's upstream calls to the fakes
+        ps.yf = self.yf
+        ps.requests = self.requests
+        if not args.keep_rate_limit_sleep:
+            # auto_discover_all sleeps between lookups to be polite to Yahoo; the fake doesn't care
+            ps.time = types.SimpleNamespace(time=time.time, perf_counter=time.perf_counter, sleep=lambda seconds: None)
+
+    def new_service(self) -> ps.PortfolioService:
+        service = ps.PortfolioService()
+        service.storage = self.service_storage()
+        # No instrument master unless the operation provides one, so a local instruments.csv doesn't skew results
+        service.instruments = InstrumentMaster([])
+        # Pretend every exchange is trading so each poll takes the refresh path
+        service.is_market_open = lambda exchange=ps.DEFAULT_EXCHANGE: True
+        return service
+
+    def service_storage(self):
+        """The seeded backend, behind the holdings cache unless --holdings-cache-ttl is 0."""
+        ttl = self.args.holdings_cache_ttl
+        return CachedStorage(self.storage, ttl) if ttl > 0 else self.storage
+
+    def seed(self, n: int, with_tickers: bool = True):
+        # Quotes persisted at yesterday's close: known prices, but stale while the market is open
+        quotes = synthetic_quotes(n, (datetime.now(timezone.utc) - timedelta(days=1)).isoformat())
+        if self.args.storage == 'sqlite':
+            # A fresh in-memory database per seed, so every run starts from the same rows
+            self.storage = SQLiteStorage(':memory:')
+            self.portfolio_id = self.storage.create_portfolio('Benchmark')['id']
+            self.storage.upsert_holdings(synthetic_holdings(self.portfolio_id, n, with_tickers=with_tickers))
+            self.storage.upsert_quotes(quotes)
+            return
+        self.db.tables = {
+            'portfolios': [{'id': PORTFOLIO_ID, 'name': 'Benchmark', 'tenant_id': 'default'}],
+            'holdings': synthetic_holdings(PORTFOLIO_ID, n, with_tickers=with_tickers),
+            'quotes': quotes,
+        }
+
+    # Each operation returns (setup, run): setup runs untimed before every iteration.
+
+    def op_holdings_cold(self, n):
+        """First request on a fresh instance: every quote and fundamental is fetched."""
+        self.seed(n)
+        state = {}
+
+        def setup():
+            state['service'] = self.new_service()
+
+        return setup, lambda: state['service'].get_holdings(self.portfolio_id)
+
+    def op_holdings_poll(self, n):
+        """Steady-state 2s polling while the market is open: quotes refresh, fundamentals are cached."""
+        self.seed(n)
+        service = self.new_service()
+        service.get_holdings(self.portfolio_id)
+
+        def setup():
+            service._cache_expiry = 0
+
+        return setup, lambda: service.get_holdings(self.portfolio_id)
+
+    def op_holdings_page(self, n):
+        """Steady-state polling of the first 100 rows sorted by return: only the page's quotes refresh."""
+        self.seed(n)
+        service = self.new_service()
+        query = HoldingsQuery(sort='total_return_percent', limit=100)
+        service.get_holdings(self.portfolio_id, query=query)
+
+        def setup():
+            service._cache_expiry = 0
+
+        return setup, lambda: service.get_holdings(self.portfolio_id, query=query)
+
+    def op_holdings_cached(self, n):
+        """Poll within the quote cache window: no upstream calls at all."""
+        self.seed(n)
+        service = self.new_service()
+        service._cache_expiry = 3600
+        service.get_holdings(self.portfolio_id)
+        return (lambda: None), lambda: service.get_holdings(self.portfolio_id)
+
+    def op_save_excel(self, n):
+        self.seed(0)
+        content = synthetic_excel(n)
+        service = self.new_service()
+        return (lambda: None), lambda: service.save_excel_file(content)
+
+    def op_auto_discover(self, n):
+        """Tickers of --instrument-coverage of the holdings come from the instrument master, the rest from search."""
+        service = self.new_service()
+        service.instruments = InstrumentMaster(synthetic_instruments(n, self.args.instrument_coverage))
+
+        def setup():
+            self.seed(n, with_tickers=False)
+            service.storage = self.service_storage()
+
+        return setup, lambda: service.auto_discover_all(self.portfolio_id)
+
+    def op_positions(self, n):
+        """Ledger positions after one new trade, over 20 stored transactions per holding: only the new trade is folded."""
+        self.seed(n)
+        service = self.new_service()
+        self.storage.add_transactions(synthetic_transactions(self.portfolio_id, n))
+        service.get_positions(self.portfolio_id)
+
+        def setup():
+            self.storage.add_transactions([dict(synthetic_transactions(self.portfolio_id, 1, 1)[0],
+                                                trade_date=datetime.now(timezone.utc).date().isoformat())])
+
+        return setup, lambda: service.get_positions(self.portfolio_id)
+
+    def op_alerts(self, n):
+        """One quote tick for every held ticker through the alert trigger index, with a sink that drops alerts."""
+        self.seed(n)
+        service = self.new_service()
+        service.alerts.add_sink(NullSink())
+        tickers = [f"SYM{i}.NS" for i in range(n)]
+        service.alerts.on_quotes(tickers, [random.uniform(10, 5000) for _ in tickers])
+        state = {}
+
+        def setup():
+            state['prices'] = [random.uniform(10, 5000) for _ in tickers]
+
+        return setup, lambda: service.alerts.on_quotes(tickers, state['prices'])
+
+    def op_simulate(self, n):
+        """1000 uniform price shocks from -50% to +50% and 10 equal-weight rebalances in one request."""
+        self.seed(n)
+        service = self.new_service()
+        scenarios = [{'name': f"{i - 500:+d}/1000", 'shock': (i - 500) / 1000} for i in range(1000)]
+        rebalances = [{'weights': {}, 'default_weight': 1 / max(n, 1), 'cash': 1000.0 * i} for i in range(10)]
+        service.simulate(self.portfolio_id, scenarios, rebalances)
+        return (lambda: None), lambda: service.simulate(self.portfolio_id, scenarios, rebalances)
+
+    def op_risk(self, n):
+        """Risk report on a new daily bar: the history is in memory, one day is downloaded and everything recomputed."""
+        self.seed(n)
+        service = self.new_service()
+        service.get_risk(self.portfolio_id)
+
+        def setup():
+            service._closes = service._closes.iloc[:-1]
+            service._bars_synced.clear()
+            service._risk_cache.clear()
+        return setup, lambda: service.get_risk(self.portfolio_id)
+
+    def run(self, op: str, n: int) -> dict:
+        iterations = self.args.iterations if n <= 1000 else max(3, self.args.iterations // 10)
+        setup, fn = getattr(self, f"op_{op}")(n)
+
+        samples = []
+        for _ in range(iterations):
+            setup()
+            start = time.perf_counter()
+            fn()
+            samples.append(time.perf_counter() - start)
+
+        # Memory is traced in a separate run, tracing slows everything down
+        setup()
+        tracemalloc.start()
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        total = sum(samples)
+        return {
+            'op': op,
+            'holdings': n,
+            'iterations': iterations,
+            'p50_ms': percentile(samples, 0.50) * 1000,
+            'p99_ms': percentile(samples, 0.99) * 1000,
+            'ops_per_s': iterations / total if total else float('inf'),
+            'holdings_per_s': iterations * n / total if total else float('inf'),
+            'peak_mib': peak / 2 ** 20,
+        }
+
+
+OPS = ['holdings_cold', 'holdings_poll', 'holdings_page', 'holdings_cached', 'save_excel', 'auto_discover', 'positions', 'alerts', 'simulate', 'risk']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 100, 1000, 10000])
+    parser.add_argument('--ops', nargs='+', choices=OPS, default=OPS)
+    parser.add_argument('--iterations', type=int, default=20)
+    parser.add_argument('--storage', choices=['supabase', 'sqlite'], default='supabase',
+                        help='fake Supabase client, or a real in-memory SQLite database')
+    parser.add_argument('--holdings-cache-ttl', type=float, default=30, help='0 reads holdings from storage on every poll')
+    parser.add_argument('--db-latency-ms', type=float, default=0.0, help='per Supabase round trip')
+    parser.add_argument('--yahoo-latency-ms', type=float, default=0.0, help='per yf.download / search call')
+    parser.add_argument('--info-latency-ms', type=float, default=0.0, help='per Ticker.info / financials call')
+    parser.add_argument('--missing-rate', type=float, default=0.0, help='share of tickers download returns no data for')
+    parser.add_argument('--instrument-coverage', type=float, default=0.0,
+                        help='share of holdings auto_discover resolves from the offline instrument master')
+    parser.add_argument('--keep-rate-limit-sleep', action='store_true', help="keep auto_discover_all's 0.2s sleep")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--json', help='also write results to this file')
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    bench = Bench(args)
+    # The service prints on every fetch; keep the report readable
+    stdout, results = sys.stdout, []
+
+    print(f"{'operation':<16} {'holdings':>8} {'p50 ms':>10} {'p99 ms':>10} {'ops/s':>9} {'holdings/s':>12} {'peak MiB':>9}")
+    for op in args.ops:
+        for n in args.sizes:
+            sys.stdout = open(os.devnull, 'w')
+            try:
+                result = bench.run(op, n)
+            finally:
+                sys.stdout.close()
+                sys.stdout = stdout
+            results.append(result)
+            print(f"{op:<16} {n:>8} {result['p50_ms']:>10.2f} {result['p99_ms']:>10.2f} "
+                  f"{result['ops_per_s']:>9.1f} {result['holdings_per_s']:>12.0f} {result['peak_mib']:>9.2f}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'args': vars(args), 'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Compares per-holding slicing of a yf.download frame (the old get_holdings loop)
+with the vectorized extract_quotes stage, on synthetic frames of 50, 500 and
+5,000 tickers.
+
+    python benchmarks/bench_quote_extraction.py [--sizes 50 500 5000]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from portfolio_tracker.quotes import extract_quotes  # noqa: E402
+
+FIELDS = ['Open', 'High', 'Low', 'Close', 'Volume']
+
+
+def synthetic_download(n_tickers: int, days: int = 5, seed: int = 0) -> pd.DataFrame:
+    """Builds a frame shaped like yf.download(..., period='5d', group_by='ticker')."""
+    rng = np.random.default_rng(seed)
+    tickers = [f"SYM{i}.NS" for i in range(n_tickers)]
+    columns = pd.MultiIndex.from_product([tickers, FIELDS], names=['Ticker', 'Price'])
+    values = rng.uniform(10, 5000, size=(days, len(columns)))
+    # Sprinkle gaps like holidays, suspended and delisted symbols
+    values[rng.random(values.shape) < 0.05] = np.nan
+    values[:, rng.choice(len(columns), size=max(1, len(columns) // 100), replace=False)] = np.nan
+    return pd.DataFrame(values, index=pd.date_range('2026-01-05', periods=days), columns=columns)
+
+
+def legacy_extract(data: pd.DataFrame, tickers) -> dict:
+    quotes = {}
+    for ticker in tickers:
+        if ticker in data.columns.get_level_values(0):
+            hist = data[ticker].dropna(subset=['Close'])
+            if not hist.empty:
+                price = float(hist['Close'].iloc[-1])
+                prev_close = hist['Close'].iloc[-2] if len(hist) > 1 else price
+                change_amt = price - prev_close
+                change_pct = (change_amt / prev_close * 100) if prev_close > 0 else 0
+                quotes[ticker] = (price, change_amt, change_pct)
+    return quotes
+
+
+def timed(fn, *args, repeat=3):
+    best, result = float('inf'), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[50, 500, 5000])
+    args = parser.parse_args()
+
+    print(f"{'tickers':>8} {'per-holding':>14} {'vectorized':>12} {'speedup':>9}")
+    for n in args.sizes:
+        data = synthetic_download(n)
+        tickers = data.columns.get_level_values(0).unique().tolist()
+        legacy_time, legacy = timed(legacy_extract, data, tickers, repeat=1 if n > 1000 else 3)
+        vector_time, table = timed(extract_quotes, data)
+
+        # Both stages must agree before their timings mean anything
+        assert set(legacy) == set(table.index)
+        expected = np.array([legacy[t] for t in table.index])
+        actual = table[['price', 'change_amount', 'change_percent']].to_numpy()
+        assert np.allclose(expected, actual)
+
+        print(f"{n:>8} {legacy_time * 1000:>11.1f} ms {vector_time * 1000:>9.2f} ms {legacy_time / vector_time:>8.0f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Compares the legacy dict-of-dicts price cache with the columnar QuoteStore:
+memory held by the cache, time to write a refresh of every ticker, and time
+to join quotes against a holdings list and evaluate SELL rules.
+
+    python benchmarks/bench_quote_store.py --tickers 10000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from portfolio_tracker.quotes import QuoteStore  # noqa: E402
+from portfolio_tracker.service import PortfolioService  # noqa: E402
+
+
+def build_dict_cache(tickers, now):
+    cache = {}
+    for t in tickers:
+        cache[t] = {"price": random.uniform(10, 5000), "day_change_amount": random.uniform(-50, 50),
+                    "day_change_percent": random.uniform(-5, 5), "ts": now}
+    return cache
+
+
+def build_quote_store(tickers, now):
+    store = QuoteStore()
+    store.update_many(tickers, [random.uniform(10, 5000) for _ in tickers],
+                      [random.uniform(-50, 50) for _ in tickers],
+                      [random.uniform(-5, 5) for _ in tickers], now)
+    return store
+
+
+def update_dict(cache, tickers, quotes, now):
+    for t, (price, change_amt, change_pct) in zip(tickers, quotes):
+        cache[t] = {"price": price, "day_change_amount": change_amt, "day_change_percent": change_pct, "ts": now}
+
+
+def update_store(store, tickers, columns, now):
+    store.update_many(tickers, *columns, now)
+
+
+def measure_memory(builder, tickers, now):
+    tracemalloc.start()
+    cache = builder(tickers, now)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return cache, current
+
+
+def merge_dict(cache, holdings):
+    """The per-holding merge get_holdings used before QuoteStore."""
+    for h in holdings:
+        entry = cache.get(h['ticker'])
+        if entry:
+            h['current_price'] = entry['price']
+            h['day_change_amount'] = entry['day_change_amount']
+            h['day_change_percent'] = entry['day_change_percent']
+        if h.get('current_price') and h.get('average_buy_price'):
+            curr = float(h['current_price'])
+            buy = float(h['average_buy_price'])
+            h['total_return_percent'] = ((curr - buy) / buy * 100) if buy > 0 else 0
+            if h.get('target') and curr >= float(h['target']):
+                h['state'], h['state_reason'] = "SELL", "Target Hit"
+            elif h.get('total_return_percent', 0) >= 30:
+                h['state'], h['state_reason'] = "SELL", "Returns > 30%"
+            elif h.get('stop_loss') and curr <= float(h['stop_loss']):
+                h['state'], h['state_reason'] = "SELL", "Stop Loss Hit"
+
+
+def merge_store(service, holdings):
+    """The join and rules pass of get_holdings, less its per-holding exchange and cache flags."""
+    prices, change_amts, change_pcts = service._quotes.lookup([h['ticker'] for h in holdings])[:3].tolist()
+    for h, price, change_amt, change_pct in zip(holdings, prices, change_amts, change_pcts):
+        h['current_price'] = price
+        h['day_change_amount'] = change_amt
+        h['day_change_percent'] = change_pct
+    service._evaluate_states(holdings)
+
+
+def best_of(fn, *args, repeat=5):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--tickers', type=int, default=10000)
+    args = parser.parse_args()
+
+    now = time.time()
+    tickers = [f"SYM{i}.NS" for i in range(args.tickers)]
+    holdings = [{"ticker": t, "average_buy_price": random.uniform(10, 5000),
+                 "target": random.choice([None, 4000]), "stop_loss": random.choice([None, 100])}
+                for t in tickers]
+
+    dict_cache, dict_bytes = measure_memory(build_dict_cache, tickers, now)
+    store, store_bytes = measure_memory(build_quote_store, tickers, now)
+    service = PortfolioService()
+    service._quotes = store
+    quotes = [(random.uniform(10, 5000), random.uniform(-50, 50), random.uniform(-5, 5)) for _ in tickers]
+
+    print(f"{args.tickers} tickers")
+    print(f"  memory   dict: {dict_bytes / 1024:8.1f} KiB   QuoteStore: {store_bytes / 1024:8.1f} KiB")
+    print(f"  update   dict: {best_of(update_dict, dict_cache, tickers, quotes, now) * 1000:8.2f} ms    "
+          f"QuoteStore: {best_of(update_store, store, tickers, np.array(quotes).T, now) * 1000:8.2f} ms")
+    print(f"  merge    dict: {best_of(merge_dict, dict_cache, holdings) * 1000:8.2f} ms    "
+          f"QuoteStore: {best_of(merge_store, service, holdings) * 1000:8.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
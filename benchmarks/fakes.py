@@ -0,0 +1,315 @@
+"""
+In-process fakes for the services PortfolioService talks to, so benchmarks run
+without network access. Each fake sleeps for a configurable latency per call to
+stand in for the round trip it replaces.
+"""
+import io
+import random
+import time
+import zlib
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+PRICE_FIELDS = ['Open', 'High', 'Low', 'Close', 'Volume']
+HISTORY_ORIGIN = '2024-01-01'  # First bar of the synthetic daily history
+
+
+class FakeResponse:
+    def __init__(self, data=None, status_code: int = 200):
+        self.data = data
+        self.status_code = status_code
+
+    def json(self):
+        return self.data
+
+
+class FakeQuery:
+    """Mimics the chained postgrest query builder: table().select().eq()...execute()."""
+
+    def __init__(self, client: 'FakeSupabase', table: str):
+        self._client = client
+        self._table = table
+        self._filters = []
+        self._op = 'select'
+        self._payload = None
+        self._on_conflict = None
+        self._order = []
+        self._limit = None
+        self._range = None
+
+    def select(self, *columns, **kwargs):
+        self._op = 'select'
+        return self
+
+    def eq(self, column, value):
+        self._filters.append(lambda row: row.get(column) == value)
+        return self
+
+    def in_(self, column, values):
+        values = set(values)
+        self._filters.append(lambda row: row.get(column) in values)
+        return self
+
+    def is_(self, column, value):
+        self._filters.append(lambda row: row.get(column) is None)
+        return self
+
+    def gte(self, column, value):
+        self._filters.append(lambda row: row.get(column) is not None and row.get(column) >= value)
+        return self
+
+    def gt(self, column, value):
+        self._filters.append(lambda row: row.get(column) is not None and row.get(column) > value)
+        return self
+
+    def order(self, column, desc: bool = False):
+        self._order.append((column, desc))
+        return self
+
+    def limit(self, count: int):
+        self._limit = count
+        return self
+
+    def range(self, start: int, end: int):
+        self._range = (start, end)
+        return self
+
+    def insert(self, payload):
+        self._op, self._payload = 'insert', payload if isinstance(payload, list) else [payload]
+        return self
+
+    def upsert(self, payload, on_conflict: Optional[str] = None, **kwargs):
+        self._op, self._payload = 'upsert', payload if isinstance(payload, list) else [payload]
+        self._on_conflict = on_conflict
+        return self
+
+    def update(self, payload):
+        self._op, self._payload = 'update', payload
+        return self
+
+    def delete(self):
+        self._op = 'delete'
+        return self
+
+    def execute(self) -> FakeResponse:
+        self._client.calls += 1
+        if self._client.latency:
+            time.sleep(self._client.latency)
+
+        rows = self._client.tables.setdefault(self._table, [])
+        matched = [r for r in rows if all(f(r) for f in self._filters)]
+        if self._op == 'select':
+            # Stable sorts from the last key to the first give the combined order
+            for column, desc in reversed(self._order):
+                matched.sort(key=lambda r: r.get(column), reverse=desc)
+            if self._range is not None:
+                matched = matched[self._range[0]:self._range[1] + 1]
+            if self._limit is not None:
+                matched = matched[:self._limit]
+            if self._client.max_rows is not None:
+                matched = matched[:self._client.max_rows]
+            return FakeResponse([dict(r) for r in matched])
+        if self._op == 'update':
+            for r in matched:
+                r.update(self._payload)
+            return FakeResponse([dict(r) for r in matched])
+        if self._op == 'delete':
+            ids = {id(r) for r in matched}
+            self._client.tables[self._table] = [r for r in rows if id(r) not in ids]
+            return FakeResponse(matched)
+
+        keys = self._client.primary_keys.get(self._table, ('id',))
+        if self._on_conflict:
+            keys = tuple(self._on_conflict.split(','))
+        index = {tuple(r.get(k) for k in keys): r for r in rows}
+        written = []
+        for record in self._payload:
+            record = dict(record)
+            if self._table == 'portfolios':
+                record.setdefault('id', f"portfolio-{len(rows) + 1}")
+            elif self._table in self._client.identity_tables:
+                self._client.last_ids[self._table] = self._client.last_ids.get(self._table, 0) + 1
+                record.setdefault('id', self._client.last_ids[self._table])
+            existing = index.get(tuple(record.get(k) for k in keys))
+            if existing is not None and self._op == 'upsert':
+                existing.update(record)
+            else:
+                rows.append(record)
+                index[tuple(record.get(k) for k in keys)] = record
+            written.append(record)
+        return FakeResponse(written)
+
+
+class FakeSupabase:
+    """Dict-backed stand-in for the supabase Client."""
+
+    primary_keys = {'holdings': ('portfolio_id', 'isin'), 'portfolios': ('id',), 'quotes': ('ticker',),
+                    'corporate_actions': ('ticker', 'ex_date', 'action'), 'position_snapshots': ('portfolio_id', 'isin'),
+                    'daily_bars': ('ticker', 'date')}
+    identity_tables = {'transactions'}  # Tables with a generated BIGINT id
+
+    def __init__(self, latency: float = 0.0, max_rows: Optional[int] = None):
+        self.latency = latency
+        self.max_rows = max_rows  # PostgREST's row limit: longer results are cut off, even within a range
+        self.tables: Dict[str, List[Dict]] = {}
+        self.calls = 0
+        self.last_ids: Dict[str, int] = {}
+
+    def table(self, name: str) -> FakeQuery:
+        return FakeQuery(self, name)
+
+
+class FakeTicker:
+    def __init__(self, yf: 'FakeYFinance', symbol: str):
+        self._yf = yf
+        self.symbol = symbol
+
+    @property
+    def info(self) -> Dict:
+        self._yf._call(self._yf.info_latency)
+        eps, shares = round(random.uniform(1, 200), 2), random.randint(10 ** 7, 10 ** 10)
+        price = random.uniform(10, 5000)
+        return {'pegRatio': None, 'debtToEquity': round(random.uniform(0, 150), 2),
+                'trailingPE': round(price / eps, 2), 'marketCap': int(price * shares),
+                'trailingEps': eps, 'sharesOutstanding': shares, 'bookValue': round(random.uniform(10, 1000), 2),
+                'totalDebt': random.randint(0, 10 ** 11),
+                'lastFiscalYearEnd': int(pd.Timestamp('2025-03-31').timestamp())}
+
+    @property
+    def financials(self) -> pd.DataFrame:
+        self._yf._call(self._yf.info_latency)
+        years = pd.to_datetime(['2025-03-31', '2024-03-31', '2023-03-31', '2022-03-31'])
+        base = random.uniform(1e9, 1e11)
+        growth = np.array([1.0, 0.9, 0.8, 0.7])
+        return pd.DataFrame(
+            [base * growth, base * growth * 0.1],
+            index=['Total Revenue', 'Net Income Common Stockholders'],
+            columns=years
+        )
+
+
+class FakeYFinance:
+    """Stands in for the yfinance module: download() and Ticker()."""
+
+    def __init__(self, download_latency: float = 0.0, per_ticker_latency: float = 0.0,
+                 info_latency: float = 0.0, missing_rate: float = 0.0, days: int = 5):
+        self.download_latency = download_latency
+        self.per_ticker_latency = per_ticker_latency
+        self.info_latency = info_latency
+        self.missing_rate = missing_rate
+        self.days = days
+        self.calls = 0
+
+    def _call(self, latency: float):
+        self.calls += 1
+        if latency:
+            time.sleep(latency)
+
+    def download(self, tickers, period: str = '5d', group_by: str = 'ticker', start=None, **kwargs) -> pd.DataFrame:
+        symbols = tickers.split() if isinstance(tickers, str) else list(tickers)
+        self._call(self.download_latency + self.per_ticker_latency * len(symbols))
+        symbols = [s.upper() for s in symbols if random.random() >= self.missing_rate]
+        columns = pd.MultiIndex.from_product([symbols, PRICE_FIELDS], names=['Ticker', 'Price'])
+        if start is not None:
+            return self._history(symbols, columns, pd.Timestamp(start))
+        values = np.random.uniform(10, 5000, size=(self.days, len(columns)))
+        index = pd.date_range(end=pd.Timestamp.today().normalize(), periods=self.days)
+        return pd.DataFrame(values, index=index, columns=columns)
+
+    def _history(self, symbols: List[str], columns: pd.MultiIndex, start: pd.Timestamp) -> pd.DataFrame:
+        """Weekday bars from `start` to today: a random walk per symbol, the same on every call."""
+        index = pd.bdate_range(HISTORY_ORIGIN, pd.Timestamp.today().normalize())
+        walks = []
+        for symbol in symbols:
+            rng = np.random.default_rng(zlib.crc32(symbol.encode()))
+            walk = 100 * np.exp(np.cumsum(rng.normal(0, 0.015, len(index))))
+            walks.append(np.repeat(walk[:, None], len(PRICE_FIELDS), axis=1))
+        values = np.hstack(walks) if walks else np.empty((len(index), 0))
+        return pd.DataFrame(values, index=index, columns=columns)[index >= start]
+
+    def Ticker(self, symbol: str) -> FakeTicker:
+        return FakeTicker(self, symbol)
+
+
+class FakeRequests:
+    """Stands in for the requests module as used by the Yahoo search fallback."""
+
+    class RequestException(Exception):
+        pass
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.calls = 0
+
+    def get(self, url: str, headers=None, params=None, timeout=None) -> FakeResponse:
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        query = url.split('q=', 1)[1].split('&', 1)[0] if 'q=' in url else (params or {}).get('q', '')
+        symbol = ''.join(c for c in query.upper() if c.isalnum())[:10]
+        return FakeResponse({'quotes': [{'symbol': f"{symbol}.NS", 'exchange': 'NSI'}]})
+
+
+def synthetic_holdings(portfolio_id: str, n: int, with_tickers: bool = True) -> List[Dict]:
+    """Holdings rows as stored in Supabase, with a mix of targets, stop losses and cached prices."""
+    rows = []
+    for i in range(n):
+        buy = round(random.uniform(10, 5000), 2)
+        rows.append({
+            'portfolio_id': portfolio_id,
+            'isin': f"INE{i:06d}01",
+            'stock_name': f"SYNTHETIC COMPANY {i} LIMITED",
+            'quantity': random.randint(1, 500),
+            'average_buy_price': buy,
+            'ticker': f"SYM{i}.NS" if with_tickers else None,
+            'date_of_exit': None,
+            'target': round(buy * 1.4, 2) if i % 3 == 0 else None,
+            'stop_loss': round(buy * 0.8, 2) if i % 4 == 0 else None,
+        })
+    return rows
+
+
+def synthetic_quotes(n: int, updated_at: str) -> List[Dict]:
+    """Persisted quotes for the tickers of synthetic_holdings, as last written at `updated_at`."""
+    return [{'ticker': f"SYM{i}.NS", 'price': round(random.uniform(10, 5000), 2), 'day_change_amount': 0.0,
+             'day_change_percent': 0.0, 'updated_at': updated_at} for i in range(n)]
+
+
+def synthetic_instruments(n: int, coverage: float = 1.0) -> List[Dict]:
+    """Instrument master rows (see portfolio_tracker/instruments.py) for a share of synthetic_holdings' ISINs."""
+    return [{'isin': f"INE{i:06d}01", 'exchange': 'NSE', 'symbol': f"SYM{i}",
+             'name': f"SYNTHETIC COMPANY {i} LIMITED", 'series': 'EQ'}
+            for i in range(n) if random.random() < coverage]
+
+
+def synthetic_transactions(portfolio_id: str, n: int, per_holding: int = 20) -> List[Dict]:
+    """A ledger of buys with an occasional sell for the ISINs of synthetic_holdings, one trade per day per ISIN."""
+    start = pd.Timestamp('2015-01-01')
+    rows = []
+    for day in range(per_holding):
+        trade_date = (start + pd.Timedelta(days=day)).date().isoformat()
+        for i in range(n):
+            rows.append({
+                'portfolio_id': portfolio_id, 'isin': f"INE{i:06d}01", 'stock_name': f"SYNTHETIC COMPANY {i} LIMITED",
+                'ticker': f"SYM{i}.NS", 'type': 'sell' if day % 5 == 4 else 'buy', 'trade_date': trade_date,
+                'quantity': random.randint(1, 20), 'price': round(random.uniform(10, 5000), 2), 'fees': 0.0,
+            })
+    return rows
+
+
+def synthetic_excel(n: int) -> bytes:
+    """A broker holdings statement with a few preamble rows before the header, like real exports."""
+    preamble = pd.DataFrame([['Holdings Statement'], ['Client: SYNTHETIC'], ['']])
+    body = pd.DataFrame({
+        'Stock Name': [f"SYNTHETIC COMPANY {i} LIMITED" for i in range(n)],
+        'ISIN': [f"INE{i:06d}01" for i in range(n)],
+        'Quantity': [random.randint(1, 500) for _ in range(n)],
+        'Average buy price': [round(random.uniform(10, 5000), 2) for _ in range(n)],
+    })
+    buffer = io.BytesIO()
+    with pd.ExcelWriter(buffer, engine='openpyxl') as writer:
+        preamble.to_excel(writer, header=False, index=False)
+        body.to_excel(writer, startrow=len(preamble), index=False)
+    return buffer.getvalue()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Measures cold-start import time of the API entry points with `python -X importtime`
+in a fresh interpreter, and what each deferred dependency would cost if it were
+imported eagerly.
+
+    python benchmarks/startup_time.py --entry api backend --runs 5
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# Format: {name: (working directory, module to import)}
+ENTRIES = {
+    "api": (os.path.join(ROOT, "api"), "index"),
+    "backend": (os.path.join(ROOT, "backend"), "main"),
+}
+DEFERRED = ["yfinance", "pandas", "numpy", "supabase"]
+
+
+def import_times(cwd: str, module: str) -> dict:
+    """Returns {module: cumulative microseconds} for one cold import of `module`."""
+    env = dict(os.environ, SUPABASE_URL=os.environ.get("SUPABASE_URL", "https://example.supabase.co"),
+               SUPABASE_KEY=os.environ.get("SUPABASE_KEY", "startup-benchmark"))
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                          cwd=cwd, env=env, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{proc.stderr[-2000:]}")
+    times = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        # Format: "import time: <self us> | <cumulative us> | <indented module name>"
+        _, cumulative, name = line[len("import time:"):].split("|")
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+def median_times(cwd: str, module: str, runs: int) -> dict:
+    samples = [import_times(cwd, module) for _ in range(runs)]
+    names = set().union(*samples)
+    return {n: statistics.median(s.get(n, 0) for s in samples) for n in names}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--entry", nargs="+", choices=sorted(ENTRIES), default=sorted(ENTRIES))
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10, help="slowest top-level imports to list")
+    args = parser.parse_args()
+
+    for entry in args.entry:
+        cwd, module = ENTRIES[entry]
+        times = median_times(cwd, module, args.runs)
+        print(f"\n{entry}: import {module}  total {times.get(module, 0) / 1000:8.1f} ms (median of {args.runs})")
+        top = sorted(((t, n) for n, t in times.items() if "." not in n and n != module), reverse=True)[:args.top]
+        for t, name in top:
+            print(f"  {name:<28} {t / 1000:8.1f} ms")
+        loaded = [name for name in DEFERRED if name in times]
+        print(f"  deferred modules imported at startup: {', '.join(loaded) or 'none'}")
+
+    print("\ndeferred dependencies (cost when first used):")
+    for name in DEFERRED:
+        cost = median_times(ROOT, name, args.runs).get(name, 0)
+        print(f"  {name:<28} {cost / 1000:8.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
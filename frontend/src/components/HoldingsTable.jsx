@@ -1,23 +1,40 @@
 import React, { useState, useRef } from 'react';
-import { useQuery, useMutation, useQueryClient } from '@tanstack/react-query';
+import { useQuery, useMutation, useQueryClient, keepPreviousData } from '@tanstack/react-query';
 import { getHoldings, updateSettings, autoDiscover, uploadPortfolio, addHolding, deleteHoldingsBulk } from '../lib/api';
-import { ArrowUp, ArrowDown, RefreshCw, Wand2, Upload, ExternalLink, Edit2, Save, X, Trash2, PlusCircle, CheckCircle2 } from 'lucide-react';
+import { ArrowUp, ArrowDown, RefreshCw, Wand2, Upload, ExternalLink, Edit2, Save, X, Trash2, PlusCircle, CheckCircle2, ChevronLeft, ChevronRight, Search } from 'lucide-react';
 import clsx from 'clsx';
 
+const PAGE_SIZE = 100;
+
 const HoldingsTable = ({ portfolioId }) => {
     const [lastUpdated, setLastUpdated] = useState(new Date());
     const [selectedIsins, setSelectedIsins] = useState([]);
     const [isAddModalOpen, setIsAddModalOpen] = useState(false);
     const [newStockForm, setNewStockForm] = useState({ isin: '', stock_name: '', quantity: '', average_buy_price: '', ticker: '' });
+    const [sortConfig, setSortConfig] = useState({ key: 'total_return_percent', direction: 'desc' });
+    const [filters, setFilters] = useState({ state: '', q: '' });
+    // Cursors of the pages visited so far, the last one is the current page
+    const [cursors, setCursors] = useState([null]);
+
+    // Sorting, filtering and paging happen server-side, so only the visible page is fetched and priced
+    const params = {
+        sort: sortConfig.key,
+        order: sortConfig.direction,
+        limit: PAGE_SIZE,
+        ...(cursors[cursors.length - 1] && { cursor: cursors[cursors.length - 1] }),
+        ...(filters.state && { state: filters.state }),
+        ...(filters.q && { q: filters.q }),
+    };
 
     const queryClient = useQueryClient();
     const { data, isLoading, error } = useQuery({
-        queryKey: ['holdings', portfolioId],
+        queryKey: ['holdings', portfolioId, params],
         queryFn: async () => {
-            const res = await getHoldings(portfolioId);
+            const res = await getHoldings(portfolioId, params);
             setLastUpdated(new Date());
             return res;
         },
+        placeholderData: keepPreviousData,
         refetchInterval: (query) => query.state.data?.is_market_open ? 2000 : 600000,
         refetchIntervalInBackground: true,
         enabled: !!portfolioId
@@ -25,6 +42,16 @@ const HoldingsTable = ({ portfolioId }) => {
 
     const holdings = data?.holdings || [];
     const isMarketOpen = data?.is_market_open;
+    const summary = data?.summary || { count: 0, total_value: 0, total_investment: 0, day_change_amount: 0 };
+
+    React.useEffect(() => {
+        setCursors([null]);
+    }, [portfolioId]);
+
+    const updateFilter = (key, value) => {
+        setFilters(prev => ({ ...prev, [key]: value }));
+        setCursors([null]);
+    };
 
     const updateMutation = useMutation({
         mutationFn: ({ isin, ...settings }) => updateSettings(portfolioId, isin, settings),
@@ -83,7 +110,6 @@ const HoldingsTable = ({ portfolioId }) => {
 
     const [editingId, setEditingId] = useState(null);
     const [editForm, setEditForm] = useState({ ticker: '', dateOfExit: '', target: '', stopLoss: '', quantity: '', avgPrice: '' });
-    const [sortConfig, setSortConfig] = useState({ key: 'total_return_percent', direction: 'desc' });
 
     // Selection
     const toggleSelect = (isin) => {
@@ -101,38 +127,20 @@ const HoldingsTable = ({ portfolioId }) => {
     };
 
     // Sorting
-    const sortedHoldings = React.useMemo(() => {
-        if (!holdings) return [];
-        let sortableItems = [...holdings];
-        if (sortConfig.key !== null) {
-            sortableItems.sort((a, b) => {
-                let aValue = a[sortConfig.key];
-                let bValue = b[sortConfig.key];
-
-                if (sortConfig.key === 'current_value') {
-                    aValue = (a.current_price || 0) * a.quantity;
-                    bValue = (b.current_price || 0) * b.quantity;
-                }
-
-                if (aValue === null || aValue === undefined) aValue = -Infinity;
-                if (bValue === null || bValue === undefined) bValue = -Infinity;
-
-                if (aValue < bValue) return sortConfig.direction === 'asc' ? -1 : 1;
-                if (aValue > bValue) return sortConfig.direction === 'asc' ? 1 : -1;
-                return 0;
-            });
-        }
-        return sortableItems;
-    }, [holdings, sortConfig]);
-
     const requestSort = (key) => {
         let direction = 'asc';
         if (sortConfig.key === key && sortConfig.direction === 'asc') {
             direction = 'desc';
         }
         setSortConfig({ key, direction });
+        setCursors([null]);
     };
 
+    // Paging
+    const nextPage = () => setCursors(prev => [...prev, data.next_cursor]);
+    const prevPage = () => setCursors(prev => prev.slice(0, -1));
+    const pageStart = (cursors.length - 1) * PAGE_SIZE;
+
     const SortIcon = ({ columnKey }) => {
         if (sortConfig.key !== columnKey) return <ArrowUp className="w-3 h-3 text-gray-300 ml-1 inline" />;
         return sortConfig.direction === 'asc'
@@ -176,17 +184,17 @@ const HoldingsTable = ({ portfolioId }) => {
         });
     };
 
-    // Calculations
-    const totalValue = (holdings || []).reduce((sum, h) => sum + (h.current_price ? h.current_price * h.quantity : 0), 0);
-    const totalInvestment = (holdings || []).reduce((sum, h) => sum + (h.average_buy_price ? h.average_buy_price * h.quantity : 0), 0);
+    // Calculations (portfolio-wide totals come from the server, the table only holds one page)
+    const totalValue = summary.total_value;
+    const totalInvestment = summary.total_investment;
     const totalReturnAmount = totalValue - totalInvestment;
     const totalReturnPercent = totalInvestment > 0 ? (totalReturnAmount / totalInvestment) * 100 : 0;
 
-    const totalDayChangeAmount = (holdings || []).reduce((sum, h) => sum + (h.day_change_amount ? h.day_change_amount * h.quantity : 0), 0);
+    const totalDayChangeAmount = summary.day_change_amount;
     const prevDayTotalValue = totalValue - totalDayChangeAmount;
     const totalDayChangePercent = prevDayTotalValue > 0 ? (totalDayChangeAmount / prevDayTotalValue) * 100 : 0;
 
-    const totalStocks = (holdings || []).length;
+    const totalStocks = summary.count;
 
     return (
         <div className="space-y-6">
@@ -306,6 +314,34 @@ const HoldingsTable = ({ portfolioId }) => {
 
             {/* Table */}
             <div className="bg-white rounded-2xl shadow-sm border border-gray-100 overflow-hidden">
+                <div className="flex items-center justify-between p-4 border-b border-gray-100">
+                    <div className="flex items-center space-x-2">
+                        <div className="relative">
+                            <Search className="w-4 h-4 text-gray-300 absolute left-2.5 top-1/2 -translate-y-1/2" />
+                            <input
+                                type="text"
+                                value={filters.q}
+                                onChange={e => updateFilter('q', e.target.value)}
+                                placeholder="Search name, ticker or ISIN"
+                                className="pl-8 pr-3 py-1.5 bg-gray-50 border-none rounded-lg text-sm focus:ring-2 focus:ring-indigo-500"
+                            />
+                        </div>
+                        <select
+                            value={filters.state}
+                            onChange={e => updateFilter('state', e.target.value)}
+                            className="py-1.5 bg-gray-50 border-none rounded-lg text-sm focus:ring-2 focus:ring-indigo-500"
+                        >
+                            <option value="">All states</option>
+                            <option value="HOLD">HOLD</option>
+                            <option value="SELL">SELL</option>
+                        </select>
+                    </div>
+                    <div className="flex items-center space-x-2 text-xs text-gray-400 font-mono">
+                        <span>{data?.total ? `${pageStart + 1}-${pageStart + holdings.length} of ${data.total}` : '0 of 0'}</span>
+                        <button onClick={prevPage} disabled={cursors.length === 1} className="p-1 rounded hover:bg-gray-50 disabled:opacity-30"><ChevronLeft className="w-4 h-4" /></button>
+                        <button onClick={nextPage} disabled={!data?.next_cursor} className="p-1 rounded hover:bg-gray-50 disabled:opacity-30"><ChevronRight className="w-4 h-4" /></button>
+                    </div>
+                </div>
                 <div className="overflow-x-auto">
                     <table className="w-full text-left text-sm border-collapse">
                         <thead className="bg-gray-50/50 text-gray-500 border-b border-gray-100">
@@ -342,7 +378,7 @@ const HoldingsTable = ({ portfolioId }) => {
                             </tr>
                         </thead>
                         <tbody className="divide-y divide-gray-50">
-                            {sortedHoldings.map((holding) => (
+                            {holdings.map((holding) => (
                                 <tr key={holding.isin} className={clsx(
                                     "transition-all duration-200 group",
                                     selectedIsins.includes(holding.isin) ? "bg-indigo-50/50" : "hover:bg-gray-50/30",
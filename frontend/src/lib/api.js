@@ -6,6 +6,15 @@ export const api = axios.create({
   baseURL: API_BASE_URL,
 });
 
+// Multi-tenant deployments identify the tenant by API key (TENANT_API_KEYS on the server)
+api.interceptors.request.use((config) => {
+  const apiKey = localStorage.getItem('apiKey') || import.meta.env.VITE_API_KEY;
+  if (apiKey) {
+    config.headers['X-API-Key'] = apiKey;
+  }
+  return config;
+});
+
 export const getPortfolios = async () => {
   const response = await api.get('/portfolios');
   return response.data;
@@ -26,9 +35,10 @@ export const renamePortfolio = async (id, name) => {
   return response.data;
 };
 
-export const getHoldings = async (portfolioId) => {
+// params: { sort, order, cursor, limit, state, q, min_return, max_return, min_day_change, max_day_change }
+export const getHoldings = async (portfolioId, params = {}) => {
   if (!portfolioId) return [];
-  const response = await api.get(`/holdings?portfolio_id=${portfolioId}`);
+  const response = await api.get('/holdings', { params: { portfolio_id: portfolioId, ...params } });
   return response.data;
 };
 
@@ -60,6 +70,24 @@ export const autoDiscover = async (portfolioId) => {
   return response.data;
 };
 
+export const getRisk = async (portfolioId) => {
+  const response = await api.get('/risk', { params: { portfolio_id: portfolioId } });
+  return response.data;
+};
+
+// scenarios: [{ name, shock, shocks: { isin: shock } }], rebalances: [{ name, weights: { isin: weight }, cash }]
+export const simulatePortfolio = async (portfolioId, scenarios = [], rebalances = []) => {
+  const response = await api.post('/simulate', { portfolio_id: portfolioId, scenarios, rebalances });
+  return response.data;
+};
+
+// Downloads holdings with quotes and fundamentals as a file; format: 'csv' or 'parquet'
+export const exportPortfolio = async (portfolioId, format = 'csv') => {
+  const url = portfolioId ? `/portfolios/${portfolioId}/export` : '/export';
+  const response = await api.get(url, { params: { format }, responseType: 'blob' });
+  return response.data;
+};
+
 export const uploadPortfolio = async (file) => {
   const formData = new FormData();
   formData.append('file', file);
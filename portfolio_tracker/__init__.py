@@ -0,0 +1,14 @@
+"""
+Portfolio tracker core: the holdings service, quote handling and the FastAPI app
+factory shared by the local server (backend/main.py) and the Vercel function
+(api/index.py).
+"""
+import os
+
+try:
+    from dotenv import load_dotenv
+    # Load .env from the current directory, then from the repository root
+    load_dotenv()
+    load_dotenv(os.path.join(os.path.dirname(__file__), '..', '.env'))
+except ImportError:
+    pass
@@ -0,0 +1,317 @@
+"""
+Alert engine: evaluates the SELL triggers of every portfolio once per quote update and
+notifies through pluggable sinks (webhook, email, local log).
+
+Each trigger is a price level: target (price >= target), returns above 30%
+(price >= 1.3 x average buy price) and stop loss (price <= stop loss). Levels are indexed
+per ticker in sorted order, so a tick only bisects for the levels crossed since the last
+price instead of re-checking every holding.
+"""
+from __future__ import annotations
+
+import json
+import os
+import smtplib
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from email.message import EmailMessage
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+# Comma-separated sinks to deliver to (log, webhook, email); empty disables the engine
+ALERT_SINKS = os.environ.get("ALERT_SINKS", "")
+ALERT_WEBHOOK_URL = os.environ.get("ALERT_WEBHOOK_URL")
+ALERT_LOG_PATH = os.environ.get("ALERT_LOG_PATH")  # JSON lines, in addition to stdout
+ALERT_SMTP_HOST = os.environ.get("ALERT_SMTP_HOST")
+ALERT_SMTP_PORT = int(os.environ.get("ALERT_SMTP_PORT", 587))
+ALERT_SMTP_USER = os.environ.get("ALERT_SMTP_USER")
+ALERT_SMTP_PASSWORD = os.environ.get("ALERT_SMTP_PASSWORD")
+ALERT_EMAIL_FROM = os.environ.get("ALERT_EMAIL_FROM")
+ALERT_EMAIL_TO = os.environ.get("ALERT_EMAIL_TO", "")
+# Seconds before the same trigger may fire again after the price crossed back and forth
+ALERT_COOLDOWN_SECONDS = int(os.environ.get("ALERT_COOLDOWN_SECONDS", 6 * 3600))
+# Seconds before the trigger index is rebuilt from storage (writes through this process rebuild it at once)
+ALERT_INDEX_TTL = int(os.environ.get("ALERT_INDEX_TTL", 60))
+
+RETURN_ALERT_MULTIPLE = 1.3  # "Returns > 30%" in _evaluate_states
+RECENT_ALERTS = 500
+
+# Format: (portfolio_id, isin, stock_name, reason, level)
+Trigger = Tuple[str, str, str, str, float]
+
+
+class Sink:
+    """Delivers a batch of alerts. Sinks run on the engine's delivery thread, never on a request."""
+
+    name = 'sink'
+
+    def send(self, alerts: List[Dict]):
+        raise NotImplementedError
+
+
+class LogSink(Sink):
+    name = 'log'
+
+    def __init__(self, path: Optional[str] = ALERT_LOG_PATH):
+        self.path = path
+
+    def send(self, alerts: List[Dict]):
+        for alert in alerts:
+            print(f"ALERT {alert['reason']}: {alert['stock_name']} ({alert['ticker']}) at {alert['price']:.2f} "
+                  f"crossed {alert['level']:.2f} [portfolio {alert['portfolio_id']}]")
+        if self.path:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.writelines(json.dumps(alert) + '\n' for alert in alerts)
+
+
+class WebhookSink(Sink):
+    name = 'webhook'
+
+    def __init__(self, url: str, timeout: float = 10):
+        self.url = url
+        self.timeout = timeout
+
+    def send(self, alerts: List[Dict]):
+        from .lazy import requests
+        requests.post(self.url, json={"alerts": alerts}, timeout=self.timeout).raise_for_status()
+
+
+class EmailSink(Sink):
+    name = 'email'
+
+    def __init__(self, host: str, port: int, sender: str, recipients: List[str],
+                 user: Optional[str] = None, password: Optional[str] = None):
+        self.host = host
+        self.port = port
+        self.sender = sender
+        self.recipients = recipients
+        self.user = user
+        self.password = password
+
+    def send(self, alerts: List[Dict]):
+        message = EmailMessage()
+        message['Subject'] = f"Portfolio alerts: {', '.join(sorted({a['stock_name'] for a in alerts}))}"[:200]
+        message['From'] = self.sender
+        message['To'] = ', '.join(self.recipients)
+        message.set_content('\n'.join(
+            f"{a['reason']}: {a['stock_name']} ({a['ticker']}) at {a['price']:.2f}, level {a['level']:.2f}, "
+            f"portfolio {a['portfolio_id']}" for a in alerts))
+        with smtplib.SMTP(self.host, self.port, timeout=30) as smtp:
+            smtp.starttls()
+            if self.user:
+                smtp.login(self.user, self.password or '')
+            smtp.send_message(message)
+
+
+def create_sinks(names: str = ALERT_SINKS) -> List[Sink]:
+    """Builds the configured sinks, skipping (and logging) those missing their settings."""
+    sinks = []
+    for name in (n.strip() for n in names.split(',') if n.strip()):
+        if name == 'log':
+            sinks.append(LogSink())
+        elif name == 'webhook' and ALERT_WEBHOOK_URL:
+            sinks.append(WebhookSink(ALERT_WEBHOOK_URL))
+        elif name == 'email' and ALERT_SMTP_HOST and ALERT_EMAIL_FROM and ALERT_EMAIL_TO:
+            sinks.append(EmailSink(ALERT_SMTP_HOST, ALERT_SMTP_PORT, ALERT_EMAIL_FROM,
+                                   [r.strip() for r in ALERT_EMAIL_TO.split(',') if r.strip()],
+                                   ALERT_SMTP_USER, ALERT_SMTP_PASSWORD))
+        else:
+            print(f"WARNING: Alert sink '{name}' is unknown or not configured, skipping it")
+    return sinks
+
+
+def holding_triggers(holding: Dict) -> Tuple[List[Trigger], List[Trigger]]:
+    """(levels that fire when the price rises to them, levels that fire when it falls to them) of a holding."""
+    up, down = [], []
+    key = (holding['portfolio_id'], holding['isin'], holding.get('stock_name') or holding['isin'])
+    if holding.get('target'):
+        up.append(key + ('Target Hit', float(holding['target'])))
+    if holding.get('average_buy_price') and holding['average_buy_price'] > 0:
+        up.append(key + ('Returns > 30%', float(holding['average_buy_price']) * RETURN_ALERT_MULTIPLE))
+    if holding.get('stop_loss'):
+        down.append(key + ('Stop Loss Hit', float(holding['stop_loss'])))
+    return up, down
+
+
+class TriggerIndex:
+    """Per-ticker trigger levels, sorted so the levels between two prices are one bisect away."""
+
+    def __init__(self, holdings: Iterable[Dict]):
+        collected: Dict[str, Tuple[List[Trigger], List[Trigger]]] = {}
+        for holding in holdings:
+            ticker = (holding.get('ticker') or '').strip()
+            if not ticker or holding.get('quantity') == 0:
+                continue
+            up, down = holding_triggers(holding)
+            if up or down:
+                levels = collected.setdefault(ticker, ([], []))
+                levels[0].extend(up)
+                levels[1].extend(down)
+        # Format: {ticker: ((up levels, up triggers), (down levels, down triggers))}
+        self._levels = {}
+        for ticker, (up, down) in collected.items():
+            up.sort(key=lambda t: t[4])
+            down.sort(key=lambda t: t[4])
+            self._levels[ticker] = (([t[4] for t in up], up), ([t[4] for t in down], down))
+
+    def __contains__(self, ticker: str) -> bool:
+        return ticker in self._levels
+
+    def __len__(self) -> int:
+        return sum(len(up[1]) + len(down[1]) for up, down in self._levels.values())
+
+    def triggers(self) -> set:
+        return {t for up, down in self._levels.values() for t in up[1] + down[1]}
+
+    def crossed(self, ticker: str, previous: float, price: float) -> List[Trigger]:
+        """
+        Triggers whose level the price reached moving from `previous` to `price`:
+        rising levels in (previous, price], falling levels in [price, previous).
+        """
+        entry = self._levels.get(ticker)
+        if entry is None:
+            return []
+        (up_levels, up), (down_levels, down) = entry
+        fired = []
+        if price > previous:
+            fired += up[bisect_right(up_levels, previous):bisect_right(up_levels, price)]
+        elif price < previous:
+            fired += down[bisect_left(down_levels, price):bisect_left(down_levels, previous)]
+        return fired
+
+
+class AlertEngine:
+    """
+    Fires alerts from quote ticks. The trigger index covers every portfolio and is rebuilt lazily from
+    `load_holdings` after `invalidate()` or ALERT_INDEX_TTL; triggers new to a rebuilt index are checked
+    against the last known price, so a target set below the current price still notifies.
+    A trigger fires again only after the price crossed back and ALERT_COOLDOWN_SECONDS passed.
+    Deduplication state lives in memory, so a ticker's first price in a process only seeds it: levels
+    already past then do not fire again on every restart or serverless instance.
+    """
+
+    def __init__(self, load_holdings: Callable[[], List[Dict]], sinks: Optional[List[Sink]] = None,
+                 cooldown: float = ALERT_COOLDOWN_SECONDS, index_ttl: float = ALERT_INDEX_TTL, metrics=None):
+        self.load_holdings = load_holdings
+        self.sinks = list(sinks if sinks is not None else create_sinks())
+        self.cooldown = cooldown
+        self.index_ttl = index_ttl
+        self.metrics = metrics
+        self.recent = deque(maxlen=RECENT_ALERTS)
+        self._index: Optional[TriggerIndex] = None
+        self._index_ts = 0.0
+        self._index_stale = True
+        self._prices: Dict[str, float] = {}  # Last price evaluated per ticker
+        self._fired: Dict[Trigger, float] = {}  # Format: {trigger: fired at}, for deduplication
+        self._lock = threading.Lock()
+        self._reload_lock = threading.Lock()  # One index load at a time, outside _lock
+        self._delivery: Optional[ThreadPoolExecutor] = None
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.sinks)
+
+    def add_sink(self, sink: Sink):
+        self.sinks.append(sink)
+
+    def invalidate(self):
+        """Rebuilds the trigger index on the next tick, after holdings were written."""
+        self._index_stale = True
+
+    def on_quotes(self, tickers: List[str], prices: List[float], now: Optional[float] = None) -> List[Dict]:
+        """Evaluates a batch of fresh quotes and hands the alerts it fires to the sinks; they are also returned."""
+        if not self.enabled:
+            return []
+        now = now or time.time()
+        fired = []
+        if self._index_stale or now - self._index_ts >= self.index_ttl:
+            fired += self._rebuild(now)
+        with self._lock:
+            index = self._index
+            for ticker, price in zip(tickers, prices):
+                if price != price:  # NaN
+                    continue
+                previous = self._prices.get(ticker)
+                if previous is not None and index is not None and ticker in index:
+                    fired += [(ticker, t, price) for t in index.crossed(ticker, previous, price)]
+                self._prices[ticker] = price
+            alerts = []
+            for ticker, trigger, price in fired:
+                if now - self._fired.get(trigger, float('-inf')) < self.cooldown:
+                    continue
+                self._fired[trigger] = now
+                alerts.append(self._alert(ticker, trigger, price, now))
+            self.recent.extend(alerts)
+        if alerts:
+            self._deliver(alerts)
+        return alerts
+
+    def _rebuild(self, now: float) -> List[Tuple[str, Trigger, float]]:
+        """
+        Reloads the index; returns triggers it didn't have before that the last known price already satisfies.
+        The load reads every portfolio, so it runs outside _lock and the new index is swapped in at the end;
+        ticks meanwhile use the old one, and a tick arriving while another thread loads does not wait.
+        """
+        if not self._reload_lock.acquire(blocking=False):
+            return []
+        try:
+            self._index_stale = False  # Cleared first, so a write during the load triggers another rebuild
+            try:
+                holdings = self.load_holdings()
+            except Exception:
+                self._index_stale = True
+                raise
+            index = TriggerIndex(holdings)
+            with self._lock:
+                # The first index has nothing new: prices seen before it only seed, like first sight
+                previous = self._index.triggers() if self._index is not None else index.triggers()
+                self._index = index
+                self._index_ts = now
+                self._fired = {t: ts for t, ts in self._fired.items() if now - ts < self.cooldown}
+                prices = dict(self._prices)
+        finally:
+            self._reload_lock.release()
+        added = []
+        for holding in holdings:
+            ticker = (holding.get('ticker') or '').strip()
+            price = prices.get(ticker)
+            if price is None or ticker not in index:
+                continue
+            up, down = holding_triggers(holding)
+            added += [(ticker, t, price) for t in up if t not in previous and price >= t[4]]
+            added += [(ticker, t, price) for t in down if t not in previous and price <= t[4]]
+        return added
+
+    def _alert(self, ticker: str, trigger: Trigger, price: float, now: float) -> Dict:
+        portfolio_id, isin, stock_name, reason, level = trigger
+        if self.metrics is not None:
+            self.metrics.inc('portfolio_alerts_total', reason=reason)
+        return {
+            'portfolio_id': portfolio_id, 'isin': isin, 'stock_name': stock_name, 'ticker': ticker,
+            'reason': reason, 'level': level, 'price': price,
+            'fired_at': datetime.fromtimestamp(now, ZoneInfo("UTC")).isoformat(),
+        }
+
+    def _deliver(self, alerts: List[Dict]):
+        if self._delivery is None:
+            # One worker keeps batches in order and a slow webhook off the request path
+            self._delivery = ThreadPoolExecutor(max_workers=1, thread_name_prefix='alert-delivery')
+        for sink in self.sinks:
+            self._delivery.submit(self._send, sink, alerts)
+
+    def _send(self, sink: Sink, alerts: List[Dict]):
+        try:
+            sink.send(alerts)
+        except Exception as e:
+            print(f"Alert sink {sink.name} failed: {e}")
+            if self.metrics is not None:
+                self.metrics.inc('portfolio_upstream_errors_total', upstream=f"alert_{sink.name}")
+
+    def flush(self, timeout: Optional[float] = None):
+        """Waits for alerts handed to the sinks so far to be delivered."""
+        if self._delivery is not None:
+            self._delivery.submit(lambda: None).result(timeout)
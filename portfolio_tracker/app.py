@@ -0,0 +1,318 @@
+from fastapi import Depends, FastAPI, HTTPException, Request, UploadFile, File
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from pydantic import BaseModel
+from typing import Dict, Optional, List
+
+from .export import EXPORT_FORMATS, MEDIA_TYPES, export_chunks, parquet_available
+from .ledger import COST_METHODS
+from .paging import HoldingsQuery
+from .service import LEDGER_COST_METHOD, PortfolioService
+from .simulation import validate_scenarios
+from .tenants import API_KEY_HEADER, DEFAULT_TENANT, RateLimiter, parse_admin_tenants, parse_api_keys
+
+
+class UpdateSettingsRequest(BaseModel):
+    portfolio_id: str
+    isin: str
+    ticker: Optional[str] = None
+    date_of_exit: Optional[str] = None
+    target: Optional[float] = None
+    stop_loss: Optional[float] = None
+    quantity: Optional[int] = None
+    average_buy_price: Optional[float] = None
+
+class AddHoldingRequest(BaseModel):
+    portfolio_id: str
+    isin: str
+    stock_name: str
+    quantity: int
+    average_buy_price: float
+    ticker: Optional[str] = None
+
+class DeleteHoldingsRequest(BaseModel):
+    portfolio_id: str
+    isins: List[str]
+
+class CorporateActionRequest(BaseModel):
+    ticker: str
+    ex_date: str
+    action: str  # split, bonus or dividend
+    ratio: Optional[float] = None  # Shares held after per share before, for splits and bonuses
+    amount: Optional[float] = None  # Dividend per share as paid
+
+class TransactionRequest(BaseModel):
+    portfolio_id: str
+    isin: str
+    type: str  # buy, sell or dividend
+    trade_date: str
+    quantity: Optional[float] = None
+    price: Optional[float] = None
+    fees: float = 0
+    amount: Optional[float] = None  # Dividend received in total
+    stock_name: Optional[str] = None
+    ticker: Optional[str] = None
+
+class DeleteTransactionsRequest(BaseModel):
+    portfolio_id: str
+    ids: List[int]
+
+class ScenarioRequest(BaseModel):
+    name: Optional[str] = None
+    shock: float = 0  # Price change of every holding, -0.1 is a 10% drop
+    shocks: Dict[str, float] = {}  # Per-holding price change by ISIN or ticker
+
+class RebalanceRequest(BaseModel):
+    name: Optional[str] = None
+    weights: Dict[str, float]  # Target weight by ISIN or ticker
+    default_weight: float = 0  # Weight of holdings not in weights
+    cash: float = 0  # Cash added to the current value
+    fractional: bool = False
+
+class SimulationRequest(BaseModel):
+    portfolio_id: str
+    scenarios: List[ScenarioRequest] = []
+    rebalances: List[RebalanceRequest] = []
+
+class CreatePortfolioRequest(BaseModel):
+    name: str
+
+class UpdatePortfolioRequest(BaseModel):
+    name: str
+
+
+def create_app(portfolio_service: PortfolioService, profiling: bool = False, lifespan=None,
+               api_keys: Optional[dict] = None, rate_limiter: Optional[RateLimiter] = None,
+               admin_tenants: Optional[set] = None) -> FastAPI:
+    """
+    Builds the API over a service instance. Deployment adapters pick the runtime
+    strategy (service refresh mode, background work via `lifespan`, profiling).
+    `api_keys` (Format: {api key: tenant}, defaults to TENANT_API_KEYS) scopes every request to a tenant;
+    only `admin_tenants` (defaults to ADMIN_TENANTS) may then write shared market data or read metrics.
+    """
+    app = FastAPI(lifespan=lifespan)
+    api_keys = parse_api_keys() if api_keys is None else api_keys
+    admin_tenants = parse_admin_tenants() if admin_tenants is None else admin_tenants
+    rate_limiter = rate_limiter or RateLimiter()
+
+    def tenant_of(request: Request) -> str:
+        """The caller's tenant; every request is DEFAULT_TENANT when no API keys are configured."""
+        if not api_keys:
+            return DEFAULT_TENANT
+        tenant = api_keys.get(request.headers.get(API_KEY_HEADER, ''))
+        if tenant is None:
+            raise HTTPException(status_code=401, detail="Invalid or missing API key")
+        return tenant
+
+    def admin_of(tenant: str = Depends(tenant_of)) -> str:
+        """The caller's tenant if it may act across tenants: write shared market data or read process-wide metrics."""
+        if api_keys and tenant not in admin_tenants:
+            raise HTTPException(status_code=403, detail="Only admin tenants may do this")
+        return tenant
+
+    def rate_limit_key(request: Request, tenant: str) -> str:
+        # Single-tenant deployments share one tenant, so callers are told apart by address instead
+        if api_keys:
+            return tenant
+        return request.client.host if request.client else DEFAULT_TENANT
+
+    def rate_limited(endpoint: str):
+        def check(request: Request, tenant: str = Depends(tenant_of)):
+            wait = rate_limiter.acquire(rate_limit_key(request, tenant), endpoint)
+            if wait:
+                portfolio_service.metrics.inc('portfolio_rate_limited_total', endpoint=endpoint)
+                raise HTTPException(status_code=429, detail=f"Too many {endpoint} requests",
+                                    headers={"Retry-After": str(max(1, round(wait)))})
+            return tenant
+        return check
+    if profiling:
+        # Opt-in sampling profiler, see profiling.py
+        from .profiling import ProfiledRoute, profiling_middleware
+        app.router.route_class = ProfiledRoute
+        app.middleware("http")(profiling_middleware)
+
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+
+    @app.get("/api/portfolios")
+    def get_portfolios(tenant: str = Depends(tenant_of)):
+        return portfolio_service.get_portfolios(tenant)
+
+    @app.post("/api/portfolios")
+    def create_portfolio(request: CreatePortfolioRequest, tenant: str = Depends(tenant_of)):
+        return portfolio_service.create_portfolio(request.name, tenant)
+
+    @app.put("/api/portfolios/{id}")
+    def rename_portfolio(id: str, request: UpdatePortfolioRequest, tenant: str = Depends(tenant_of)):
+        return portfolio_service.rename_portfolio(id, request.name, tenant)
+
+    @app.delete("/api/portfolios/{id}")
+    def delete_portfolio(id: str, tenant: str = Depends(tenant_of)):
+        return portfolio_service.delete_portfolio(id, tenant)
+
+    def export_response(portfolio_ids: List[str], format: str, filename: str) -> StreamingResponse:
+        if format not in EXPORT_FORMATS:
+            raise HTTPException(status_code=400, detail=f"Unknown export format: {format}")
+        if format == 'parquet' and not parquet_available():
+            raise HTTPException(status_code=400, detail="Parquet export needs pyarrow on the server")
+        return StreamingResponse(
+            export_chunks(portfolio_service.export_holdings(portfolio_ids), format),
+            media_type=MEDIA_TYPES[format],
+            headers={"Content-Disposition": f'attachment; filename="{filename}.{format}"'},
+        )
+
+    @app.get("/api/portfolios/{id}/export")
+    def export_portfolio(id: str, format: str = 'csv', tenant: str = Depends(tenant_of)):
+        """Holdings with the latest quotes and fundamentals, streamed as CSV or Parquet."""
+        if not portfolio_service.owns_portfolio(tenant, id):
+            raise HTTPException(status_code=404, detail="Portfolio not found")
+        return export_response([id], format, f"holdings-{id}")
+
+    @app.get("/api/export")
+    def export_all(format: str = 'csv', tenant: str = Depends(tenant_of)):
+        """Holdings of every portfolio of the tenant in one stream."""
+        return export_response([p['id'] for p in portfolio_service.get_portfolios(tenant)], format, "holdings")
+
+    @app.get("/api/holdings")
+    def get_holdings(request: Request, portfolio_id: str, sort: Optional[str] = None, order: str = 'desc',
+                     cursor: Optional[str] = None, limit: Optional[int] = None,
+                     state: Optional[str] = None, q: Optional[str] = None,
+                     min_return: Optional[float] = None, max_return: Optional[float] = None,
+                     min_day_change: Optional[float] = None, max_day_change: Optional[float] = None,
+                     tenant: str = Depends(tenant_of)):
+        """
+        Without query parameters returns every holding. With any of them, holdings are filtered
+        and sorted server-side and `limit` rows are returned with `total`, `summary` and `next_cursor`.
+        Callers over their refresh budget are served the cached quotes.
+        """
+        try:
+            query = HoldingsQuery(sort, order, cursor, limit, state, q,
+                                  min_return, max_return, min_day_change, max_day_change)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        refresh = None
+        if portfolio_service.refresh_on_read and rate_limiter.acquire(rate_limit_key(request, tenant), 'refresh'):
+            portfolio_service.metrics.inc('portfolio_rate_limited_total', endpoint='refresh')
+            refresh = False
+        return portfolio_service.get_holdings(portfolio_id, refresh=refresh, query=query, tenant_id=tenant)
+
+    @app.post("/api/holdings/add")
+    def add_holding(request: AddHoldingRequest, tenant: str = Depends(tenant_of)):
+        return portfolio_service.add_holding(request.dict(), tenant)
+
+    @app.post("/api/holdings/delete-bulk")
+    def delete_holdings(request: DeleteHoldingsRequest, tenant: str = Depends(tenant_of)):
+        return portfolio_service.delete_holdings(request.portfolio_id, request.isins, tenant)
+
+    @app.post("/api/settings")
+    def update_settings(request: UpdateSettingsRequest, tenant: str = Depends(tenant_of)):
+        return portfolio_service.update_holding_settings(
+            request.portfolio_id,
+            request.isin,
+            request.ticker,
+            request.date_of_exit,
+            request.target,
+            request.stop_loss,
+            request.quantity,
+            request.average_buy_price,
+            tenant
+        )
+
+    @app.post("/api/discover")
+    def auto_discover(portfolio_id: Optional[str] = None, tenant: str = Depends(rate_limited('discover'))):
+        result = portfolio_service.auto_discover_all(portfolio_id, tenant)
+        return result
+
+    @app.post("/api/upload")
+    async def upload_file(file: UploadFile = File(...), portfolio_id: Optional[str] = None,
+                          tenant: str = Depends(rate_limited('upload'))):
+        if not file.filename.endswith('.xlsx') and not file.filename.endswith('.xls'):
+            raise HTTPException(status_code=400, detail="Invalid file format. Please upload an Excel file.")
+        if portfolio_id and not portfolio_service.owns_portfolio(tenant, portfolio_id):
+            raise HTTPException(status_code=404, detail="Portfolio not found")
+
+        content = await file.read()
+        portfolio_service.save_excel_file(content, portfolio_id, tenant)
+        return {"message": "Portfolio updated successfully"}
+
+    @app.get("/api/corporate-actions", dependencies=[Depends(tenant_of)])
+    def get_corporate_actions(ticker: str):
+        return portfolio_service.get_corporate_actions(ticker)
+
+    @app.post("/api/corporate-actions", dependencies=[Depends(admin_of)])
+    def add_corporate_actions(actions: List[CorporateActionRequest]):
+        return portfolio_service.add_corporate_actions([a.dict() for a in actions])
+
+    @app.post("/api/corporate-actions/sync")
+    def sync_corporate_actions(portfolio_id: Optional[str] = None, tenant: str = Depends(rate_limited('discover'))):
+        return portfolio_service.sync_corporate_actions(portfolio_id, tenant)
+
+    @app.get("/api/transactions")
+    def get_transactions(portfolio_id: str, isin: Optional[str] = None, tenant: str = Depends(tenant_of)):
+        return portfolio_service.get_transactions(portfolio_id, isin, tenant)
+
+    @app.post("/api/transactions")
+    def add_transactions(transactions: List[TransactionRequest], tenant: str = Depends(tenant_of)):
+        return portfolio_service.add_transactions([t.dict() for t in transactions], tenant)
+
+    @app.post("/api/transactions/delete-bulk")
+    def delete_transactions(request: DeleteTransactionsRequest, tenant: str = Depends(tenant_of)):
+        return portfolio_service.delete_transactions(request.portfolio_id, request.ids, tenant)
+
+    @app.get("/api/positions")
+    def get_positions(portfolio_id: str, method: Optional[str] = None, include_closed: bool = False,
+                      tenant: str = Depends(tenant_of)):
+        method = method or LEDGER_COST_METHOD
+        if method not in COST_METHODS:
+            raise HTTPException(status_code=400, detail=f"Unknown cost method: {method}")
+        return portfolio_service.get_positions(portfolio_id, method, include_closed, tenant)
+
+    @app.post("/api/simulate")
+    def simulate(request: SimulationRequest, tenant: str = Depends(tenant_of)):
+        scenarios = [s.dict() for s in request.scenarios]
+        try:
+            validate_scenarios(scenarios)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        return portfolio_service.simulate(request.portfolio_id, scenarios, [r.dict() for r in request.rebalances], tenant)
+
+    @app.get("/api/risk")
+    def get_risk(portfolio_id: str, tenant: str = Depends(tenant_of)):
+        return portfolio_service.get_risk(portfolio_id, tenant)
+
+    @app.get("/api/alerts")
+    def get_alerts(portfolio_id: Optional[str] = None, limit: int = 100, tenant: str = Depends(tenant_of)):
+        return portfolio_service.get_alerts(portfolio_id, limit, tenant)
+
+    @app.get("/health")
+    def health_check():
+        return {"status": "ok"}
+
+    # Metrics cover every tenant's requests
+    @app.get("/metrics", response_class=PlainTextResponse, dependencies=[Depends(admin_of)])
+    def metrics():
+        return PlainTextResponse(portfolio_service.render_metrics(), media_type="text/plain; version=0.0.4")
+
+    if profiling:
+        from .profiling import profile_store, token_ok
+
+        @app.get("/debug/profiles")
+        def list_profiles(token: Optional[str] = None):
+            if not token_ok(token):
+                raise HTTPException(status_code=404, detail="Not Found")
+            return profile_store.list()
+
+        @app.get("/debug/profiles/{profile_id}", response_class=PlainTextResponse)
+        def get_profile(profile_id: str, token: Optional[str] = None):
+            """Collapsed stacks of a profiled request, ready for flamegraph.pl or speedscope."""
+            profile = profile_store.get(profile_id) if token_ok(token) else None
+            if profile is None:
+                raise HTTPException(status_code=404, detail="Not Found")
+            return PlainTextResponse(profile.collapsed())
+
+    return app
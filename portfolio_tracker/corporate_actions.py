@@ -0,0 +1,110 @@
+"""
+Corporate actions (splits, bonuses, dividends) and the adjustment factors derived from them.
+A holding's quantity, cost basis, target and stop loss are recorded as of its `basis_date`;
+every action with a later ex-date restates them.
+"""
+from __future__ import annotations
+
+import threading
+from bisect import bisect_right
+from typing import Dict, List, Optional, Tuple
+
+# Split and bonus rows carry `ratio` (shares held after the action per share before it,
+# e.g. 2 for a 1:1 bonus or a 2-for-1 split); dividend rows carry `amount` per share as paid.
+ACTION_TYPES = ('split', 'bonus', 'dividend')
+NO_ADJUSTMENT = (1.0, 0.0)
+
+
+class CorporateActions:
+    """
+    Per-ticker adjustment tables, precomputed when a ticker's actions are loaded so that
+    restating a holding is one lookup: (quantity factor, dividends per current share) of
+    every action after the holding's basis date.
+    """
+
+    def __init__(self):
+        # Format: {ticker: (ex dates ascending, [(quantity factor, dividends per current share) from each ex date on])}
+        self._tables: Dict[str, Tuple[List[str], List[Tuple[float, float]]]] = {}
+        self._splits: Dict[str, List[Tuple[str, float]]] = {}  # Format: {ticker: [(ex date, ratio)] ascending}
+        self._loaded: Dict[str, float] = {}  # Format: {ticker: loaded at}
+        self._lock = threading.Lock()
+
+    def is_fresh(self, ticker: str, now: float, ttl: float) -> bool:
+        loaded_at = self._loaded.get(ticker)
+        return loaded_at is not None and now - loaded_at < ttl
+
+    def invalidate(self, ticker: Optional[str] = None):
+        with self._lock:
+            if ticker is None:
+                self._loaded.clear()
+            else:
+                self._loaded.pop(ticker, None)
+
+    def load(self, ticker: str, actions: List[Dict], now: float):
+        """Replaces a ticker's table with one built from all of its actions."""
+        dates: List[str] = []
+        steps: List[Tuple[float, float]] = []
+        splits: List[Tuple[str, float]] = []
+        factor, dividends = NO_ADJUSTMENT
+        # Walk from the newest action back, so each step holds the combined effect of it and everything after it
+        for action in sorted(actions, key=lambda a: str(a['ex_date']), reverse=True):
+            kind = action.get('action')
+            if kind in ('split', 'bonus') and (action.get('ratio') or 0) > 0:
+                factor *= float(action['ratio'])
+                splits.append((str(action['ex_date'])[:10], float(action['ratio'])))
+            elif kind == 'dividend' and action.get('amount'):
+                # Paid per share held at the time, which later splits and bonuses have since multiplied
+                dividends += float(action['amount']) / factor
+            else:
+                continue
+            dates.append(str(action['ex_date'])[:10])
+            steps.append((factor, dividends))
+        dates.reverse()
+        steps.reverse()
+        splits.reverse()
+        with self._lock:
+            if dates:
+                self._tables[ticker] = (dates, steps)
+            else:
+                self._tables.pop(ticker, None)
+            if splits:
+                self._splits[ticker] = splits
+            else:
+                self._splits.pop(ticker, None)
+            self._loaded[ticker] = now
+
+    def factors(self, ticker: str, basis_date: Optional[str]) -> Tuple[float, float]:
+        """(quantity factor, dividends per current share) of the actions after `basis_date`."""
+        table = self._tables.get(ticker)
+        if table is None or not basis_date:
+            return NO_ADJUSTMENT
+        dates, steps = table
+        i = bisect_right(dates, str(basis_date)[:10])
+        return steps[i] if i < len(steps) else NO_ADJUSTMENT
+
+    def splits(self, ticker: str) -> List[Tuple[str, float]]:
+        """(ex date, ratio) of a ticker's splits and bonuses, oldest first, for folding into its trades."""
+        return self._splits.get(ticker, [])
+
+
+def actions_from_yahoo(ticker: str, actions) -> List[Dict]:
+    """
+    Rows for the corporate_actions table from a yfinance `Ticker.actions` frame
+    (Dividends, Stock Splits). Yahoo quotes dividends per current share, so they are
+    scaled back to the amount paid per share held on the ex-date.
+    """
+    if actions is None or actions.empty:
+        return []
+    rows = []
+    later_ratio = 1.0
+    for ex_date, row in actions.sort_index(ascending=False).iterrows():
+        ex_date = ex_date.date().isoformat()
+        split = float(row.get('Stock Splits') or 0)
+        dividend = float(row.get('Dividends') or 0)
+        if dividend > 0:
+            rows.append({'ticker': ticker, 'ex_date': ex_date, 'action': 'dividend', 'ratio': None,
+                         'amount': dividend * later_ratio})
+        if split > 0 and split != 1:
+            rows.append({'ticker': ticker, 'ex_date': ex_date, 'action': 'split', 'ratio': split, 'amount': None})
+            later_ratio *= split
+    return rows
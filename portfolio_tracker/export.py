@@ -0,0 +1,113 @@
+"""
+Streaming holdings exports. Writers consume holdings in batches and yield encoded chunks,
+so an export of any size only keeps one batch in memory. Parquet needs the optional
+pyarrow package; CSV has no dependencies.
+"""
+import csv
+import importlib.util
+import io
+from typing import Dict, Iterable, Iterator, List
+
+from .fundamentals import FUNDAMENTAL_FIELDS
+
+EXPORT_FORMATS = ('csv', 'parquet')
+MEDIA_TYPES = {'csv': 'text/csv', 'parquet': 'application/vnd.apache.parquet'}
+
+# Format: [(column, type)], the fixed schema of every export, in output order
+EXPORT_COLUMNS = [
+    ('portfolio_id', 'str'), ('isin', 'str'), ('stock_name', 'str'), ('ticker', 'str'),
+    ('quantity', 'float'), ('average_buy_price', 'float'), ('current_price', 'float'),
+    ('day_change_amount', 'float'), ('day_change_percent', 'float'), ('total_return_percent', 'float'),
+    ('state', 'str'), ('state_reason', 'str'), ('target', 'float'), ('stop_loss', 'float'),
+    ('date_of_exit', 'str'), ('basis_date', 'str'), ('adjustment_factor', 'float'),
+    ('dividends_per_share', 'float'), ('is_cached', 'bool'),
+] + [(field, 'float') for field in FUNDAMENTAL_FIELDS]
+
+
+def parquet_available() -> bool:
+    # Checked without importing, pyarrow is only loaded by a Parquet export
+    return importlib.util.find_spec('pyarrow') is not None
+
+
+def _cell(value, kind: str):
+    """A holding's value as the column type, None when missing."""
+    if value is None or value == '':
+        return None
+    try:
+        if kind == 'float':
+            value = float(value)
+            return None if value != value else value  # NaN
+        if kind == 'bool':
+            return bool(value)
+        return str(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def csv_chunks(batches: Iterable[List[Dict]]) -> Iterator[bytes]:
+    """UTF-8 CSV: the header, then one chunk per batch."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([name for name, _ in EXPORT_COLUMNS])
+    yield buffer.getvalue().encode('utf-8')
+    for batch in batches:
+        buffer.seek(0)
+        buffer.truncate()
+        for holding in batch:
+            writer.writerow(['' if v is None else v for v in (_cell(holding.get(name), kind) for name, kind in EXPORT_COLUMNS)])
+        yield buffer.getvalue().encode('utf-8')
+
+
+class _ChunkSink:
+    """Write-only file that hands out what was written since the last drain, for streaming a ParquetWriter."""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data, self._chunks = b''.join(self._chunks), []
+        return data
+
+
+def parquet_chunks(batches: Iterable[List[Dict]]) -> Iterator[bytes]:
+    """Parquet with one row group per batch, yielded as each row group is written."""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Parquet export needs pyarrow (pip install pyarrow)")
+    types = {'str': pa.string(), 'float': pa.float64(), 'bool': pa.bool_()}
+    schema = pa.schema([(name, types[kind]) for name, kind in EXPORT_COLUMNS])
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema)
+    try:
+        for batch in batches:
+            columns = [[_cell(holding.get(name), kind) for holding in batch] for name, kind in EXPORT_COLUMNS]
+            writer.write_table(pa.Table.from_arrays([pa.array(c, type=f.type) for c, f in zip(columns, schema)], schema=schema))
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+def export_chunks(batches: Iterable[List[Dict]], fmt: str) -> Iterator[bytes]:
+    if fmt == 'parquet':
+        return parquet_chunks(batches)
+    return csv_chunks(batches)
@@ -0,0 +1,138 @@
+"""
+Fundamentals in two tiers fetched on their own schedules: valuation inputs from
+`Ticker.info` (daily) and annual statement series (long TTL, or a new fiscal year).
+Ratios are derived for many tickers at once: growth from the statement series, and
+PE, market cap, PEG and D/E from the live price at read time.
+"""
+from __future__ import annotations
+
+import math
+from typing import Dict, List, Optional, Tuple
+
+from .lazy import np, pd
+
+# Fields every holding carries, None when unknown
+FUNDAMENTAL_FIELDS = [
+    'peg_ratio', 'debt_to_equity', 'pe_ratio', 'market_cap',
+    'sales_growth_3y', 'sales_growth_5y', 'eps_growth_3y', 'eps_growth_5y',
+]
+VALUATION_FIELDS = [
+    'trailing_eps', 'shares_outstanding', 'book_value', 'total_debt',
+    'pe_ratio', 'market_cap', 'peg_ratio', 'debt_to_equity', 'fiscal_year_end',
+]
+# Format: {series: income statement rows in order of preference}
+STATEMENT_ROWS = {
+    'sales': ['Total Revenue'],
+    'eps': ['Diluted EPS', 'Basic EPS', 'Net Income Common Stockholders'],
+}
+GROWTH_YEARS = (3, 5)
+GROWTH_FIELDS = [f"{series}_growth_{years}y" for series in STATEMENT_ROWS for years in GROWTH_YEARS]
+
+
+def valuation_from_info(info: Dict) -> Dict:
+    """Daily tier: per-share inputs for price-derived ratios, plus Yahoo's own snapshot as a fallback."""
+    return {
+        'trailing_eps': info.get('trailingEps'),
+        'shares_outstanding': info.get('sharesOutstanding'),
+        'book_value': info.get('bookValue'),  # Per share
+        'total_debt': info.get('totalDebt'),
+        'pe_ratio': info.get('trailingPE') or info.get('forwardPE'),
+        'market_cap': info.get('marketCap'),
+        'peg_ratio': info.get('pegRatio'),
+        'debt_to_equity': info.get('debtToEquity'),
+        'fiscal_year_end': info.get('lastFiscalYearEnd'),  # Epoch seconds, tells when new statements are due
+    }
+
+
+def statements_from_financials(financials: pd.DataFrame) -> Dict:
+    """Long-lived tier: annual sales and EPS series from the income statement, newest year first."""
+    data = {series: [] for series in STATEMENT_ROWS}
+    data['fiscal_year_end'] = None
+    if financials is None or financials.empty:
+        return data
+    financials = financials[sorted(financials.columns, reverse=True)]
+    data['fiscal_year_end'] = financials.columns[0].timestamp()
+    for series, rows in STATEMENT_ROWS.items():
+        # The first row with the most reported years, older years are often missing
+        candidates = [financials.loc[row].astype(float) for row in rows if row in financials.index]
+        if candidates:
+            data[series] = max(candidates, key=lambda values: values.notna().sum()).tolist()
+    return data
+
+
+def valuation_vector(valuation: Optional[Dict]) -> Tuple[float, ...]:
+    """A valuation tier as floats in VALUATION_FIELDS order, NaN for unknown values."""
+    values = []
+    for field in VALUATION_FIELDS:
+        value = (valuation or {}).get(field)
+        values.append(float(value) if isinstance(value, (int, float)) else math.nan)
+    return tuple(values)
+
+
+def is_new_fiscal_year(valuation: Optional[Dict], statements: Dict) -> bool:
+    """True once Yahoo reports a fiscal year end later than the newest statement column we hold."""
+    reported = valuation and valuation.get('fiscal_year_end')
+    return bool(reported and statements.get('fiscal_year_end') and reported > statements['fiscal_year_end'])
+
+
+def cagr(values: np.ndarray, years: int) -> np.ndarray:
+    """Row-wise CAGR in percent from column `years` to column 0 (newest); NaN unless both ends are positive."""
+    if values.shape[1] <= years:
+        return np.full(values.shape[0], np.nan)
+    end, start = values[:, 0], values[:, years]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rate = ((end / start) ** (1 / years) - 1) * 100
+    return np.where((start > 0) & (end > 0), rate, np.nan)
+
+
+def growth_table(statements: Dict[str, Dict]) -> pd.DataFrame:
+    """
+    3Y/5Y sales and EPS growth of every ticker in one vectorized pass.
+    Format: {ticker: statements tier} -> frame indexed by ticker with GROWTH_FIELDS.
+    """
+    tickers = list(statements)
+    width = max(GROWTH_YEARS) + 1
+    columns = {}
+    for series in STATEMENT_ROWS:
+        # Ragged yearly series are padded with NaN into a tickers x years matrix
+        values = pd.DataFrame([statements[t].get(series) or [] for t in tickers], index=tickers)
+        values = values.reindex(columns=range(width)).to_numpy(dtype=float)
+        for years in GROWTH_YEARS:
+            columns[f"{series}_growth_{years}y"] = cagr(values, years)
+    return pd.DataFrame(columns, index=pd.Index(tickers, dtype=object), columns=GROWTH_FIELDS)
+
+
+def fundamentals_table(valuations: np.ndarray, growth: pd.DataFrame, prices) -> Dict[str, np.ndarray]:
+    """
+    Ratios for rows of (valuation vector, growth row, live price), all aligned by position.
+    PE and market cap follow the price where EPS and share count are known; Yahoo's snapshot is the fallback.
+    Returns {field: column} for FUNDAMENTAL_FIELDS.
+    """
+    col = dict(zip(VALUATION_FIELDS, valuations.reshape(-1, len(VALUATION_FIELDS)).T))
+    price = np.asarray(prices, dtype=float)
+    eps_growth = growth['eps_growth_3y'].to_numpy(dtype=float)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        pe = np.where(col['trailing_eps'] > 0, price / col['trailing_eps'], np.nan)
+        market_cap = price * col['shares_outstanding']
+        # Yahoo reports D/E in percent
+        equity = col['book_value'] * col['shares_outstanding']
+        debt_to_equity = np.where(equity > 0, col['total_debt'] / equity * 100, np.nan)
+        pe = np.where(np.isnan(pe), col['pe_ratio'], pe)
+        market_cap = np.where(np.isnan(market_cap), col['market_cap'], market_cap)
+        debt_to_equity = np.where(np.isnan(debt_to_equity), col['debt_to_equity'], debt_to_equity)
+        # Manual PEG where Yahoo has none, only for positive growth
+        peg = np.where(np.isnan(col['peg_ratio']) | (col['peg_ratio'] == 0),
+                       np.where(eps_growth > 0, pe / eps_growth, np.nan), col['peg_ratio'])
+
+    return {
+        'peg_ratio': peg, 'debt_to_equity': debt_to_equity, 'pe_ratio': pe, 'market_cap': market_cap,
+        **{field: growth[field].to_numpy(dtype=float) for field in GROWTH_FIELDS},
+    }
+
+
+def table_records(table: Dict[str, np.ndarray]) -> List[Dict]:
+    """Rows of a {field: column} table as dicts with None instead of NaN, ready for JSON."""
+    fields = list(table)
+    columns = [[None if math.isnan(v) else v for v in table[field].tolist()] for field in fields]
+    return [dict(zip(fields, row)) for row in zip(*columns)]
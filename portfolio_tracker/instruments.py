@@ -0,0 +1,162 @@
+"""
+Offline NSE/BSE instrument master: resolves ISINs and company names to Yahoo tickers
+from a local file instead of Yahoo search.
+
+Rebuild the master from the exchanges' equity lists (paths or URLs):
+
+    python -m portfolio_tracker.instruments --nse EQUITY_L.csv --bse ListOfScrips.csv
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import io
+import os
+import re
+from difflib import SequenceMatcher
+from typing import Dict, Iterable, List, Optional
+
+INSTRUMENTS_PATH = os.environ.get("INSTRUMENTS_PATH", os.path.join(os.path.dirname(__file__), '..', 'instruments.csv'))
+NSE_EQUITY_URL = "https://nsearchives.nseindia.com/content/equities/EQUITY_L.csv"
+MASTER_COLUMNS = ['isin', 'exchange', 'symbol', 'name', 'series']
+# Format: {exchange: Yahoo ticker suffix}, earlier exchanges are preferred for an ISIN listed on both
+YAHOO_SUFFIXES = {'NSE': '.NS', 'BSE': '.BO'}
+# Rolling-settlement series rank above trade-for-trade (BE, BZ) and other NSE series
+NSE_SERIES_RANK = {'EQ': 0, 'BE': 1, 'BZ': 2}
+# Legal-form words that brokers abbreviate, truncate or drop
+NAME_STOPWORDS = {'LIMITED', 'LTD', 'THE', 'CO', 'COMPANY', 'CORPORATION', 'CORP', 'INC', 'PVT', 'PRIVATE', 'AND'}
+NAME_MATCH_THRESHOLD = 0.82
+_NON_ALNUM = re.compile(r'[^A-Z0-9]+')
+
+
+def normalize_name(name: str) -> str:
+    """Upper-cased alphanumeric tokens of a company name without legal-form words."""
+    tokens = _NON_ALNUM.sub(' ', (name or '').upper().replace('&', ' AND ')).split()
+    return ' '.join(t for t in tokens if t not in NAME_STOPWORDS)
+
+
+def _rank(instrument: Dict) -> tuple:
+    exchanges = list(YAHOO_SUFFIXES)
+    return (exchanges.index(instrument['exchange']), NSE_SERIES_RANK.get(instrument['series'], len(NSE_SERIES_RANK)))
+
+
+class InstrumentMaster:
+    """In-memory indexes over the master: by ISIN, by normalized name, and by name token for fuzzy matches."""
+
+    def __init__(self, rows: Iterable[Dict]):
+        self._by_isin: Dict[str, Dict] = {}
+        self._by_name: Dict[str, Dict] = {}
+        for row in rows:
+            suffix = YAHOO_SUFFIXES.get(row.get('exchange'))
+            if not suffix or not row.get('isin') or not row.get('symbol'):
+                continue
+            instrument = dict(row, ticker=f"{row['symbol']}{suffix}", key=normalize_name(row.get('name', '')))
+            for index, key in ((self._by_isin, instrument['isin']), (self._by_name, instrument['key'])):
+                if key and (key not in index or _rank(instrument) < _rank(index[key])):
+                    index[key] = instrument
+        self._tokens: Dict[str, List[str]] = {}  # Format: {name token: [normalized names containing it]}
+        for key in self._by_name:
+            for token in set(key.split()):
+                self._tokens.setdefault(token, []).append(key)
+
+    def __len__(self) -> int:
+        return len(self._by_isin)
+
+    @classmethod
+    def load(cls, path: str = INSTRUMENTS_PATH) -> 'InstrumentMaster':
+        """Reads a master written by `build_master`; a missing file gives an empty master."""
+        try:
+            with open(path, newline='', encoding='utf-8') as f:
+                return cls(csv.DictReader(f))
+        except FileNotFoundError:
+            return cls([])
+
+    def resolve(self, isin: str, name: Optional[str] = None) -> Optional[Dict]:
+        """Looks up an instrument by ISIN, then by exact and fuzzy name."""
+        instrument = self._by_isin.get((isin or '').strip().upper())
+        if instrument or not name:
+            return instrument
+        return self.match_name(name)
+
+    def match_name(self, name: str, threshold: float = NAME_MATCH_THRESHOLD) -> Optional[Dict]:
+        key = normalize_name(name)
+        if not key:
+            return None
+        if key in self._by_name:
+            return self._by_name[key]
+        # Candidates share the query's two rarest tokens, so common words don't widen the scan
+        tokens = sorted((t for t in set(key.split()) if t in self._tokens), key=lambda t: len(self._tokens[t]))[:2]
+        candidates = {c for t in tokens for c in self._tokens[t]}
+        best, best_score = None, 0.0
+        for candidate in sorted(candidates):
+            score = SequenceMatcher(None, key, candidate).ratio()
+            if score >= threshold and score > best_score:
+                best, best_score = candidate, score
+        return self._by_name[best] if best else None
+
+
+def parse_nse(text: str) -> List[Dict]:
+    """Rows of NSE's EQUITY_L.csv (SYMBOL, NAME OF COMPANY, SERIES, ..., ISIN NUMBER)."""
+    rows = []
+    for row in csv.DictReader(io.StringIO(text)):
+        row = {k.strip().upper(): (v or '').strip() for k, v in row.items() if k}
+        if row.get('ISIN NUMBER') and row.get('SYMBOL'):
+            rows.append({'isin': row['ISIN NUMBER'], 'exchange': 'NSE', 'symbol': row['SYMBOL'],
+                         'name': row.get('NAME OF COMPANY', ''), 'series': row.get('SERIES', '')})
+    return rows
+
+
+def parse_bse(text: str) -> List[Dict]:
+    """Active equity rows of BSE's scrip list (Security Id, Security Name, Status, Group, ISIN No, Instrument)."""
+    rows = []
+    for row in csv.DictReader(io.StringIO(text)):
+        row = {k.strip().upper(): (v or '').strip() for k, v in row.items() if k}
+        if row.get('STATUS', 'Active') != 'Active' or row.get('INSTRUMENT', 'Equity') != 'Equity':
+            continue
+        if row.get('ISIN NO') and row.get('SECURITY ID'):
+            rows.append({'isin': row['ISIN NO'], 'exchange': 'BSE', 'symbol': row['SECURITY ID'],
+                         'name': row.get('SECURITY NAME') or row.get('ISSUER NAME', ''), 'series': row.get('GROUP', '')})
+    return rows
+
+
+def read_source(source: str) -> str:
+    """Contents of a local file or a URL; NSE rejects requests without a browser User-Agent."""
+    if source.startswith(('http://', 'https://')):
+        from .lazy import requests
+        headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'}
+        response = requests.get(source, headers=headers, timeout=30)
+        response.raise_for_status()
+        return response.text
+    with open(source, encoding='utf-8-sig') as f:
+        return f.read()
+
+
+def build_master(rows: List[Dict], path: str = INSTRUMENTS_PATH):
+    """Writes the master atomically, so running servers never read a half-written file."""
+    tmp = f"{path}.tmp"
+    with open(tmp, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=MASTER_COLUMNS, extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows(rows)
+    os.replace(tmp, path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuilds the offline NSE/BSE instrument master.")
+    parser.add_argument('--nse', default=NSE_EQUITY_URL, help="EQUITY_L.csv path or URL")
+    parser.add_argument('--bse', help="BSE scrip list CSV path or URL (optional)")
+    parser.add_argument('--output', default=INSTRUMENTS_PATH)
+    args = parser.parse_args()
+
+    rows = parse_nse(read_source(args.nse))
+    print(f"NSE: {len(rows)} instruments")
+    if args.bse:
+        bse = parse_bse(read_source(args.bse))
+        print(f"BSE: {len(bse)} instruments")
+        rows += bse
+    build_master(rows, args.output)
+    print(f"Wrote {len(InstrumentMaster(rows))} ISINs to {os.path.abspath(args.output)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,27 @@
+"""
+Deferred imports for the heavy market-data stack. yfinance, pandas and numpy are
+bound to proxies that import on first attribute access, so a cold start that only
+serves /health or portfolio CRUD never pays for them.
+"""
+import importlib
+
+
+class LazyModule:
+    """Stands in for a heavy module and imports it on first attribute access."""
+
+    def __init__(self, name: str):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr: str):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        value = getattr(self._module, attr)
+        setattr(self, attr, value)  # Later lookups skip __getattr__ entirely
+        return value
+
+
+yf = LazyModule("yfinance")
+np = LazyModule("numpy")
+pd = LazyModule("pandas")
+requests = LazyModule("requests")
@@ -0,0 +1,186 @@
+"""
+Transaction ledger: positions, average cost (FIFO and weighted) and realized P&L
+folded from buy, sell and dividend transactions. Splits and bonuses between trades are
+folded in by ex-date. Folded state is materialized as a position snapshot per ISIN,
+so a rebuild only folds transactions recorded after it.
+"""
+from __future__ import annotations
+
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+TRANSACTION_TYPES = ('buy', 'sell', 'dividend')
+COST_METHODS = ('fifo', 'weighted')
+_EPSILON = 1e-9  # Quantities below this count as a closed position
+
+# Format: ticker -> [(ex date, ratio)] oldest first, see CorporateActions.splits
+Splits = Callable[[str], List[Tuple[str, float]]]
+
+
+def _no_splits(ticker: str) -> List[Tuple[str, float]]:
+    return []
+
+
+def transaction_order(txn: Dict) -> tuple:
+    """Ledger order: trade date, then recording order for trades on the same day."""
+    return (str(txn['trade_date'])[:10], txn['id'])
+
+
+class Position:
+    """Running state of one ISIN's transactions. Both cost methods are kept, so either can be read."""
+
+    def __init__(self, isin: str, stock_name: Optional[str] = None, ticker: Optional[str] = None):
+        self.isin = isin
+        self.stock_name = stock_name
+        self.ticker = ticker
+        self.quantity = 0.0
+        self.lots: List[List[float]] = []  # Format: [[quantity, cost per share incl. fees]] oldest first, for FIFO
+        self.weighted_cost = 0.0  # Total cost of the open quantity at the running average
+        self.realized_fifo = 0.0
+        self.realized_weighted = 0.0
+        self.dividends = 0.0
+        self.last_id = 0  # Highest transaction id folded in
+        self.last_date = ''  # Latest trade date folded in, a transaction dated before it needs a replay
+        self.split_factor = 1.0  # Product of the splits and bonuses folded in, up to last_date
+
+    def split(self, ratio: float):
+        """Restates the open quantity and lot costs for a split or bonus; total cost is unchanged."""
+        self.quantity *= ratio
+        self.lots = [[q * ratio, c / ratio] for q, c in self.lots]
+        self.split_factor *= ratio
+
+    def apply(self, txn: Dict, splits: Splits = _no_splits):
+        """
+        Folds one transaction, after the splits of its ticker with an ex-date since the last folded trade.
+        Sells beyond the open quantity only close what is held.
+        """
+        trade_date = str(txn['trade_date'])[:10]
+        for ex_date, ratio in splits((txn.get('ticker') or self.ticker or '').strip()):
+            if self.last_date < ex_date <= trade_date:
+                self.split(ratio)
+        kind = txn['type']
+        quantity = float(txn.get('quantity') or 0)
+        price = float(txn.get('price') or 0)
+        fees = float(txn.get('fees') or 0)
+        if kind == 'buy' and quantity > 0:
+            self.quantity += quantity
+            self.lots.append([quantity, price + fees / quantity])
+            self.weighted_cost += quantity * price + fees
+        elif kind == 'sell' and quantity > 0:
+            sold = min(quantity, self.quantity)
+            if sold > 0:
+                proceeds = sold * price - fees * sold / quantity
+                self.realized_fifo += proceeds - self._consume_lots(sold)
+                average = self.weighted_cost / self.quantity
+                self.realized_weighted += proceeds - average * sold
+                self.weighted_cost -= average * sold
+                self.quantity -= sold
+                if self.quantity < _EPSILON:
+                    self.quantity, self.lots, self.weighted_cost = 0.0, [], 0.0
+        elif kind == 'dividend':
+            self.dividends += float(txn.get('amount') or quantity * price)
+        self.stock_name = txn.get('stock_name') or self.stock_name
+        self.ticker = txn.get('ticker') or self.ticker
+        self.last_id = max(self.last_id, txn['id'])
+        self.last_date = max(self.last_date, trade_date)
+
+    def _consume_lots(self, quantity: float) -> float:
+        """Removes `quantity` from the oldest lots and returns its cost."""
+        cost = 0.0
+        while quantity > _EPSILON and self.lots:
+            lot = self.lots[0]
+            taken = min(quantity, lot[0])
+            cost += taken * lot[1]
+            lot[0] -= taken
+            quantity -= taken
+            if lot[0] < _EPSILON:
+                self.lots.pop(0)
+        return cost
+
+    def average_cost(self, method: str = 'fifo') -> Optional[float]:
+        if self.quantity <= 0:
+            return None
+        if method == 'weighted':
+            return self.weighted_cost / self.quantity
+        return sum(q * c for q, c in self.lots) / self.quantity
+
+    def summary(self, method: str = 'fifo', factor: float = 1.0) -> Dict:
+        """Totals by `method`; `factor` restates quantity and cost for splits after the last trade."""
+        average = self.average_cost(method)
+        return {
+            'isin': self.isin,
+            'stock_name': self.stock_name,
+            'ticker': self.ticker,
+            'quantity': self.quantity * factor,
+            'average_cost': average / factor if average is not None else None,
+            'invested': average * self.quantity if average is not None else 0.0,
+            'realized_pnl': self.realized_weighted if method == 'weighted' else self.realized_fifo,
+            'dividends': self.dividends,
+            'last_trade_date': self.last_date or None,
+            'method': method,
+        }
+
+    def to_snapshot(self, portfolio_id: str) -> Dict:
+        return {
+            'portfolio_id': portfolio_id, 'isin': self.isin, 'stock_name': self.stock_name, 'ticker': self.ticker,
+            'quantity': self.quantity, 'lots': [list(lot) for lot in self.lots], 'weighted_cost': self.weighted_cost,
+            'realized_fifo': self.realized_fifo, 'realized_weighted': self.realized_weighted,
+            'dividends': self.dividends, 'last_id': self.last_id, 'last_date': self.last_date or None,
+            'split_factor': self.split_factor,
+        }
+
+    @classmethod
+    def from_snapshot(cls, row: Dict) -> 'Position':
+        position = cls(row['isin'], row.get('stock_name'), row.get('ticker'))
+        position.quantity = float(row.get('quantity') or 0)
+        position.lots = [[float(q), float(c)] for q, c in row.get('lots') or []]
+        position.weighted_cost = float(row.get('weighted_cost') or 0)
+        position.realized_fifo = float(row.get('realized_fifo') or 0)
+        position.realized_weighted = float(row.get('realized_weighted') or 0)
+        position.dividends = float(row.get('dividends') or 0)
+        position.last_id = int(row.get('last_id') or 0)
+        position.last_date = str(row.get('last_date') or '')[:10]
+        position.split_factor = float(row.get('split_factor') or 1)
+        return position
+
+
+def fold(positions: Dict[str, Position], transactions: Iterable[Dict], splits: Splits = _no_splits) -> Set[str]:
+    """
+    Folds transactions into positions (Format: {isin: Position}) in ledger order and returns the changed ISINs.
+    Transactions already folded into a position are skipped. Positions with `backdated` or `restated`
+    transactions must be replayed from their full history instead.
+    """
+    folded = {isin: position.last_id for isin, position in positions.items()}
+    changed = set()
+    for txn in sorted(transactions, key=transaction_order):
+        isin = txn['isin']
+        if txn['id'] <= folded.get(isin, 0):
+            continue
+        position = positions.get(isin)
+        if position is None:
+            position = positions[isin] = Position(isin)
+        position.apply(txn, splits)
+        changed.add(isin)
+    return changed
+
+
+def backdated(positions: Dict[str, Position], transactions: Iterable[Dict]) -> Set[str]:
+    """ISINs with a transaction not yet folded that is dated before the position's latest folded trade."""
+    isins = set()
+    for txn in transactions:
+        position = positions.get(txn['isin'])
+        if position is not None and txn['id'] > position.last_id and str(txn['trade_date'])[:10] < position.last_date:
+            isins.add(txn['isin'])
+    return isins
+
+
+def restated(positions: Dict[str, Position], splits: Splits) -> Set[str]:
+    """ISINs whose folded splits differ from their ticker's splits up to the latest trade, e.g. an action recorded since."""
+    isins = set()
+    for isin, position in positions.items():
+        factor = 1.0
+        for ex_date, ratio in splits((position.ticker or '').strip()):
+            if ex_date <= position.last_date:
+                factor *= ratio
+        if abs(factor - position.split_factor) > _EPSILON * max(factor, 1.0):
+            isins.add(isin)
+    return isins
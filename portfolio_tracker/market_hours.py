@@ -0,0 +1,32 @@
+"""Exchange trading sessions and ticker -> exchange lookup tables."""
+
+# Trading sessions per exchange: (timezone, open (h, m), close (h, m)), Mon-Fri
+EXCHANGE_SESSIONS = {
+    "NSE": ("Asia/Kolkata", (9, 15), (15, 30)),
+    "BSE": ("Asia/Kolkata", (9, 15), (15, 30)),
+    "US": ("America/New_York", (9, 30), (16, 0)),
+    "LSE": ("Europe/London", (8, 0), (16, 30)),
+    "XETRA": ("Europe/Berlin", (9, 0), (17, 30)),
+    "EURONEXT": ("Europe/Paris", (9, 0), (17, 30)),
+    "TSE": ("Asia/Tokyo", (9, 0), (15, 0)),
+    "HKEX": ("Asia/Hong_Kong", (9, 30), (16, 0)),
+    "SGX": ("Asia/Singapore", (9, 0), (17, 0)),
+    "ASX": ("Australia/Sydney", (10, 0), (16, 0)),
+    "TSX": ("America/Toronto", (9, 30), (16, 0)),
+}
+DEFAULT_EXCHANGE = "NSE"
+
+# Yahoo ticker suffix -> exchange
+TICKER_SUFFIX_EXCHANGES = {
+    ".NS": "NSE", ".BO": "BSE", ".L": "LSE", ".DE": "XETRA", ".F": "XETRA",
+    ".PA": "EURONEXT", ".AS": "EURONEXT", ".BR": "EURONEXT", ".T": "TSE",
+    ".HK": "HKEX", ".SI": "SGX", ".AX": "ASX", ".TO": "TSX", ".V": "TSX",
+}
+
+# Yahoo search `exchange` codes -> exchange
+YAHOO_EXCHANGE_CODES = {
+    "NSI": "NSE", "BSE": "BSE", "NMS": "US", "NGM": "US", "NCM": "US", "NYQ": "US",
+    "ASE": "US", "PCX": "US", "BTS": "US", "LSE": "LSE", "GER": "XETRA", "FRA": "XETRA",
+    "PAR": "EURONEXT", "AMS": "EURONEXT", "BRU": "EURONEXT", "JPX": "TSE", "HKG": "HKEX",
+    "SES": "SGX", "ASX": "ASX", "TOR": "TSX", "VAN": "TSX",
+}
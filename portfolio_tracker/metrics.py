@@ -0,0 +1,94 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+
+class Metrics:
+    """Thread-safe counters, gauges and latency histograms, rendered in the Prometheus text format."""
+
+    BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+    HELP = {
+        'portfolio_phase_duration_seconds': 'Time spent per phase of a holdings request',
+        'portfolio_cache_requests_total': 'Cache lookups by cache and result',
+        'portfolio_upstream_calls_total': 'Calls made to upstream services',
+        'portfolio_upstream_errors_total': 'Failed upstream calls',
+        'portfolio_ticker_errors_total': 'Ticker fetch failures by kind',
+        'portfolio_quote_store_tickers': 'Tickers held in the in-memory quote store',
+        'portfolio_circuit_open': 'Whether an upstream circuit breaker is open (1) or not (0)',
+        'portfolio_alerts_total': 'Alerts fired by trigger reason',
+        'portfolio_rate_limited_total': 'Requests over their rate limit by endpoint class',
+        'portfolio_export_rows_total': 'Holdings rows written by exports',
+    }
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[Tuple, float] = {}
+        self._gauges: Dict[Tuple, float] = {}
+        self._histograms: Dict[Tuple, List[float]] = {}  # Format: {key: [bucket counts..., sum, count]}
+
+    @staticmethod
+    def _key(name: str, labels: Dict) -> Tuple:
+        return (name, tuple(sorted(labels.items())))
+
+    def inc(self, name: str, value: float = 1, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def set_gauge(self, name: str, value: float, **labels):
+        with self._lock:
+            self._gauges[self._key(name, labels)] = value
+
+    def observe(self, name: str, seconds: float, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            hist = self._histograms.get(key)
+            if hist is None:
+                hist = self._histograms[key] = [0] * (len(self.BUCKETS) + 2)
+            for i, bound in enumerate(self.BUCKETS):
+                if seconds <= bound:
+                    hist[i] += 1
+            hist[-2] += seconds
+            hist[-1] += 1
+
+    @contextmanager
+    def span(self, phase: str):
+        """Times a phase of a holdings request."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe('portfolio_phase_duration_seconds', time.perf_counter() - start, phase=phase)
+
+    @staticmethod
+    def _labels(labels: Tuple, le: Optional[str] = None) -> str:
+        parts = ['%s="%s"' % (k, str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')) for k, v in labels]
+        if le is not None:
+            parts.append(f'le="{le}"')
+        return '{%s}' % ','.join(parts) if parts else ''
+
+    def render(self) -> str:
+        lines, seen = [], set()
+
+        def header(name: str, kind: str):
+            if name not in seen:
+                seen.add(name)
+                lines.append(f"# HELP {name} {self.HELP.get(name, name)}")
+                lines.append(f"# TYPE {name} {kind}")
+
+        with self._lock:
+            for (name, labels), value in sorted(self._counters.items()):
+                header(name, 'counter')
+                lines.append(f"{name}{self._labels(labels)} {value}")
+            for (name, labels), value in sorted(self._gauges.items()):
+                header(name, 'gauge')
+                lines.append(f"{name}{self._labels(labels)} {value}")
+            for (name, labels), hist in sorted(self._histograms.items()):
+                header(name, 'histogram')
+                for bound, count in zip(self.BUCKETS, hist):
+                    lines.append(f"{name}_bucket{self._labels(labels, str(bound))} {count}")
+                lines.append(f"{name}_bucket{self._labels(labels, '+Inf')} {hist[-1]}")
+                lines.append(f"{name}_sum{self._labels(labels)} {hist[-2]}")
+                lines.append(f"{name}_count{self._labels(labels)} {hist[-1]}")
+        return '\n'.join(lines) + '\n'
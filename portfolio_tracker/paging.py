@@ -0,0 +1,111 @@
+"""Server-side sorting, filtering and keyset pagination of evaluated holdings."""
+from __future__ import annotations
+
+import base64
+import json
+import math
+from bisect import bisect_left, bisect_right
+from typing import Dict, List, Optional, Tuple
+
+# Format: {sort key: fill value of its type, used for holdings without a value}
+SORT_KEYS = {
+    'stock_name': '', 'ticker': '', 'isin': '', 'state': '', 'date_of_exit': '',
+    'quantity': 0.0, 'average_buy_price': 0.0, 'current_price': 0.0, 'current_value': 0.0,
+    'day_change_percent': 0.0, 'total_return_percent': 0.0, 'target': 0.0, 'stop_loss': 0.0,
+    'pe_ratio': 0.0, 'peg_ratio': 0.0, 'debt_to_equity': 0.0, 'market_cap': 0.0,
+    'sales_growth_3y': 0.0, 'eps_growth_3y': 0.0,
+}
+MAX_PAGE_SIZE = 1000
+
+
+class HoldingsQuery:
+    """Sort, filters and page of a holdings request; an empty query returns every holding as stored."""
+
+    def __init__(self, sort: Optional[str] = None, order: str = 'desc', cursor: Optional[str] = None,
+                 limit: Optional[int] = None, state: Optional[str] = None, search: Optional[str] = None,
+                 min_return: Optional[float] = None, max_return: Optional[float] = None,
+                 min_day_change: Optional[float] = None, max_day_change: Optional[float] = None):
+        if sort is not None and sort not in SORT_KEYS:
+            raise ValueError(f"Unknown sort key: {sort}")
+        if order not in ('asc', 'desc'):
+            raise ValueError(f"Unknown sort order: {order}")
+        if limit is not None and limit <= 0:
+            raise ValueError("limit must be positive")
+        self.sort = sort
+        self.order = order
+        self.cursor = decode_cursor(cursor) if cursor else None
+        if self.cursor and not isinstance(self.cursor[1], type(SORT_KEYS.get(sort, ''))):
+            raise ValueError("Cursor does not belong to this sort")
+        self.limit = min(limit, MAX_PAGE_SIZE) if limit else None
+        self.state = state.upper() if state else None
+        self.search = search.strip().lower() if search else None
+        # Format: {holding field: (min, max)}
+        self.ranges = {
+            field: bounds for field, bounds in (
+                ('total_return_percent', (min_return, max_return)),
+                ('day_change_percent', (min_day_change, max_day_change)),
+            ) if bounds != (None, None)
+        }
+
+    @property
+    def is_empty(self) -> bool:
+        return not (self.sort or self.limit or self.state or self.search or self.ranges)
+
+    def matches(self, holding: Dict) -> bool:
+        if self.state and holding.get('state') != self.state:
+            return False
+        if self.search and not any(self.search in (holding.get(f) or '').lower() for f in ('stock_name', 'ticker', 'isin')):
+            return False
+        for field, (low, high) in self.ranges.items():
+            value = holding.get(field)
+            if value is None or (low is not None and value < low) or (high is not None and value > high):
+                return False
+        return True
+
+    def sort_key(self, holding: Dict) -> Tuple:
+        """(has value, value, isin): holdings without a value sort as the smallest, the ISIN breaks ties."""
+        if self.sort == 'current_value':
+            price = holding.get('current_price')
+            value = price * holding['quantity'] if price is not None and holding.get('quantity') is not None else None
+        else:
+            value = holding.get(self.sort) if self.sort else None
+        if isinstance(value, float) and math.isnan(value):
+            value = None
+        fill = SORT_KEYS.get(self.sort, '')
+        if value is None:
+            return (False, fill, holding['isin'])
+        return (True, float(value) if isinstance(fill, float) else str(value), holding['isin'])
+
+    def apply(self, holdings: List[Dict]) -> Tuple[List[Dict], int, Optional[str]]:
+        """
+        Filters and sorts, then returns (page, matching count, cursor of the next page or None).
+        The cursor is the sort key of the last row, so pages stay consistent while prices move.
+        """
+        rows = [h for h in holdings if self.matches(h)]
+        keyed = sorted(((self.sort_key(h), h) for h in rows), key=lambda kh: kh[0])
+        keys = [k for k, _ in keyed]
+        ascending = self.order == 'asc'
+        if ascending:
+            start = bisect_right(keys, self.cursor) if self.cursor else 0
+            end = start + self.limit if self.limit else len(keyed)
+            page = keyed[start:end]
+            more = end < len(keyed)
+        else:
+            end = bisect_left(keys, self.cursor) if self.cursor else len(keyed)
+            start = max(0, end - self.limit) if self.limit else 0
+            page = keyed[start:end][::-1]
+            more = start > 0
+        next_cursor = encode_cursor(page[-1][0]) if page and more else None
+        return [h for _, h in page], len(rows), next_cursor
+
+
+def encode_cursor(key: Tuple) -> str:
+    return base64.urlsafe_b64encode(json.dumps(list(key)).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple:
+    try:
+        has_value, value, isin = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except Exception:
+        raise ValueError("Invalid cursor")
+    return (bool(has_value), value, str(isin))
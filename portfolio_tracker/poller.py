@@ -0,0 +1,43 @@
+import os
+import threading
+from typing import Optional
+
+# Seconds between background quote refreshes for the long-running local server
+QUOTE_POLL_SECONDS = float(os.environ.get("QUOTE_POLL_SECONDS", 10))
+
+
+class QuotePoller:
+    """Refreshes quotes of every portfolio on a background thread, so requests never wait on Yahoo."""
+
+    def __init__(self, service, interval: float = QUOTE_POLL_SECONDS):
+        self.service = service
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="quote-poller", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+    def poll_once(self):
+        """Refreshes every portfolio once; closed exchanges are skipped by get_holdings itself."""
+        for portfolio in self.service.get_portfolios():
+            if self._stop.is_set():
+                return
+            self.service.get_holdings(portfolio['id'], refresh=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.poll_once()
+            except Exception as e:
+                print(f"Quote poller error: {e}")
+            self._stop.wait(self.interval)
@@ -0,0 +1,178 @@
+"""
+Opt-in request profiling for the API.
+
+A sampled request gets a background thread that snapshots the handler thread's
+stack every few milliseconds (pyinstrument-style sampling, so the handler itself
+runs at full speed). Stacks are kept in collapsed "frame;frame;frame count" form,
+which flamegraph.pl, inferno and speedscope read directly.
+
+Enable with:
+    PROFILE_SAMPLE_RATE=0.01   profile 1% of requests
+    PROFILE_TOKEN=secret       profile any request sent with `X-Profile: secret`,
+                               and require `?token=secret` on the debug endpoints
+"""
+import functools
+import inspect
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, deque
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+
+from fastapi.routing import APIRoute
+
+PROFILE_SAMPLE_RATE = float(os.environ.get("PROFILE_SAMPLE_RATE", 0))
+PROFILE_TOKEN = os.environ.get("PROFILE_TOKEN")
+PROFILE_INTERVAL = float(os.environ.get("PROFILE_INTERVAL_MS", 5)) / 1000
+PROFILE_MAX_STORED = int(os.environ.get("PROFILE_MAX_STORED", 50))
+
+# Set by the middleware for requests that were picked for profiling
+_current_profile: ContextVar[Optional['Profile']] = ContextVar('current_profile', default=None)
+
+
+class Profile:
+    def __init__(self, method: str, path: str):
+        self.id = uuid.uuid4().hex[:12]
+        self.method = method
+        self.path = path
+        self.started_at = time.time()
+        self.duration_ms = 0.0
+        self.samples = 0
+        self.stacks: Counter = Counter()
+
+    def summary(self) -> Dict:
+        return {
+            "id": self.id, "method": self.method, "path": self.path,
+            "started_at": self.started_at, "duration_ms": round(self.duration_ms, 2), "samples": self.samples,
+        }
+
+    def collapsed(self) -> str:
+        return ''.join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+class ProfileStore:
+    """Keeps the most recent profiles in memory."""
+
+    def __init__(self, max_stored: int = PROFILE_MAX_STORED):
+        self._profiles = deque(maxlen=max_stored)
+        self._lock = threading.Lock()
+
+    def add(self, profile: Profile):
+        with self._lock:
+            self._profiles.append(profile)
+
+    def list(self) -> List[Dict]:
+        with self._lock:
+            return [p.summary() for p in reversed(self._profiles)]
+
+    def get(self, profile_id: str) -> Optional[Profile]:
+        with self._lock:
+            return next((p for p in self._profiles if p.id == profile_id), None)
+
+
+profile_store = ProfileStore()
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})".replace(';', ':')
+
+
+class StackSampler:
+    """Samples one thread's stack at a fixed interval until stopped."""
+
+    def __init__(self, thread_id: int, profile: Profile, interval: float = PROFILE_INTERVAL):
+        self._thread_id = thread_id
+        self._profile = profile
+        self._interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self._interval):
+            frame = sys._current_frames().get(self._thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame))
+                frame = frame.f_back
+            if stack:
+                self._profile.stacks[';'.join(reversed(stack))] += 1
+                self._profile.samples += 1
+
+
+def should_profile(headers) -> bool:
+    if PROFILE_TOKEN and headers.get('x-profile') == PROFILE_TOKEN:
+        return True
+    return PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+
+
+def token_ok(token: Optional[str]) -> bool:
+    """Debug endpoints are open only when profiling is configured, and need the token if one is set."""
+    if PROFILE_TOKEN:
+        return token == PROFILE_TOKEN
+    return PROFILE_SAMPLE_RATE > 0
+
+
+async def profiling_middleware(request, call_next):
+    if not should_profile(request.headers):
+        return await call_next(request)
+
+    profile = Profile(request.method, request.url.path)
+    _current_profile.set(profile)
+    response = await call_next(request)
+    response.headers['X-Profile-Id'] = profile.id
+    return response
+
+
+def _profiled(endpoint):
+    """Wraps an endpoint so sampling runs on whichever thread ends up executing it."""
+    def run(call):
+        profile = _current_profile.get()
+        if profile is None:
+            return call()
+        start = time.perf_counter()
+        try:
+            with StackSampler(threading.get_ident(), profile):
+                return call()
+        finally:
+            profile.duration_ms = (time.perf_counter() - start) * 1000
+            profile_store.add(profile)
+
+    if inspect.iscoroutinefunction(endpoint):
+        @functools.wraps(endpoint)
+        async def async_wrapper(*args, **kwargs):
+            profile = _current_profile.get()
+            if profile is None:
+                return await endpoint(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                with StackSampler(threading.get_ident(), profile):
+                    return await endpoint(*args, **kwargs)
+            finally:
+                profile.duration_ms = (time.perf_counter() - start) * 1000
+                profile_store.add(profile)
+        return async_wrapper
+
+    @functools.wraps(endpoint)
+    def wrapper(*args, **kwargs):
+        return run(lambda: endpoint(*args, **kwargs))
+    return wrapper
+
+
+class ProfiledRoute(APIRoute):
+    """Route class that makes every endpoint profilable: `app.router.route_class = ProfiledRoute`."""
+
+    def __init__(self, path: str, endpoint, **kwargs):
+        super().__init__(path, _profiled(endpoint), **kwargs)
@@ -0,0 +1,135 @@
+from __future__ import annotations
+
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from .lazy import np, pd
+
+
+def extract_quotes(data: pd.DataFrame) -> pd.DataFrame:
+    """
+    Computes last close, previous close, change and change % for every ticker of a
+    yf.download(group_by='ticker') frame in one vectorized pass.
+    Returns a frame indexed by ticker; tickers without any close are left out.
+    """
+    columns = ['price', 'prev_close', 'change_amount', 'change_percent']
+    if data is None or data.empty or not isinstance(data.columns, pd.MultiIndex):
+        return pd.DataFrame(columns=columns, dtype=float)
+
+    closes = data.xs('Close', axis=1, level=1)
+    values = closes.to_numpy(dtype=float)
+    valid = ~np.isnan(values)
+    rows = np.arange(values.shape[0])[:, None]
+    cols = np.arange(values.shape[1])
+
+    # Row of the last and second-to-last non-NaN close per ticker (-1 if none)
+    last = np.where(valid, rows, -1).max(axis=0)
+    prev = np.where(valid & (rows < last), rows, -1).max(axis=0)
+
+    price = values[last, cols]
+    prev_close = np.where(prev >= 0, values[prev, cols], price)
+    change_amt = price - prev_close
+    with np.errstate(divide='ignore', invalid='ignore'):
+        change_pct = np.where(prev_close > 0, change_amt / prev_close * 100, 0.0)
+
+    table = pd.DataFrame(
+        {'price': price, 'prev_close': prev_close, 'change_amount': change_amt, 'change_percent': change_pct},
+        index=closes.columns,
+        columns=columns
+    )
+    return table[last >= 0]
+
+
+class QuoteStore:
+    """
+    Columnar in-memory quote snapshot: one float64 row per field, indexed by a ticker -> slot map.
+    Request threads and the background poller write concurrently, so slot assignment, growth and
+    writes hold a lock, as do reads, which must not pair a new slot with the array before growth.
+    """
+
+    FIELDS = ('price', 'day_change_amount', 'day_change_percent', 'ts')
+    MAX_POSITIONS = 64  # Ticker lists whose resolved slots are kept for the next lookup
+
+    def __init__(self, capacity: int = 256):
+        self._slots: Dict[str, int] = {}
+        self._capacity = capacity
+        self._data = None  # Allocated on first write
+        self._positions: Dict[Tuple[str, ...], np.ndarray] = {}  # Format: {tickers: their slots}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def __contains__(self, ticker: str) -> bool:
+        return ticker in self._slots
+
+    @property
+    def nbytes(self) -> int:
+        return self._data.nbytes if self._data is not None else 0
+
+    def _slot(self, ticker: str) -> int:
+        """Slot of a ticker, assigned on first write; called with the lock held."""
+        if self._data is None:
+            self._data = np.full((len(self.FIELDS), self._capacity), np.nan)
+        slot = self._slots.get(ticker)
+        if slot is None:
+            slot = len(self._slots)
+            if slot == self._data.shape[1]:
+                grown = np.full((len(self.FIELDS), slot * 2), np.nan)
+                grown[:, :slot] = self._data
+                self._data = grown
+            self._slots[ticker] = slot
+        return slot
+
+    def update(self, ticker: str, price: float, change_amt: float, change_pct: float, ts: float):
+        """O(1) in-place update of a single ticker."""
+        with self._lock:
+            slot = self._slot(ticker)  # May allocate or grow _data, so resolve it first
+            self._data[:, slot] = (price, change_amt, change_pct, ts)
+
+    def update_many(self, tickers: List[str], prices, change_amts, change_pcts, ts: float):
+        """Writes a batch of quotes (e.g. extracted from one yf.download frame) with a single scatter."""
+        with self._lock:
+            slots = np.fromiter((self._slot(t) for t in tickers), dtype=np.intp, count=len(tickers))
+            self._data[0, slots] = prices
+            self._data[1, slots] = change_amts
+            self._data[2, slots] = change_pcts
+            self._data[3, slots] = ts
+
+    def get(self, ticker: str) -> Optional[Dict]:
+        with self._lock:
+            slot = self._slots.get(ticker)
+            if slot is None:
+                return None
+            return dict(zip(self.FIELDS, self._data[:, slot].tolist()))
+
+    def age(self, ticker: str, now: float) -> float:
+        """Seconds since the ticker was last updated (inf if never seen)."""
+        with self._lock:
+            slot = self._slots.get(ticker)
+            return float('inf') if slot is None else now - self._data[3, slot]
+
+    def lookup(self, tickers: List[str]) -> np.ndarray:
+        """
+        Vectorized join: returns a (fields x len(tickers)) array, NaN for unknown tickers.
+        Slots never move, so the positions of a list whose tickers are all known are kept,
+        and joining the same holdings again is a single gather.
+        """
+        key = tuple(tickers)
+        with self._lock:
+            if self._data is None:
+                return np.full((len(self.FIELDS), len(tickers)), np.nan)
+            slots = self._positions.get(key)
+            if slots is None:
+                slots = np.fromiter((self._slots.get(t, -1) for t in tickers), dtype=np.intp, count=len(tickers))
+                missing = slots < 0
+                if not missing.any():
+                    if len(self._positions) >= self.MAX_POSITIONS:
+                        self._positions.clear()
+                    self._positions[key] = slots
+            else:
+                missing = None
+            result = self._data[:, slots]
+        if missing is not None:
+            result[:, missing] = np.nan
+        return result
@@ -0,0 +1,76 @@
+"""Failure handling for upstream calls: per-key negative caching and a circuit breaker."""
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+
+class NegativeCache:
+    """Remembers failing keys and backs off exponentially before they are tried again."""
+
+    def __init__(self, base_delay: float, max_delay: float, quarantine_after: Optional[int] = None):
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.quarantine_after = quarantine_after
+        self._entries: Dict[str, Tuple[int, float]] = {}  # Format: {key: (consecutive failures, retry at)}
+        self._lock = threading.Lock()
+
+    def is_blocked(self, key: str, now: Optional[float] = None) -> bool:
+        entry = self._entries.get(key)
+        return entry is not None and (now or time.time()) < entry[1]
+
+    def failures(self, key: str) -> int:
+        entry = self._entries.get(key)
+        return entry[0] if entry else 0
+
+    def record_failure(self, key: str, now: Optional[float] = None) -> float:
+        """Registers a failure and returns the delay before the key is tried again."""
+        with self._lock:
+            failures = self.failures(key) + 1
+            if self.quarantine_after and failures >= self.quarantine_after:
+                delay = self.max_delay
+            else:
+                delay = min(self.base_delay * 2 ** (failures - 1), self.max_delay)
+            self._entries[key] = (failures, (now or time.time()) + delay)
+            return delay
+
+    def record_success(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+
+
+class CircuitBreaker:
+    """Stops calling an upstream after repeated failures, then lets a single probe through after a cooldown."""
+
+    def __init__(self, name: str, failure_threshold: int, reset_timeout: float):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = 'closed'
+        self._failures = 0
+        self._opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """Whether a call may go out now. Every allowed call must report record_success/record_failure."""
+        with self._lock:
+            if self.state == 'closed':
+                return True
+            if self.state == 'open' and time.time() - self._opened_at >= self.reset_timeout:
+                self.state = 'half_open'
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            if self.state != 'closed':
+                print(f"Circuit {self.name} closed")
+            self.state = 'closed'
+            self._failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self.state == 'half_open' or (self.state == 'closed' and self._failures >= self.failure_threshold):
+                print(f"Circuit {self.name} open for {self.reset_timeout}s after {self._failures} failures")
+                self.state = 'open'
+                self._opened_at = time.time()
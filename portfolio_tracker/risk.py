@@ -0,0 +1,122 @@
+"""
+Risk analytics from daily closes: volatility, beta against a benchmark index, the pairwise
+correlation matrix and historical VaR. Every holding is computed at once from one
+(days x tickers) matrix of daily returns; tickers missing some days only use the days they have.
+"""
+from __future__ import annotations
+
+import math
+import warnings
+from typing import Dict, List, Optional
+
+from .lazy import np, pd
+
+TRADING_DAYS = 252  # Annualizes daily volatility
+VAR_LEVELS = (0.95, 0.99)
+
+
+def closes_frame(closes: Optional[pd.DataFrame], tickers: List[str], window: int) -> pd.DataFrame:
+    """The tickers' columns of a (dates x tickers) closes frame, over the last `window` + 1 dates any of them traded."""
+    if closes is None:
+        return pd.DataFrame(columns=tickers, dtype=float)
+    return closes.reindex(columns=tickers).dropna(how='all').iloc[-(window + 1):]
+
+
+def _numbers(matrix: np.ndarray) -> List[List[Optional[float]]]:
+    """Rows of a matrix for JSON, None instead of NaN."""
+    values = np.round(matrix, 4).astype(object)
+    values[~np.isfinite(matrix)] = None
+    return values.tolist()
+
+
+def _masked_moments(returns: np.ndarray, benchmark: np.ndarray):
+    """Per column: observations, variance and covariance with the benchmark, over the days both have a return."""
+    valid = ~np.isnan(returns) & ~np.isnan(benchmark)[:, None]
+    n = valid.sum(axis=0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        r = np.where(valid, returns, 0.0)
+        b = np.where(valid, benchmark[:, None], 0.0)
+        r = np.where(valid, r - r.sum(axis=0) / n, 0.0)
+        b = np.where(valid, b - b.sum(axis=0) / n, 0.0)
+        covariance = (r * b).sum(axis=0) / (n - 1)
+        benchmark_variance = (b * b).sum(axis=0) / (n - 1)
+    return n, covariance, benchmark_variance
+
+
+def _number(value) -> Optional[float]:
+    value = float(value)
+    return None if math.isnan(value) or math.isinf(value) else value
+
+
+def historical_var(returns: np.ndarray, level: float) -> float:
+    """Loss (as a positive fraction) not exceeded on `level` of the days."""
+    returns = returns[~np.isnan(returns)]
+    if not len(returns):
+        return float('nan')
+    return max(0.0, -float(np.quantile(returns, 1 - level)))
+
+
+def risk_report(closes: pd.DataFrame, values: Dict[str, float], benchmark: str, min_observations: int) -> Dict:
+    """
+    Risk of positions worth `values` (Format: {ticker: value}) from `closes`, which also holds the benchmark.
+    Volatility is annualized; VaR is for one day at each of VAR_LEVELS, from the portfolio's return history
+    at today's weights. Tickers with fewer than `min_observations` returns are reported without figures.
+    """
+    tickers = [t for t in values if t in closes.columns]
+    returns = closes.pct_change(fill_method=None).iloc[1:]
+    matrix = returns[tickers].to_numpy(dtype=float)
+    bench = returns[benchmark].to_numpy(dtype=float) if benchmark in returns else np.full(len(returns), np.nan)
+
+    observations = (~np.isnan(matrix)).sum(axis=0)
+    enough = observations >= min_observations
+    with np.errstate(invalid='ignore', divide='ignore'), warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)  # Columns of tickers without enough history
+        if len(matrix):
+            volatility = np.where(enough, np.nanstd(matrix, axis=0, ddof=1) * math.sqrt(TRADING_DAYS), np.nan)
+            ticker_var = np.maximum(0.0, -np.nanquantile(matrix, 0.05, axis=0))
+        else:
+            volatility = ticker_var = np.full(len(tickers), np.nan)
+    n, covariance, bench_variance = _masked_moments(matrix, bench)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        beta = np.where(enough & (n >= min_observations), covariance / bench_variance, np.nan)
+
+    weights = np.array([values[t] for t in tickers], dtype=float)
+    total = float(weights.sum())
+    weights = weights / total if total else weights
+    # Missing days count as unchanged, so a late listing does not drop the whole day from the portfolio
+    portfolio = np.where(np.isnan(matrix), 0.0, matrix) @ weights if len(tickers) else np.zeros(len(returns))
+    with np.errstate(invalid='ignore'):
+        portfolio_vol = float(np.std(portfolio, ddof=1)) * math.sqrt(TRADING_DAYS) if len(portfolio) > 1 else float('nan')
+    p_n, p_cov, p_var = _masked_moments(portfolio[:, None], bench)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        portfolio_beta = float(p_cov[0] / p_var[0]) if p_n[0] >= min_observations else float('nan')
+
+    usable = [t for t, ok in zip(tickers, enough.tolist()) if ok]
+    correlation = returns[usable].corr(min_periods=min_observations) if usable else pd.DataFrame()
+    return {
+        'as_of': str(closes.index[-1])[:10] if len(closes) else None,
+        'observations': int(len(returns)),
+        'benchmark': benchmark,
+        'portfolio': {
+            'value': total,
+            'volatility': _number(portfolio_vol),
+            'beta': _number(portfolio_beta),
+            'var': {f"{round(level * 100)}": {'percent': _number(historical_var(portfolio, level) * 100),
+                                               'amount': _number(historical_var(portfolio, level) * total)}
+                    for level in VAR_LEVELS} if len(portfolio) >= min_observations else {},
+        },
+        'tickers': {
+            t: {
+                'weight': float(weights[i]),
+                'observations': int(observations[i]),
+                'volatility': _number(volatility[i]),
+                'beta': _number(beta[i]),
+                'var_95_percent': _number(ticker_var[i] * 100) if enough[i] else None,
+            } for i, t in enumerate(tickers)
+        },
+        'correlation': {
+            'tickers': usable,
+            'matrix': _numbers(correlation.to_numpy(dtype=float)),
+        },
+        'insufficient_history': [t for t, ok in zip(tickers, enough.tolist()) if not ok],
+    }
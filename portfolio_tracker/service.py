@@ -0,0 +1,1403 @@
+from __future__ import annotations
+
+import time
+import math
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import date, datetime, timedelta
+from zoneinfo import ZoneInfo
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from .alerts import AlertEngine
+from .corporate_actions import ACTION_TYPES, CorporateActions, actions_from_yahoo
+from .fundamentals import (fundamentals_table, growth_table, is_new_fiscal_year, statements_from_financials,
+                           table_records, valuation_from_info, valuation_vector)
+from .instruments import InstrumentMaster, normalize_name
+from .lazy import yf, np, pd, requests
+from .ledger import COST_METHODS, TRANSACTION_TYPES, Position, backdated, fold, restated
+from .market_hours import DEFAULT_EXCHANGE, EXCHANGE_SESSIONS, TICKER_SUFFIX_EXCHANGES, YAHOO_EXCHANGE_CODES
+from .metrics import Metrics
+from .paging import HoldingsQuery
+from .quotes import QuoteStore, extract_quotes
+from .resilience import CircuitBreaker, NegativeCache
+from .risk import closes_frame, risk_report
+from .simulation import MAX_REBALANCES, MAX_SCENARIOS, Snapshot, run_rebalances, run_scenarios
+from .storage import HOLDINGS_CACHE_TTL, CachedStorage, ChangeFeed, Storage, create_storage
+from .tenants import DEFAULT_TENANT
+
+# Quote download batching: tickers per yf.download call, concurrent calls, retries per chunk
+QUOTE_CHUNK_SIZE = int(os.environ.get("QUOTE_CHUNK_SIZE", 50))
+QUOTE_FETCH_WORKERS = int(os.environ.get("QUOTE_FETCH_WORKERS", 4))
+QUOTE_FETCH_RETRIES = int(os.environ.get("QUOTE_FETCH_RETRIES", 2))
+# Tickers returning no data back off exponentially, and are quarantined after repeated misses
+QUOTE_BACKOFF_SECONDS = int(os.environ.get("QUOTE_BACKOFF_SECONDS", 30))
+QUOTE_QUARANTINE_AFTER = int(os.environ.get("QUOTE_QUARANTINE_AFTER", 3))
+QUOTE_QUARANTINE_SECONDS = int(os.environ.get("QUOTE_QUARANTINE_SECONDS", 6 * 3600))
+FUNDAMENTAL_BACKOFF_SECONDS = int(os.environ.get("FUNDAMENTAL_BACKOFF_SECONDS", 300))
+# Longest wait before a ticker whose annual statements keep failing is tried again
+FUNDAMENTAL_STATEMENTS_BACKOFF_MAX = int(os.environ.get("FUNDAMENTAL_STATEMENTS_BACKOFF_MAX", 7 * 24 * 3600))
+# Fundamentals tiers: valuation inputs from Ticker.info, and annual statements (also refetched on a new fiscal year)
+FUNDAMENTAL_VALUATION_TTL = int(os.environ.get("FUNDAMENTAL_VALUATION_TTL", 24 * 3600))
+FUNDAMENTAL_STATEMENTS_TTL = int(os.environ.get("FUNDAMENTAL_STATEMENTS_TTL", 90 * 24 * 3600))
+# Seconds before a ticker's corporate actions are re-read from storage (actions added through this process apply at once)
+CORPORATE_ACTIONS_TTL = int(os.environ.get("CORPORATE_ACTIONS_TTL", 3600))
+# Cost method of the average buy price written to holdings from the transaction ledger (fifo or weighted)
+LEDGER_COST_METHOD = os.environ.get("LEDGER_COST_METHOD", "fifo")
+# Risk analytics: benchmark index, daily returns per window, and the fewest returns a ticker needs for figures
+RISK_BENCHMARK = os.environ.get("RISK_BENCHMARK", "^NSEI")
+RISK_WINDOW_DAYS = int(os.environ.get("RISK_WINDOW_DAYS", 252))
+RISK_MIN_OBSERVATIONS = int(os.environ.get("RISK_MIN_OBSERVATIONS", 60))
+BAR_ADJUSTMENT_TOLERANCE = 0.005  # A re-downloaded close this far off the stored one means Yahoo re-adjusted the history
+# Holdings read, merged and written per step of a streaming export
+EXPORT_BATCH_SIZE = int(os.environ.get("EXPORT_BATCH_SIZE", 1000))
+# Yahoo (yfinance + search) circuit breaker: consecutive upstream failures before opening, seconds before a probe
+YAHOO_BREAKER_THRESHOLD = int(os.environ.get("YAHOO_BREAKER_THRESHOLD", 5))
+YAHOO_BREAKER_COOLDOWN = int(os.environ.get("YAHOO_BREAKER_COOLDOWN", 60))
+
+def _today() -> str:
+    return datetime.now(ZoneInfo("UTC")).date().isoformat()
+
+
+def _is_upstream_error(e: Exception) -> bool:
+    """True for transport, timeout and rate-limit errors, as opposed to a bad ticker."""
+    if isinstance(e, (requests.RequestException, TimeoutError, ConnectionError)):
+        return True
+    name = type(e).__name__
+    return 'RateLimit' in name or 'Timeout' in name or 'Connection' in name
+
+
+
+class PortfolioService:
+    def __init__(self, refresh_on_read: bool = True):
+        # False when a background poller keeps quotes fresh, so reads only fetch tickers with no price at all
+        self.refresh_on_read = refresh_on_read
+        self._storage = None
+        self._storage_ready = False
+        self._storage_lock = threading.Lock()
+        self._quotes = QuoteStore()  # Columnar cache of price, day change and fetch ts per ticker
+        self._stored_quotes = set()  # Tickers whose quote was loaded from storage rather than downloaded here
+        self._stored_misses = set()  # Tickers storage had no quote for when last read
+        self._cache_expiry = 5  # seconds
+        self._valuation_cache = {}  # Format: {ticker: {"data": dict, "ts": float}}
+        self._statements_cache = {}  # Format: {ticker: {"data": dict, "ts": float}}
+        self._valuation_expiry = FUNDAMENTAL_VALUATION_TTL
+        self._statements_expiry = FUNDAMENTAL_STATEMENTS_TTL
+        self._statements_recheck = 7 * 24 * 3600  # While a reported new fiscal year has no statements yet
+        self._growth = None  # Derived growth rates per ticker, rebuilt only for changed statements; built on first use
+        self._growth_stale = set()  # Tickers whose statements changed since _growth was built
+        self._exchange_hints = {}  # Format: {ticker: exchange} learned from search metadata
+        self._instruments: Optional[InstrumentMaster] = None
+        self._tenant_portfolios = {}  # Format: {tenant_id: (portfolio ids, loaded at)}
+        self._corporate_actions = CorporateActions()  # Adjustment factors per ticker, see corporate_actions.py
+        self._ledger_lock = threading.Lock()  # Serializes position rebuilds, so snapshots are written once per change
+        self._closes = None  # Daily closes within the risk window, (dates x tickers), loaded lazily
+        self._bars_loaded = set()  # Tickers whose stored bars have been read
+        self._bars_synced: Dict[str, str] = {}  # Format: {ticker: session date its bars are complete up to}
+        self._risk_cache = {}  # Format: {portfolio_id: (session date, positions, report)}
+        self._risk_lock = threading.Lock()  # One bar sync at a time, so concurrent requests do not download twice
+        self._quote_failures = NegativeCache(QUOTE_BACKOFF_SECONDS, QUOTE_QUARANTINE_SECONDS, QUOTE_QUARANTINE_AFTER)
+        self._valuation_failures = NegativeCache(FUNDAMENTAL_BACKOFF_SECONDS, self._valuation_expiry)
+        self._statements_failures = NegativeCache(FUNDAMENTAL_BACKOFF_SECONDS, FUNDAMENTAL_STATEMENTS_BACKOFF_MAX)
+        self._yahoo_breaker = CircuitBreaker("yahoo", YAHOO_BREAKER_THRESHOLD, YAHOO_BREAKER_COOLDOWN)
+        self.metrics = Metrics()
+        # SELL triggers of every portfolio, evaluated once per quote update (see alerts.py); off without ALERT_SINKS
+        self.alerts = AlertEngine(self._alert_holdings, metrics=self.metrics)
+
+    @property
+    def storage(self) -> Optional[Storage]:
+        """Storage backend (see storage.py), created on first use rather than at import."""
+        if not self._storage_ready:
+            with self._storage_lock:
+                if not self._storage_ready:
+                    self._attach_storage(create_storage())
+        return self._storage
+
+    @storage.setter
+    def storage(self, storage: Optional[Storage]):
+        self._attach_storage(storage)
+
+    def _attach_storage(self, storage: Optional[Storage]):
+        if isinstance(storage, CachedStorage):
+            storage.metrics = self.metrics
+        self._storage = storage
+        self._storage_ready = True
+
+    @property
+    def instruments(self) -> InstrumentMaster:
+        """Offline NSE/BSE instrument master (see instruments.py), read on first use."""
+        if self._instruments is None:
+            self._instruments = InstrumentMaster.load()
+        return self._instruments
+
+    @instruments.setter
+    def instruments(self, instruments: InstrumentMaster):
+        self._instruments = instruments
+
+    def watch_storage(self) -> Optional[ChangeFeed]:
+        """Subscribes the holdings cache to the backend's change feed (long-running servers only)."""
+        storage = self.storage
+        return storage.watch() if isinstance(storage, CachedStorage) else None
+
+    def is_market_open(self, exchange: str = DEFAULT_EXCHANGE) -> bool:
+        """Checks if an exchange is in session (defaults to NSE, 9:15 AM - 3:30 PM IST, Mon-Fri)."""
+        tz, (open_h, open_m), (close_h, close_m) = EXCHANGE_SESSIONS.get(exchange, EXCHANGE_SESSIONS[DEFAULT_EXCHANGE])
+        now = datetime.now(ZoneInfo(tz))
+        if now.weekday() >= 5:  # Saturday or Sunday
+            return False
+        
+        market_start = now.replace(hour=open_h, minute=open_m, second=0, microsecond=0)
+        market_end = now.replace(hour=close_h, minute=close_m, second=0, microsecond=0)
+        
+        return market_start <= now <= market_end
+
+    def get_exchange(self, ticker: str) -> str:
+        """Detects a ticker's exchange from search metadata or its Yahoo suffix."""
+        if ticker in self._exchange_hints:
+            return self._exchange_hints[ticker]
+        if ticker.startswith('^'):
+            return DEFAULT_EXCHANGE
+        if '.' in ticker:
+            suffix = ticker[ticker.rindex('.'):].upper()
+            return TICKER_SUFFIX_EXCHANGES.get(suffix, DEFAULT_EXCHANGE)
+        # Unsuffixed Yahoo symbols are US listings
+        return "US"
+
+    def _group_by_exchange(self, tickers: List[str]) -> Dict[str, List[str]]:
+        """Groups tickers by the exchange they trade on."""
+        groups = {}
+        for ticker in tickers:
+            groups.setdefault(self.get_exchange(ticker), []).append(ticker)
+        return groups
+
+    def render_metrics(self) -> str:
+        """Prometheus text exposition of request timings, cache, upstream and error counters."""
+        self.metrics.set_gauge('portfolio_quote_store_tickers', len(self._quotes))
+        self.metrics.set_gauge('portfolio_circuit_open', int(self._yahoo_breaker.state == 'open'), upstream='yahoo')
+        return self.metrics.render()
+
+    # Tenant scoping: public methods take the caller's tenant_id; None is unscoped internal access
+    # (background poller, benchmarks). Quotes, fundamentals and corporate actions are market data,
+    # shared by every tenant.
+
+    def _tenant_portfolio_ids(self, tenant_id: str, reload: bool = False) -> set:
+        """IDs of a tenant's portfolios, cached per tenant for HOLDINGS_CACHE_TTL."""
+        now = time.time()
+        entry = self._tenant_portfolios.get(tenant_id)
+        if reload or entry is None or now - entry[1] >= HOLDINGS_CACHE_TTL:
+            entry = self._tenant_portfolios[tenant_id] = ({p['id'] for p in self.storage.list_portfolios(tenant_id)}, now)
+        return entry[0]
+
+    def owns_portfolio(self, tenant_id: Optional[str], portfolio_id: Optional[str]) -> bool:
+        if tenant_id is None:
+            return True
+        if not portfolio_id:
+            return False
+        # A miss is checked against storage once more, for portfolios created through another instance
+        return portfolio_id in self._tenant_portfolio_ids(tenant_id) or portfolio_id in self._tenant_portfolio_ids(tenant_id, reload=True)
+
+    def _list_tenant_holdings(self, tenant_id: Optional[str], portfolio_id: Optional[str] = None) -> List[Dict]:
+        """Holdings of one portfolio, or of every portfolio of the tenant (of all tenants if tenant_id is None)."""
+        if portfolio_id:
+            return self.storage.list_holdings(portfolio_id) if self.owns_portfolio(tenant_id, portfolio_id) else []
+        if tenant_id is None:
+            return self.storage.list_holdings()
+        return [h for pid in sorted(self._tenant_portfolio_ids(tenant_id)) for h in self.storage.list_holdings(pid)]
+
+    def get_holdings(self, portfolio_id: str, refresh: Optional[bool] = None, query: Optional[HoldingsQuery] = None,
+                     tenant_id: Optional[str] = None) -> Dict:
+        """
+        Reads holdings for a specific portfolio from storage and merges with live data.
+        `refresh` re-downloads stale quotes of open exchanges (defaults to refresh_on_read).
+        `query` sorts, filters and pages the holdings (see paging.py); only the page's quotes are fetched.
+        """
+        with self.metrics.span('total'):
+            return self._get_holdings(portfolio_id, self.refresh_on_read if refresh is None else refresh, query, tenant_id)
+
+    def _get_holdings(self, portfolio_id: str, refresh: bool = True, query: Optional[HoldingsQuery] = None,
+                      tenant_id: Optional[str] = None) -> Dict:
+        is_open = self.is_market_open()
+        paged = query is not None and not query.is_empty
+        empty = {"holdings": [], "is_market_open": is_open}
+        if paged:
+            empty.update(total=0, next_cursor=None, summary=self._summarize([]))
+        try:
+            if not self.storage or not self.owns_portfolio(tenant_id, portfolio_id):
+                return empty
+            
+            # Fetch holdings for the portfolio
+            with self.metrics.span('storage_read'):
+                holdings = self.storage.list_holdings(portfolio_id)
+            
+            if not holdings:
+                return empty
+            
+            now_ts = time.time()
+            tickers_to_fetch = []
+            held_tickers = list(dict.fromkeys(t for t in ((h.get('ticker') or '').strip() for h in holdings) if t))
+            with self.metrics.span('quote_read'):
+                self._load_stored_quotes(held_tickers, now_ts)
+            with self.metrics.span('corporate_actions'):
+                self._load_corporate_actions(held_tickers, now_ts)
+                self._apply_corporate_actions(holdings)
+
+            groups = self._group_by_exchange(held_tickers)
+            open_exchanges = {exchange: self.is_market_open(exchange) for exchange in groups}
+            if open_exchanges:
+                is_open = any(open_exchanges.values())
+
+            # Sorting and filtering need every holding's return and day change, so those come from
+            # the quote store and cached fundamentals; only the requested page is refreshed below
+            page, total, next_cursor = holdings, len(holdings), None
+            if paged:
+                with self.metrics.span('page'):
+                    self._join_quotes(holdings, open_exchanges, is_open)
+                    self._evaluate_states(holdings)
+                    self._apply_fundamentals(holdings, fetch=False)
+                    page, total, next_cursor = query.apply(holdings)
+                held_tickers = list(dict.fromkeys(t for t in ((h.get('ticker') or '').strip() for h in page) if t))
+                groups = self._group_by_exchange(held_tickers)
+
+            # Determine which tickers need fetching from yfinance.
+            # Refresh decisions are made per exchange group, so only trading tickers are re-downloaded
+            for exchange, group in groups.items():
+                for ticker in group:
+                    # If the exchange is open, use short cache
+                    if open_exchanges[exchange] and refresh:
+                        if self._quotes.age(ticker, now_ts) >= self._cache_expiry and not self._quote_failures.is_blocked(ticker, now_ts):
+                            tickers_to_fetch.append(ticker)
+                    else:
+                        # If the exchange is closed (or a poller refreshes it), only fetch if we have absolutely no price
+                        if ticker not in self._quotes and not self._quote_failures.is_blocked(ticker, now_ts):
+                            tickers_to_fetch.append(ticker)
+            self.metrics.inc('portfolio_cache_requests_total', len(tickers_to_fetch), cache='quote', result='miss')
+            self.metrics.inc('portfolio_cache_requests_total', len(held_tickers) - len(tickers_to_fetch), cache='quote', result='hit')
+
+            # Bulk fetch from yfinance if needed
+            try:
+                if tickers_to_fetch:
+                    print(f"Fetching {len(tickers_to_fetch)} tickers (Open: {[e for e, o in open_exchanges.items() if o]})")
+                with self.metrics.span('quote_fetch'):
+                    quotes = self._fetch_quotes(tickers_to_fetch)
+
+                with self.metrics.span('merge'):
+                    # 1. Update quote store with fresh yfinance data
+                    fetched = quotes.index.tolist()
+                    if fetched:
+                        self._quotes.update_many(
+                            fetched, quotes['price'].to_numpy(),
+                            quotes['change_amount'].to_numpy(), quotes['change_percent'].to_numpy(), now_ts
+                        )
+                        self._stored_quotes.difference_update(fetched)
+                        if self.alerts.enabled:
+                            try:
+                                self.alerts.on_quotes(fetched, quotes['price'].tolist(), now_ts)
+                            except Exception as e:
+                                print(f"Alert evaluation error: {e}")
+
+                    # 2. Join quotes against holdings
+                    self._join_quotes(page, open_exchanges, is_open)
+
+                # 3. Calculate Returns and State
+                with self.metrics.span('rules'):
+                    self._evaluate_states(page)
+
+                # 4. Fundamental Data
+                with self.metrics.span('fundamentals'):
+                    self._apply_fundamentals(page)
+
+                # Persist fresh quotes once per ticker, shared by every portfolio holding it
+                if fetched:
+                    try:
+                        with self.metrics.span('persist'):
+                            self._store_quotes(quotes)
+                    except Exception as e:
+                        print(f"Storage persistence error: {e}")
+                        self.metrics.inc('portfolio_upstream_errors_total', upstream=self.storage.name)
+
+            except Exception as e:
+                print(f"Fetch/Process error: {e}")
+                import traceback
+                traceback.print_exc()
+
+            response = {"holdings": page, "is_market_open": is_open}
+            if paged:
+                # Portfolio-wide totals, since the client only sees one page
+                response.update(total=total, next_cursor=next_cursor, summary=self._summarize(holdings))
+            return response
+
+        except Exception as e:
+            print(f"get_holdings error: {e}")
+            return empty
+
+    def _join_quotes(self, holdings: List[Dict], open_exchanges: Dict[str, bool], is_open: bool):
+        """Copies price and day change from the quote store onto holdings, resetting their state."""
+        tickers = [(h.get('ticker') or '').strip() for h in holdings]
+        # Only the copied fields are converted to Python floats, not the fetch timestamps
+        prices, change_amts, change_pcts = self._quotes.lookup(tickers)[:3].tolist()
+        for holding, ticker, price, change_amt, change_pct in zip(holdings, tickers, prices, change_amts, change_pcts):
+            holding['is_market_open'] = open_exchanges.get(self.get_exchange(ticker), is_open) if ticker else is_open
+
+            # Defaults for required frontend fields, _evaluate_states sets SELL triggers
+            holding['state'] = 'HOLD'
+            holding['state_reason'] = ''
+
+            if not ticker: continue
+
+            if not math.isnan(price):
+                holding['current_price'] = price
+                holding['day_change_amount'] = change_amt
+                holding['day_change_percent'] = change_pct
+                if ticker in self._stored_quotes:
+                    holding['is_cached'] = True
+                else:
+                    holding.pop('is_cached', None)
+
+    def _alert_holdings(self) -> List[Dict]:
+        """Every portfolio's holdings restated for corporate actions, for the alert trigger index."""
+        holdings = self.storage.list_holdings()
+        tickers = list(dict.fromkeys(t for t in ((h.get('ticker') or '').strip() for h in holdings) if t))
+        self._load_corporate_actions(tickers, time.time())
+        self._apply_corporate_actions(holdings)
+        return holdings
+
+    def _summarize(self, holdings: List[Dict]) -> Dict:
+        """Totals of a whole portfolio: value, investment and day change over holdings with a price."""
+        summary = {"count": len(holdings), "total_value": 0.0, "total_investment": 0.0, "day_change_amount": 0.0}
+        for h in holdings:
+            quantity = h.get('quantity') or 0
+            summary['total_investment'] += (h.get('average_buy_price') or 0) * quantity
+            if h.get('current_price'):
+                summary['total_value'] += h['current_price'] * quantity
+            summary['day_change_amount'] += (h.get('day_change_amount') or 0) * quantity
+        return summary
+
+    def _load_stored_quotes(self, tickers: List[str], now_ts: float):
+        """
+        Seeds the quote store with persisted quotes for tickers this process has never priced. Tickers whose
+        fetch is backing off are read too, as the stored quote is all they can show; only a known miss is
+        not re-read while the ticker is blocked.
+        """
+        missing = [t for t in tickers if t not in self._quotes
+                   and not (t in self._stored_misses and self._quote_failures.is_blocked(t, now_ts))]
+        if not missing:
+            return
+        try:
+            stored = self.storage.get_quotes(missing)
+        except Exception as e:
+            print(f"Quote read error: {e}")
+            self.metrics.inc('portfolio_upstream_errors_total', upstream=self.storage.name)
+            return
+        for q in stored:
+            if q.get('price') is None:
+                continue
+            try:
+                ts = datetime.fromisoformat(q['updated_at']).timestamp()
+            except (TypeError, ValueError):
+                ts = 0.0  # Unknown age: treated as stale
+            self._quotes.update(q['ticker'], float(q['price']), float(q.get('day_change_amount') or 0),
+                                float(q.get('day_change_percent') or 0), ts)
+            self._stored_quotes.add(q['ticker'])
+        self._stored_misses.update(t for t in missing if t not in self._quotes)
+
+    def _load_corporate_actions(self, tickers: List[str], now_ts: float):
+        """Rebuilds the adjustment tables of tickers whose corporate actions were not read recently."""
+        stale = [t for t in tickers if not self._corporate_actions.is_fresh(t, now_ts, CORPORATE_ACTIONS_TTL)]
+        if not stale:
+            return
+        try:
+            rows = self.storage.list_corporate_actions(stale)
+        except Exception as e:
+            print(f"Corporate actions read error: {e}")
+            self.metrics.inc('portfolio_upstream_errors_total', upstream=self.storage.name)
+            return
+        by_ticker = {t: [] for t in stale}
+        for row in rows:
+            by_ticker.setdefault(row['ticker'], []).append(row)
+        for ticker, actions in by_ticker.items():
+            self._corporate_actions.load(ticker, actions, now_ts)
+
+    def _apply_corporate_actions(self, holdings: List[Dict]):
+        """
+        Restates holdings recorded before later splits, bonuses or dividends: quantity is multiplied by the
+        ticker's precomputed factor, cost basis, target and stop loss are divided by it, and dividends
+        received reduce the cost basis.
+        """
+        for holding in holdings:
+            ticker = (holding.get('ticker') or '').strip()
+            if not ticker:
+                continue
+            factor, dividends = self._corporate_actions.factors(ticker, holding.get('basis_date'))
+            if factor == 1.0 and not dividends:
+                continue
+            holding['quantity'] = holding['quantity'] * factor
+            for key in ('average_buy_price', 'target', 'stop_loss'):
+                if holding.get(key):
+                    holding[key] = holding[key] / factor
+            if holding.get('average_buy_price'):
+                holding['average_buy_price'] -= dividends
+            holding['adjustment_factor'] = factor
+            holding['dividends_per_share'] = dividends
+
+    def get_corporate_actions(self, ticker: str) -> List[Dict]:
+        """Stored corporate actions of a ticker, oldest first."""
+        try:
+            return sorted(self.storage.list_corporate_actions([ticker]), key=lambda a: str(a['ex_date']))
+        except Exception as e:
+            print(f"Error fetching corporate actions: {e}")
+            return []
+
+    def add_corporate_actions(self, rows: List[Dict]) -> Dict:
+        """Stores corporate actions; holdings of their tickers are restated from the next read on."""
+        try:
+            for row in rows:
+                if row.get('action') not in ACTION_TYPES:
+                    return {"success": False, "error": f"Unknown action: {row.get('action')}"}
+                if row['action'] == 'dividend' and not (row.get('amount') or 0) > 0:
+                    return {"success": False, "error": "Dividends need a positive amount"}
+                if row['action'] != 'dividend' and not (row.get('ratio') or 0) > 0:
+                    return {"success": False, "error": "Splits and bonuses need a positive ratio"}
+            self.storage.upsert_corporate_actions(rows)
+            for ticker in {row['ticker'] for row in rows}:
+                self._corporate_actions.invalidate(ticker)
+            self.alerts.invalidate()
+            return {"success": True, "count": len(rows)}
+        except Exception as e:
+            print(f"Error adding corporate actions: {e}")
+            return {"success": False, "error": str(e)}
+
+    def sync_corporate_actions(self, portfolio_id: Optional[str] = None, tenant_id: Optional[str] = None) -> Dict:
+        """Imports split and dividend history from Yahoo for the tickers of a portfolio (or all the tenant's portfolios)."""
+        try:
+            holdings = self._list_tenant_holdings(tenant_id, portfolio_id)
+            tickers = list(dict.fromkeys(t for t in ((h.get('ticker') or '').strip() for h in holdings) if t))
+            rows = []
+            for ticker in tickers:
+                if not self._yahoo_breaker.allow():
+                    break
+                self.metrics.inc('portfolio_upstream_calls_total', upstream='yf_ticker')
+                try:
+                    rows.extend(actions_from_yahoo(ticker, yf.Ticker(ticker).actions))
+                    self._yahoo_breaker.record_success()
+                except Exception as e:
+                    print(f"Error fetching corporate actions for {ticker}: {e}")
+                    if _is_upstream_error(e):
+                        self.metrics.inc('portfolio_upstream_errors_total', upstream='yf_ticker')
+                        self._yahoo_breaker.record_failure()
+                    else:
+                        # Yahoo answered, the ticker itself is the problem
+                        self._yahoo_breaker.record_success()
+            if rows:
+                self.storage.upsert_corporate_actions(rows)
+            for ticker in tickers:
+                self._corporate_actions.invalidate(ticker)
+            self.alerts.invalidate()
+            return {"success": True, "tickers": len(tickers), "actions": len(rows)}
+        except Exception as e:
+            print(f"Error syncing corporate actions: {e}")
+            return {"success": False, "error": str(e)}
+
+    def get_alerts(self, portfolio_id: Optional[str] = None, limit: int = 100, tenant_id: Optional[str] = None) -> List[Dict]:
+        """Alerts fired by this process, newest first (delivery happens through the configured sinks)."""
+        if portfolio_id and not self.owns_portfolio(tenant_id, portfolio_id):
+            return []
+        owned = self._tenant_portfolio_ids(tenant_id) if tenant_id is not None and not portfolio_id else None
+        alerts = [a for a in reversed(self.alerts.recent)
+                  if (a['portfolio_id'] == portfolio_id if portfolio_id else owned is None or a['portfolio_id'] in owned)]
+        return alerts[:limit]
+
+    def _rebuild_positions(self, portfolio_id: str, replay: Optional[set] = None,
+                           added: Optional[List[Dict]] = None) -> Tuple[Dict[str, Position], set]:
+        """
+        Ledger positions of a portfolio: stored snapshots plus the transactions recorded after the checkpoint
+        (the highest transaction id any snapshot has folded). Splits and bonuses are folded in between trades.
+        ISINs in `replay`, with newly recorded backdated transactions, or with splits recorded since they were
+        folded, are folded again from their full history. So are the ISINs of `added` transactions with an id at
+        or below the checkpoint: ids are assigned at insert but become visible at commit, so a concurrent writer
+        may have folded a higher id first. Changed snapshots are written back.
+        Returns (positions by ISIN, changed ISINs).
+        """
+        with self._ledger_lock:
+            snapshots = self.storage.list_position_snapshots(portfolio_id)
+            positions = {row['isin']: Position.from_snapshot(row) for row in snapshots}
+            checkpoint = max((p.last_id for p in positions.values()), default=0)
+            recorded = self.storage.list_transactions(portfolio_id, after_id=checkpoint)
+            self._load_ledger_actions(list(positions.values()) + recorded)
+            splits = self._corporate_actions.splits
+            late = {t['isin'] for t in added or () if t['id'] <= checkpoint}
+            replay = set(replay or ()) | late | backdated(positions, recorded) | restated(positions, splits)
+            changed = fold(positions, [t for t in recorded if t['isin'] not in replay], splits)
+            if replay:
+                for isin in replay:
+                    positions.pop(isin, None)
+                history = self.storage.list_transactions(portfolio_id, isins=sorted(replay))
+                self._load_ledger_actions(history)
+                fold(positions, history, splits)
+                changed |= replay
+            if changed:
+                self.storage.upsert_position_snapshots(
+                    [positions[i].to_snapshot(portfolio_id) for i in sorted(changed) if i in positions])
+                removed = sorted(i for i in changed if i not in positions)
+                if removed:
+                    self.storage.delete_position_snapshots(portfolio_id, removed)
+            return positions, changed
+
+    def _load_ledger_actions(self, items: List):
+        """Loads the corporate actions of the tickers of positions and transactions about to be folded."""
+        tickers = {(item.ticker if isinstance(item, Position) else item.get('ticker')) or '' for item in items}
+        self._load_corporate_actions(sorted({t.strip() for t in tickers if t.strip()}), time.time())
+
+    def _sync_ledger_holdings(self, portfolio_id: str, positions: Dict[str, Position], isins: set):
+        """
+        Writes the ledger's quantity and average cost to the holdings of `isins`; closed positions are removed.
+        The user's target and stop loss are re-expressed as of the new basis date, so moving it across a split
+        doesn't restate them.
+        """
+        rows = {True: [], False: []}  # Keyed by ticker known, as a bulk upsert needs the same columns in every row
+        closed = []
+        held = {h['isin']: h for h in self.storage.list_holdings(portfolio_id) if h['isin'] in isins}
+        for isin in sorted(isins):
+            position = positions.get(isin)
+            if position is None or position.quantity <= 0:
+                closed.append(isin)
+                continue
+            row = {
+                'portfolio_id': portfolio_id, 'isin': isin, 'stock_name': position.stock_name or isin,
+                'quantity': int(round(position.quantity)), 'average_buy_price': position.average_cost(LEDGER_COST_METHOD),
+                # Figures are as of the latest trade, so corporate actions after it restate them
+                'basis_date': position.last_date,
+            }
+            holding = held.get(isin)
+            if holding is not None:
+                ticker = (position.ticker or holding.get('ticker') or '').strip()
+                old, new = (self._corporate_actions.factors(ticker, date)[0]
+                            for date in (holding.get('basis_date'), position.last_date))
+                for key in ('target', 'stop_loss'):
+                    row[key] = holding[key] * new / old if holding.get(key) else holding.get(key)
+            else:
+                row.update(target=None, stop_loss=None)
+            if position.ticker:
+                row['ticker'] = position.ticker
+            rows[bool(position.ticker)].append(row)
+        for group in rows.values():
+            if group:
+                self.storage.upsert_holdings(group)
+        if closed:
+            self.storage.delete_holdings(portfolio_id, closed)
+        self.alerts.invalidate()
+
+    def get_transactions(self, portfolio_id: str, isin: Optional[str] = None, tenant_id: Optional[str] = None) -> List[Dict]:
+        """Ledger transactions of a portfolio (or of one ISIN) in ledger order."""
+        if not self.owns_portfolio(tenant_id, portfolio_id):
+            return []
+        try:
+            rows = self.storage.list_transactions(portfolio_id, isins=[isin] if isin else None)
+            return sorted(rows, key=lambda t: (str(t['trade_date'])[:10], t['id']))
+        except Exception as e:
+            print(f"Error fetching transactions: {e}")
+            return []
+
+    def add_transactions(self, rows: List[Dict], tenant_id: Optional[str] = None) -> Dict:
+        """Records buy, sell and dividend transactions, then rebuilds the positions and holdings they touch."""
+        try:
+            for row in rows:
+                if not row.get('portfolio_id') or not row.get('isin'):
+                    return {"success": False, "error": "Missing required fields"}
+                if not self.owns_portfolio(tenant_id, row['portfolio_id']):
+                    return {"success": False, "error": "Portfolio not found"}
+                if row.get('type') not in TRANSACTION_TYPES:
+                    return {"success": False, "error": f"Unknown transaction type: {row.get('type')}"}
+                try:
+                    row['trade_date'] = date.fromisoformat(str(row.get('trade_date'))[:10]).isoformat()
+                except ValueError:
+                    return {"success": False, "error": f"Invalid trade date: {row.get('trade_date')}"}
+                if row['type'] == 'dividend':
+                    if not ((row.get('amount') or 0) > 0 or ((row.get('quantity') or 0) > 0 and (row.get('price') or 0) > 0)):
+                        return {"success": False, "error": "Dividends need a positive amount"}
+                elif not (row.get('quantity') or 0) > 0 or row.get('price') is None or row['price'] < 0:
+                    return {"success": False, "error": "Buys and sells need a positive quantity and a price"}
+                if (row.get('fees') or 0) < 0:
+                    return {"success": False, "error": "Fees cannot be negative"}
+            added = self.storage.add_transactions(rows)
+            for portfolio_id in dict.fromkeys(row['portfolio_id'] for row in rows):
+                positions, changed = self._rebuild_positions(
+                    portfolio_id, added=[t for t in added if t['portfolio_id'] == portfolio_id])
+                self._sync_ledger_holdings(portfolio_id, positions, changed)
+            return {"success": True, "transactions": added}
+        except Exception as e:
+            print(f"Error adding transactions: {e}")
+            return {"success": False, "error": str(e)}
+
+    def delete_transactions(self, portfolio_id: str, ids: List[int], tenant_id: Optional[str] = None) -> Dict:
+        """Deletes transactions and replays the ISINs they belonged to."""
+        if not self.owns_portfolio(tenant_id, portfolio_id):
+            return {"success": False, "error": "Portfolio not found"}
+        try:
+            if not ids:
+                return {"success": True}
+            deleted = self.storage.delete_transactions(portfolio_id, ids)
+            positions, changed = self._rebuild_positions(portfolio_id, replay={row['isin'] for row in deleted})
+            self._sync_ledger_holdings(portfolio_id, positions, changed)
+            return {"success": True, "count": len(deleted)}
+        except Exception as e:
+            print(f"Error deleting transactions: {e}")
+            return {"success": False, "error": str(e)}
+
+    def get_positions(self, portfolio_id: str, method: str = LEDGER_COST_METHOD, include_closed: bool = False,
+                      tenant_id: Optional[str] = None) -> Dict:
+        """Ledger positions with average cost and realized P&L by `method` (fifo or weighted), plus totals."""
+        if method not in COST_METHODS:
+            return {"success": False, "error": f"Unknown cost method: {method}"}
+        if not self.owns_portfolio(tenant_id, portfolio_id):
+            return {"success": False, "error": "Portfolio not found"}
+        try:
+            positions, _ = self._rebuild_positions(portfolio_id)
+            # Figures are as of the latest trade; splits after it restate them like holdings
+            summaries = [positions[isin].summary(method, self._corporate_actions.factors(
+                (positions[isin].ticker or '').strip(), positions[isin].last_date)[0]) for isin in sorted(positions)]
+            return {
+                "success": True,
+                "positions": [p for p in summaries if include_closed or p['quantity'] > 0],
+                "invested": sum(p['invested'] for p in summaries),
+                "realized_pnl": sum(p['realized_pnl'] for p in summaries),
+                "dividends": sum(p['dividends'] for p in summaries),
+                "method": method,
+            }
+        except Exception as e:
+            print(f"Error rebuilding positions: {e}")
+            return {"success": False, "error": str(e)}
+
+    def export_holdings(self, portfolio_ids: List[str], batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[List[Dict]]:
+        """
+        Holdings of the given portfolios in batches, merged with the latest stored quotes and cached fundamentals
+        like a holdings request. Nothing is downloaded, and storage is paged, so only one batch is held at a time.
+        """
+        is_open = self.is_market_open()
+        for portfolio_id in portfolio_ids:
+            after_isin = None
+            while True:
+                batch = self.storage.list_holdings_page(portfolio_id, after_isin, batch_size)
+                if not batch:
+                    break
+                after_isin = batch[-1]['isin']
+                self._merge_stored_quotes(batch, is_open)
+                self._evaluate_states(batch)
+                self._apply_fundamentals(batch, fetch=False)
+                self.metrics.inc('portfolio_export_rows_total', len(batch))
+                yield batch
+                if len(batch) < batch_size:
+                    break
+
+    def _merge_stored_quotes(self, holdings: List[Dict], is_open: bool):
+        """Restates holdings for corporate actions and joins the latest known quotes, without downloading any."""
+        now_ts = time.time()
+        tickers = list(dict.fromkeys(t for t in ((h.get('ticker') or '').strip() for h in holdings) if t))
+        self._load_stored_quotes(tickers, now_ts)
+        self._load_corporate_actions(tickers, now_ts)
+        self._apply_corporate_actions(holdings)
+        open_exchanges = {exchange: self.is_market_open(exchange) for exchange in self._group_by_exchange(tickers)}
+        self._join_quotes(holdings, open_exchanges, is_open)
+
+    def simulate(self, portfolio_id: str, scenarios: List[Dict], rebalances: List[Dict],
+                 tenant_id: Optional[str] = None) -> Dict:
+        """
+        What-if analysis of a portfolio at its latest known quotes: price-shock scenarios and target-weight
+        rebalances, each batch evaluated as array operations (see simulation.py).
+        """
+        if not self.owns_portfolio(tenant_id, portfolio_id):
+            return {"success": False, "error": "Portfolio not found"}
+        if len(scenarios) > MAX_SCENARIOS or len(rebalances) > MAX_REBALANCES:
+            return {"success": False, "error": f"At most {MAX_SCENARIOS} scenarios and {MAX_REBALANCES} rebalances per request"}
+        try:
+            holdings = self.storage.list_holdings(portfolio_id)
+            self._merge_stored_quotes(holdings, self.is_market_open())
+            snapshot = Snapshot(holdings)
+            return {
+                "success": True,
+                "value": snapshot.total_value,
+                "invested": snapshot.invested,
+                "unpriced": snapshot.unpriced,
+                "scenarios": run_scenarios(snapshot, scenarios) if scenarios else [],
+                "rebalances": run_rebalances(snapshot, rebalances) if rebalances else [],
+            }
+        except ValueError as e:
+            return {"success": False, "error": str(e)}
+        except Exception as e:
+            print(f"Simulation error: {e}")
+            return {"success": False, "error": str(e)}
+
+    def _last_session(self) -> date:
+        """Latest NSE session with a final close: today once the market has closed, else the weekday before."""
+        tz, _, (close_h, close_m) = EXCHANGE_SESSIONS[DEFAULT_EXCHANGE]
+        now = datetime.now(ZoneInfo(tz))
+        day = now.date()
+        if now.weekday() >= 5 or (now.hour, now.minute) < (close_h, close_m):
+            day -= timedelta(days=1)
+        while day.weekday() >= 5:
+            day -= timedelta(days=1)
+        return day
+
+    def _sync_bars(self, tickers: List[str], session: date):
+        """
+        Brings the daily closes of `tickers` up to `session`: stored bars are read once per process, and
+        only the days from a ticker's last stored close on are downloaded and stored. Each ticker is synced
+        at most once per session.
+        """
+        session_key = session.isoformat()
+        stale = [t for t in tickers if self._bars_synced.get(t) != session_key]
+        if not stale:
+            return
+        since = (session - timedelta(days=RISK_WINDOW_DAYS * 7 // 5 + 14)).isoformat()  # Calendar days of the window
+        if self._closes is None:
+            self._closes = pd.DataFrame(dtype=float)
+        unloaded = [t for t in stale if t not in self._bars_loaded]
+        if unloaded:
+            try:
+                rows = self.storage.list_daily_bars(unloaded, since)
+            except Exception as e:
+                print(f"Daily bars read error: {e}")
+                self.metrics.inc('portfolio_upstream_errors_total', upstream=self.storage.name)
+                rows = []
+            if rows:
+                stored = pd.DataFrame(rows)
+                stored['date'] = stored['date'].astype(str).str[:10]
+                self._merge_closes(stored.pivot(index='date', columns='ticker', values='close').astype(float))
+            self._bars_loaded.update(unloaded)
+
+        # Downloads start at the last stored close, so Yahoo re-adjusting a ticker's history shows up as a changed close
+        starts: Dict[str, List[str]] = {}
+        for ticker in stale:
+            last = self._closes[ticker].last_valid_index() if ticker in self._closes else None
+            if last is not None and last >= session_key:
+                self._bars_synced[ticker] = session_key
+            else:
+                starts.setdefault(last or since, []).append(ticker)
+
+        fresh = []
+        for start, group in starts.items():
+            for i in range(0, len(group), QUOTE_CHUNK_SIZE):
+                chunk = group[i:i + QUOTE_CHUNK_SIZE]
+                fetched = self._download_closes(chunk, start)
+                if fetched is None:
+                    continue  # Retried by the next request
+                if start in fetched.index and start in self._closes.index:
+                    common = fetched.columns.intersection(self._closes.columns)
+                    ratio = fetched.loc[start, common] / self._closes.loc[start, common]
+                    readjusted = ratio.index[(ratio - 1).abs() > BAR_ADJUSTMENT_TOLERANCE].tolist()
+                    if readjusted:
+                        # A split or dividend restated the history, so the whole window is replaced
+                        history = self._download_closes(readjusted, since)
+                        if history is None:
+                            fetched = fetched.drop(columns=readjusted)
+                            chunk = [t for t in chunk if t not in readjusted]
+                        else:
+                            self._closes = self._closes.drop(columns=readjusted)
+                            fetched = fetched.drop(columns=readjusted).combine_first(history)
+                fresh.append(fetched)
+                for ticker in chunk:
+                    self._bars_synced[ticker] = session_key
+        if fresh:
+            fresh = pd.concat(fresh, axis=1)
+            self._merge_closes(fresh)
+            bars = fresh.stack().dropna()
+            try:
+                self.storage.upsert_daily_bars([
+                    {"ticker": ticker, "date": day, "close": close}
+                    for (day, ticker), close in zip(bars.index.tolist(), bars.tolist())])
+            except Exception as e:
+                print(f"Daily bars persistence error: {e}")
+                self.metrics.inc('portfolio_upstream_errors_total', upstream=self.storage.name)
+        if len(self._closes) and self._closes.index[0] < since:
+            self._closes = self._closes.loc[since:]
+
+    def _merge_closes(self, closes: pd.DataFrame):
+        """Adds (dates x tickers) closes to the in-memory history, new values winning."""
+        if not len(self._closes.columns):
+            self._closes = closes.sort_index()
+            return
+        index = self._closes.index.union(closes.index)
+        columns = self._closes.columns.union(closes.columns, sort=False)
+        old = self._closes.reindex(index=index, columns=columns).to_numpy(dtype=float)
+        new = closes.reindex(index=index, columns=columns).to_numpy(dtype=float)
+        self._closes = pd.DataFrame(np.where(np.isnan(new), old, new), index=index, columns=columns)
+
+    def _download_closes(self, tickers: List[str], start: str) -> Optional[pd.DataFrame]:
+        """Adjusted daily closes from `start` on as a (dates x tickers) frame, None if the download failed."""
+        if not self._yahoo_breaker.allow():
+            return None
+        try:
+            self.metrics.inc('portfolio_upstream_calls_total', upstream='yf_download')
+            data = yf.download(' '.join(tickers), start=start, interval='1d', group_by='ticker',
+                               auto_adjust=True, progress=False, threads=False)
+            self._yahoo_breaker.record_success()
+        except Exception as e:
+            print(f"Daily bars download of {len(tickers)} tickers failed: {e}")
+            if _is_upstream_error(e):
+                self.metrics.inc('portfolio_upstream_errors_total', upstream='yf_download')
+                self._yahoo_breaker.record_failure()
+            else:
+                # Yahoo answered, the failure is ours
+                self._yahoo_breaker.record_success()
+            return None
+        if data is None or data.empty or not isinstance(data.columns, pd.MultiIndex):
+            return pd.DataFrame(dtype=float)
+        # yfinance upper-cases symbols, map them back to ours
+        closes = data.xs('Close', axis=1, level=1).rename(columns={t.upper(): t for t in tickers})
+        closes = closes.loc[:, closes.columns.isin(tickers)].astype(float).dropna(how='all')
+        closes.index = closes.index.strftime('%Y-%m-%d')
+        closes.columns.name = None
+        return closes
+
+    def get_risk(self, portfolio_id: str, tenant_id: Optional[str] = None) -> Dict:
+        """
+        Volatility, beta against RISK_BENCHMARK, correlations and historical VaR of a portfolio over the last
+        RISK_WINDOW_DAYS daily closes (see risk.py). Reports are cached until the next session's close or
+        until the portfolio's positions change.
+        """
+        if not self.owns_portfolio(tenant_id, portfolio_id):
+            return {"success": False, "error": "Portfolio not found"}
+        try:
+            holdings = self.storage.list_holdings(portfolio_id)
+            tickers = list(dict.fromkeys(t for t in ((h.get('ticker') or '').strip() for h in holdings) if t))
+            self._load_corporate_actions(tickers, time.time())
+            self._apply_corporate_actions(holdings)
+            quantities: Dict[str, float] = {}
+            for h in holdings:
+                ticker = (h.get('ticker') or '').strip()
+                if ticker:
+                    quantities[ticker] = quantities.get(ticker, 0) + (h.get('quantity') or 0)
+            positions = tuple(sorted(quantities.items()))
+
+            session = self._last_session()
+            cached = self._risk_cache.get(portfolio_id)
+            hit = cached is not None and cached[0] == session and cached[1] == positions
+            self.metrics.inc('portfolio_cache_requests_total', cache='risk', result='hit' if hit else 'miss')
+            if hit:
+                return cached[2]
+
+            with self._risk_lock:
+                self._sync_bars(tickers + [RISK_BENCHMARK], session)
+                closes = closes_frame(self._closes, tickers + [RISK_BENCHMARK], RISK_WINDOW_DAYS)
+            # Positions are valued at the last close, so the report only changes with a new bar
+            last = closes.ffill().iloc[-1] if len(closes) else pd.Series(dtype=float)
+            values = {t: q * float(last[t]) for t, q in quantities.items() if t in last and not math.isnan(last[t])}
+            report = risk_report(closes, values, RISK_BENCHMARK, RISK_MIN_OBSERVATIONS)
+            by_ticker = report.pop('tickers')
+            result = {
+                "success": True,
+                **report,
+                "holdings": [dict(isin=h['isin'], stock_name=h.get('stock_name'), ticker=h['ticker'].strip(),
+                                  **by_ticker[h['ticker'].strip()])
+                             for h in holdings if (h.get('ticker') or '').strip() in by_ticker],
+                "no_history": [t for t in tickers if t not in values],
+            }
+            self._risk_cache[portfolio_id] = (session, positions, result)
+            return result
+        except Exception as e:
+            print(f"Risk analytics error: {e}")
+            return {"success": False, "error": str(e)}
+
+    def _store_quotes(self, quotes: pd.DataFrame):
+        updated_at = datetime.now(ZoneInfo("UTC")).isoformat()
+        self.storage.upsert_quotes([
+            {"ticker": ticker, "price": price, "day_change_amount": change_amt,
+             "day_change_percent": change_pct, "updated_at": updated_at}
+            for ticker, price, change_amt, change_pct in zip(
+                quotes.index.tolist(), quotes['price'].tolist(),
+                quotes['change_amount'].tolist(), quotes['change_percent'].tolist())
+        ])
+
+    def _fetch_quotes(self, tickers: List[str]) -> pd.DataFrame:
+        """Downloads quotes in chunks on a bounded pool; a failing chunk only loses its own tickers."""
+        if not tickers:
+            return extract_quotes(None)
+
+        chunks = [tickers[i:i + QUOTE_CHUNK_SIZE] for i in range(0, len(tickers), QUOTE_CHUNK_SIZE)]
+        tables = []
+        with ThreadPoolExecutor(max_workers=min(QUOTE_FETCH_WORKERS, len(chunks))) as pool:
+            futures = {pool.submit(self._fetch_quote_chunk, chunk): chunk for chunk in chunks}
+            for future in as_completed(futures):
+                chunk = futures[future]
+                try:
+                    quotes, answered = future.result()
+                except Exception as e:
+                    print(f"Quote chunk of {len(chunk)} tickers failed: {e}")
+                    continue
+                self._record_quote_results(answered, quotes.index)
+                tables.append(quotes)
+
+        return pd.concat(tables) if tables else extract_quotes(None)
+
+    def _fetch_quote_chunk(self, chunk: List[str], retries: int = QUOTE_FETCH_RETRIES) -> Tuple[pd.DataFrame, List[str]]:
+        """
+        Downloads one chunk, retrying with backoff when it errors or comes back empty.
+        If it keeps erroring, each half is tried on its own so one bad symbol or timeout only
+        loses its part. Returns the quotes and the tickers Yahoo actually answered for.
+        While the Yahoo circuit is open nothing is requested and cached prices are served.
+        Only network and upstream errors count against the circuit.
+        """
+        for attempt in range(retries + 1):
+            if not self._yahoo_breaker.allow():
+                return extract_quotes(None), []
+            try:
+                self.metrics.inc('portfolio_upstream_calls_total', upstream='yf_download')
+                data = yf.download(' '.join(chunk), period='5d', group_by='ticker', progress=False, threads=False)
+                self._yahoo_breaker.record_success()
+                # yfinance upper-cases symbols, map them back to ours
+                quotes = extract_quotes(data).rename(index={t.upper(): t for t in chunk})
+                if not quotes.empty or attempt == retries:
+                    return quotes, chunk
+            except Exception as e:
+                print(f"Quote chunk of {len(chunk)} tickers failed (attempt {attempt + 1}): {e}")
+                if _is_upstream_error(e):
+                    self.metrics.inc('portfolio_upstream_errors_total', upstream='yf_download')
+                    self._yahoo_breaker.record_failure()
+                else:
+                    # Yahoo answered, the failure is ours
+                    self._yahoo_breaker.record_success()
+                if attempt == retries:
+                    break
+            time.sleep(0.5 * 2 ** attempt)
+
+        if len(chunk) == 1 or self._yahoo_breaker.state == 'open':
+            return extract_quotes(None), []
+        mid = len(chunk) // 2
+        left_quotes, left_answered = self._fetch_quote_chunk(chunk[:mid], retries=0)
+        right_quotes, right_answered = self._fetch_quote_chunk(chunk[mid:], retries=0)
+        return pd.concat([left_quotes, right_quotes]), left_answered + right_answered
+
+    def _record_quote_results(self, requested: List[str], returned, now: Optional[float] = None):
+        """Backs off answered tickers that came back without data; repeat offenders are quarantined."""
+        now = now or time.time()
+        returned = set(returned)
+        for ticker in requested:
+            if ticker in returned:
+                self._quote_failures.record_success(ticker)
+                continue
+            delay = self._quote_failures.record_failure(ticker, now)
+            self.metrics.inc('portfolio_ticker_errors_total', kind='no_data')
+            print(f"No data for {ticker}, skipping it for {delay:.0f}s")
+
+    def _evaluate_states(self, holdings: List[Dict]):
+        """
+        Calculates returns and SELL triggers for all holdings in one pass. The figures live in the
+        holding dicts, so reading them out into arrays would cost more than the rules themselves.
+        """
+        for holding in holdings:
+            # Missing, zero and NaN figures don't trigger anything
+            curr, buy = holding.get('current_price'), holding.get('average_buy_price')
+            if not curr or not buy or curr != curr or buy != buy:
+                continue
+            returns = (curr - buy) / buy * 100 if buy > 0 else 0.0
+            holding['total_return_percent'] = returns
+
+            # Rules are checked in priority order
+            target, stop_loss = holding.get('target'), holding.get('stop_loss')
+            if target and curr >= target:
+                holding['state'], holding['state_reason'] = "SELL", "Target Hit"
+            elif returns >= 30:
+                holding['state'], holding['state_reason'] = "SELL", "Returns > 30%"
+            elif stop_loss and curr <= stop_loss:
+                holding['state'], holding['state_reason'] = "SELL", "Stop Loss Hit"
+
+    def _apply_fundamentals(self, holdings: List[Dict], fetch: bool = True):
+        """Sets fundamentals on holdings with a ticker; with `fetch=False` only cached tiers are used."""
+        rows = [h for h in holdings if (h.get('ticker') or '').strip()]
+        if not rows:
+            return
+        tickers = [h['ticker'].strip() for h in rows]
+        prices = [h.get('current_price', np.nan) for h in rows]
+        for holding, data in zip(rows, self._get_fundamentals(tickers, prices, fetch)):
+            holding.update(data)
+
+    def _get_fundamentals(self, tickers: List[str], prices: List[float], fetch: bool = True) -> List[Dict]:
+        """
+        Fundamentals of many tickers in one vectorized pass (see fundamentals.py). Stale tiers are
+        refetched per ticker first unless `fetch` is False; PE and market cap are priced at `prices`.
+        """
+        if fetch:
+            now = time.time()
+            for ticker in dict.fromkeys(tickers):
+                self._refresh_fundamentals(ticker, now)
+
+        # Growth is derived from statements, so it is only recomputed for tickers whose statements changed
+        if self._growth is None:
+            self._growth = growth_table({})  # Not at init, which would import pandas on every cold start
+        if self._growth_stale:
+            stale, self._growth_stale = self._growth_stale, set()
+            fresh = growth_table({t: self._statements_cache[t]['data'] for t in stale if t in self._statements_cache})
+            self._growth = pd.concat([self._growth.drop(index=list(stale), errors='ignore'), fresh])
+
+        valuations = np.array([self._valuation_vector(t) for t in tickers], dtype=float)
+        return table_records(fundamentals_table(valuations, self._growth.reindex(tickers), prices))
+
+    def _valuation_vector(self, ticker: str) -> Tuple[float, ...]:
+        entry = self._valuation_cache.get(ticker)
+        if entry is None:
+            return valuation_vector(None)
+        if 'vector' not in entry:
+            entry['vector'] = valuation_vector(entry['data'])
+        return entry['vector']
+
+    def _refresh_fundamentals(self, ticker: str, now: float):
+        """Refetches whichever fundamentals tier of a ticker is stale, each on its own TTL."""
+        valuation = self._get_fundamental_tier(
+            'valuation', ticker, now, self._valuation_cache, self._valuation_failures,
+            lambda t: valuation_from_info(t.info),
+            lambda entry: now - entry['ts'] >= self._valuation_expiry
+        )
+        statements = self._statements_cache.get(ticker)
+        self._get_fundamental_tier(
+            'statements', ticker, now, self._statements_cache, self._statements_failures,
+            lambda t: statements_from_financials(t.financials),
+            lambda entry: now - entry['ts'] >= self._statements_expiry or (
+                is_new_fiscal_year(valuation, entry['data']) and now - entry['ts'] >= self._statements_recheck)
+        )
+        if self._statements_cache.get(ticker) is not statements:
+            self._growth_stale.add(ticker)
+
+    def _get_fundamental_tier(self, tier: str, ticker: str, now: float, cache: Dict,
+                              failures: NegativeCache, fetcher, is_stale) -> Optional[Dict]:
+        """Serves one tier from its cache, refetching it when stale; failures fall back to the last good copy."""
+        cache_entry = cache.get(ticker)
+        if cache_entry and not is_stale(cache_entry):
+            self.metrics.inc('portfolio_cache_requests_total', cache=tier, result='hit')
+            return cache_entry['data']
+        self.metrics.inc('portfolio_cache_requests_total', cache=tier, result='miss')
+
+        # Failing tickers back off, and an open Yahoo circuit serves the last good copy
+        if failures.is_blocked(ticker, now) or not self._yahoo_breaker.allow():
+            return cache_entry['data'] if cache_entry else None
+
+        print(f"Fetching {tier} for {ticker}...")
+        self.metrics.inc('portfolio_upstream_calls_total', upstream='yf_ticker')
+        try:
+            data = fetcher(yf.Ticker(ticker))
+        except Exception as e:
+            print(f"Error fetching {tier} for {ticker}: {e}")
+            self.metrics.inc('portfolio_upstream_errors_total', upstream='yf_ticker')
+            self.metrics.inc('portfolio_ticker_errors_total', kind=tier)
+            failures.record_failure(ticker, now)
+            if _is_upstream_error(e):
+                self._yahoo_breaker.record_failure()
+            else:
+                # Yahoo answered, the ticker itself is the problem
+                self._yahoo_breaker.record_success()
+            return cache_entry['data'] if cache_entry else None
+
+        cache[ticker] = {"data": data, "ts": now}
+        failures.record_success(ticker)
+        self._yahoo_breaker.record_success()
+        return data
+
+    def delete_holdings(self, portfolio_id: str, isins: List[str], tenant_id: Optional[str] = None):
+        """Bulk deletes holdings from a portfolio."""
+        try:
+            if not isins:
+                return {"success": True}
+            if not self.owns_portfolio(tenant_id, portfolio_id):
+                return {"success": False, "error": "Portfolio not found"}
+            
+            self.storage.delete_holdings(portfolio_id, isins)
+            self.alerts.invalidate()
+            return {"success": True}
+        except Exception as e:
+            print(f"Error deleting holdings: {e}")
+            return {"success": False, "error": str(e)}
+
+    def add_holding(self, data: Dict, tenant_id: Optional[str] = None):
+        """Adds a new holding manually."""
+        try:
+            # Basic validation
+            if not data.get('portfolio_id') or not data.get('isin') or not data.get('stock_name'):
+                return {"success": False, "error": "Missing required fields"}
+            if not self.owns_portfolio(tenant_id, data['portfolio_id']):
+                return {"success": False, "error": "Portfolio not found"}
+            
+            # Upsert (uses portfolio_id + isin as primary key)
+            self.storage.upsert_holdings([dict(data, basis_date=_today())])
+            self.alerts.invalidate()
+            return {"success": True}
+        except Exception as e:
+            print(f"Error adding holding: {e}")
+            return {"success": False, "error": str(e)}
+
+    def get_portfolios(self, tenant_id: Optional[str] = None) -> List[Dict]:
+        """Fetch the tenant's portfolios (every tenant's if tenant_id is None)."""
+        try:
+            portfolios = self.storage.list_portfolios(tenant_id)
+            if tenant_id is not None:
+                self._tenant_portfolios[tenant_id] = ({p['id'] for p in portfolios}, time.time())
+            return portfolios
+        except Exception as e:
+            print(f"Error fetching portfolios: {e}")
+            return []
+
+    def create_portfolio(self, name: str, tenant_id: Optional[str] = None) -> Dict:
+        """Create a new portfolio."""
+        try:
+            portfolio = self.storage.create_portfolio(name, tenant_id or DEFAULT_TENANT)
+            if portfolio:
+                self._tenant_portfolios.pop(tenant_id or DEFAULT_TENANT, None)
+                return {"success": True, "portfolio": portfolio}
+            return {"success": False, "error": "Failed to create portfolio"}
+        except Exception as e:
+            print(f"Error creating portfolio: {e}")
+            return {"success": False, "error": str(e)}
+
+    def rename_portfolio(self, portfolio_id: str, new_name: str, tenant_id: Optional[str] = None) -> Dict:
+        """Rename an existing portfolio."""
+        if not self.owns_portfolio(tenant_id, portfolio_id):
+            return {"success": False, "error": "Portfolio not found"}
+        try:
+            portfolio = self.storage.rename_portfolio(portfolio_id, new_name)
+            if portfolio:
+                return {"success": True, "portfolio": portfolio}
+            return {"success": False, "error": "Failed to rename portfolio"}
+        except Exception as e:
+            print(f"Error renaming portfolio: {e}")
+            return {"success": False, "error": str(e)}
+
+    def delete_portfolio(self, portfolio_id: str, tenant_id: Optional[str] = None):
+        """Delete a portfolio and all its holdings."""
+        if not self.owns_portfolio(tenant_id, portfolio_id):
+            return {"success": False, "error": "Portfolio not found"}
+        try:
+            self.storage.delete_portfolio(portfolio_id)
+            for ids, _ in self._tenant_portfolios.values():
+                ids.discard(portfolio_id)
+            return {"success": True}
+        except Exception as e:
+            print(f"Error deleting portfolio: {e}")
+            return {"success": False, "error": str(e)}
+
+    def update_holding_settings(self, portfolio_id: str, isin: str, ticker: Optional[str] = None, date_of_exit: Optional[str] = None, target: Optional[float] = None, stop_loss: Optional[float] = None, quantity: Optional[int] = None, average_buy_price: Optional[float] = None, tenant_id: Optional[str] = None):
+        """Updates a holding's settings in storage."""
+        if not self.owns_portfolio(tenant_id, portfolio_id):
+            return {"success": False, "error": "Portfolio not found"}
+        try:
+            update_data = {}
+            
+            if ticker is not None:
+                update_data['ticker'] = ticker
+            if date_of_exit is not None:
+                update_data['date_of_exit'] = date_of_exit
+            if target is not None:
+                update_data['target'] = target
+            if stop_loss is not None:
+                update_data['stop_loss'] = stop_loss
+            if quantity is not None:
+                update_data['quantity'] = quantity
+            if average_buy_price is not None:
+                update_data['average_buy_price'] = average_buy_price
+            if {'target', 'stop_loss', 'quantity', 'average_buy_price'} & update_data.keys():
+                # Figures are entered as of today, so the holding is re-based: its other figures are restated
+                # by the corporate actions since its old basis date, and only later actions restate any of them
+                update_data = {**self._rebased_position(portfolio_id, isin), **update_data, 'basis_date': _today()}
+            
+            if update_data:
+                print(f"Updating holding: {isin} in portfolio: {portfolio_id} with {update_data}")
+                res = self.storage.update_holding(portfolio_id, isin, update_data)
+                print(f"Update result: {res}")
+                self.alerts.invalidate()
+            else:
+                print("No update data provided")
+            
+            return {"success": True}
+        except Exception as e:
+            print(f"Error updating holding: {e}")
+            import traceback
+            traceback.print_exc()
+            return {"success": False, "error": str(e)}
+
+    def _rebased_position(self, portfolio_id: str, isin: str) -> Dict:
+        """A stored holding's quantity, cost basis, target and stop loss restated as of today."""
+        holding = next((h for h in self.storage.list_holdings(portfolio_id) if h['isin'] == isin), None)
+        if holding is None:
+            return {}
+        ticker = (holding.get('ticker') or '').strip()
+        if ticker:
+            self._load_corporate_actions([ticker], time.time())
+            self._apply_corporate_actions([holding])
+        return {key: holding[key] for key in ('quantity', 'average_buy_price', 'target', 'stop_loss') if holding.get(key) is not None}
+
+    def auto_discover_ticker(self, isin: str, stock_name: str) -> Optional[str]:
+        """Resolves a ticker from the instrument master, falling back to Yahoo search."""
+        return self._resolve_local_ticker(isin, stock_name) or self._search_ticker(isin, stock_name)
+
+    def _resolve_local_ticker(self, isin: str, stock_name: str) -> Optional[str]:
+        """Instrument master lookup by ISIN, then by (fuzzy) name."""
+        instrument = self.instruments.resolve(isin, stock_name)
+        self.metrics.inc('portfolio_cache_requests_total', cache='instrument', result='hit' if instrument else 'miss')
+        if not instrument:
+            return None
+        self._exchange_hints[instrument['ticker']] = instrument['exchange']
+        return instrument['ticker']
+
+    def _search_ticker(self, isin: str, stock_name: str) -> Optional[str]:
+        """Attempts to find ticker by ISIN, then by Name, with Yahoo search."""
+        def _search(query: str) -> Optional[str]:
+            if not self._yahoo_breaker.allow():
+                return None
+            try:
+                url = f"https://query2.finance.yahoo.com/v1/finance/search?q={query}&quotesCount=5&newsCount=0"
+                headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'}
+                self.metrics.inc('portfolio_upstream_calls_total', upstream='yahoo_search')
+                response = requests.get(url, headers=headers, timeout=5)
+            except Exception as e:
+                print(f"Search error for {query}: {e}")
+                self.metrics.inc('portfolio_upstream_errors_total', upstream='yahoo_search')
+                self._yahoo_breaker.record_failure()
+                return None
+
+            if response.status_code == 429 or response.status_code >= 500:
+                print(f"Search for {query} rejected upstream: HTTP {response.status_code}")
+                self.metrics.inc('portfolio_upstream_errors_total', upstream='yahoo_search')
+                self._yahoo_breaker.record_failure()
+                return None
+            self._yahoo_breaker.record_success()
+
+            try:
+                if response.status_code == 200:
+                    data = response.json()
+                    quotes = data.get('quotes', [])
+                    
+                    # Remember the listing exchange reported by search
+                    for quote in quotes:
+                        exchange = YAHOO_EXCHANGE_CODES.get(quote.get('exchange'))
+                        if quote.get('symbol') and exchange:
+                            self._exchange_hints[quote['symbol']] = exchange
+
+                    # Prioritize NSE tickers
+                    for quote in quotes:
+                        symbol = quote.get('symbol', '')
+                        if '.NS' in symbol:
+                            return symbol
+                    
+                    # Fallback to first result
+                    if quotes:
+                        return quotes[0].get('symbol')
+            except Exception as e:
+                print(f"Search error for {query}: {e}")
+            return None
+        
+        # Try ISIN first
+        ticker = _search(isin)
+        if ticker:
+            return ticker
+        
+        # Try stock name
+        ticker = _search(normalize_name(stock_name))
+        
+        return ticker
+
+    def auto_discover_all(self, portfolio_id: Optional[str] = None, tenant_id: Optional[str] = None):
+        """Auto-discovers tickers for holdings without tickers, locally first and by Yahoo search for the rest."""
+        try:
+            holdings = self._list_tenant_holdings(tenant_id, portfolio_id)
+            missing = [h for h in holdings if not h.get('ticker')]
+
+            # Instrument master hits are written back in one bulk upsert
+            resolved, unresolved = [], []
+            for holding in missing:
+                found_ticker = self._resolve_local_ticker(holding['isin'], holding['stock_name'])
+                if found_ticker:
+                    resolved.append(dict(holding, ticker=found_ticker))
+                else:
+                    unresolved.append(holding)
+            if resolved:
+                self.storage.upsert_holdings(resolved)
+                self.alerts.invalidate()
+                print(f"Resolved {len(resolved)} tickers from the instrument master")
+            updated_count = len(resolved)
+
+            for holding in unresolved:
+                isin = holding['isin']
+                pid = holding['portfolio_id']
+                found_ticker = self._search_ticker(isin, holding['stock_name'])
+                if found_ticker:
+                    print(f"Found {found_ticker} for {isin} in {pid}")
+                    self.update_holding_settings(pid, isin, ticker=found_ticker)
+                    updated_count += 1
+                    time.sleep(0.2)  # Rate limit
+            
+            return {"updated": updated_count}
+        except Exception as e:
+            print(f"Error in auto_discover_all: {e}")
+            import traceback
+            traceback.print_exc()
+            return {"updated": 0}
+
+    def save_excel_file(self, content: bytes, portfolio_id: Optional[str] = None, tenant_id: Optional[str] = None):
+        """Processes uploaded Excel file and updates storage (defaults to the tenant's first portfolio)."""
+        import io
+        
+        try:
+            # Read Excel from bytes
+            df = pd.read_excel(io.BytesIO(content), header=None)
+            
+            # Find header row
+            header_row = None
+            for idx, row in df.iterrows():
+                if any('ISIN' in str(cell) or 'Symbol' in str(cell) for cell in row):
+                    header_row = idx
+                    break
+            
+            if header_row is None:
+                raise ValueError("Could not find header row in Excel")
+            
+            df = pd.read_excel(io.BytesIO(content), header=header_row)
+            
+            if not portfolio_id:
+                portfolios = self.get_portfolios(tenant_id)
+                portfolio_id = portfolios[0]['id'] if portfolios else None
+                if not portfolio_id:
+                    raise ValueError("No portfolios found to upload to")
+            elif not self.owns_portfolio(tenant_id, portfolio_id):
+                raise ValueError("Portfolio not found")
+            
+            # Get current holdings from DB
+            current_holdings = self.storage.list_holdings(portfolio_id)
+            # Targets and stop losses carried over are restated for corporate actions since they were set
+            self._load_corporate_actions(list({h['ticker'] for h in current_holdings if h.get('ticker')}), time.time())
+            self._apply_corporate_actions(current_holdings)
+            settings_map = {h['isin']: h for h in current_holdings}
+            
+            # Process new data
+            new_records = []
+            for _, row in df.iterrows():
+                isin = str(row.get('ISIN', '')).strip()
+                if not isin or isin == 'nan':
+                    continue
+                
+                stock_name = str(row.get('Stock Name', row.get('Security Name', ''))).strip()
+                quantity = int(row.get('Quantity', row.get('Qty', 0)))
+                avg_price = float(row.get('Average buy price', row.get('Avg Price', 0)))
+                
+                # Preserve existing settings
+                existing = settings_map.get(isin, {})
+                
+                record = {
+                    'portfolio_id': portfolio_id,
+                    'isin': isin,
+                    'stock_name': stock_name,
+                    'quantity': quantity,
+                    'average_buy_price': avg_price,
+                    'ticker': existing.get('ticker'),
+                    'date_of_exit': existing.get('date_of_exit'),
+                    'target': existing.get('target'),
+                    'stop_loss': existing.get('stop_loss'),
+                    'basis_date': _today(),  # Broker statements already reflect past corporate actions
+                }
+                new_records.append(record)
+            
+            # Upsert all records
+            if new_records:
+                self.storage.upsert_holdings(new_records)
+                self.alerts.invalidate()
+            
+            return {"success": True, "count": len(new_records)}
+        except Exception as e:
+            print(f"Error processing Excel: {e}")
+            raise
+
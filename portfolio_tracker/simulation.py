@@ -0,0 +1,144 @@
+"""
+What-if simulation over a snapshot of a portfolio's priced holdings. Price-shock scenarios
+and target-weight rebalances are evaluated many at once, as (cases x holdings) matrices.
+"""
+from __future__ import annotations
+
+from typing import Dict, List, Optional
+
+from .lazy import np
+
+MAX_SCENARIOS = 10000
+MAX_REBALANCES = 100
+SCENARIO_BLOCK = 1024  # Scenarios per matrix, bounds memory for large requests
+
+
+class Snapshot:
+    """Priced holdings as arrays. Holdings without a price cannot be simulated and are left out."""
+
+    def __init__(self, holdings: List[Dict]):
+        priced = [h for h in holdings if h.get('current_price')]
+        self.holdings = priced
+        self.unpriced = [h['isin'] for h in holdings if not h.get('current_price')]
+
+        def column(key: str) -> np.ndarray:
+            # Missing values become NaN, so comparisons against them are False
+            return np.fromiter((h.get(key) or np.nan for h in priced), dtype=float, count=len(priced))
+
+        self.quantity = np.nan_to_num(column('quantity'))
+        self.cost = np.nan_to_num(column('average_buy_price'))
+        self.price = column('current_price')
+        self.target = column('target')
+        self.stop_loss = column('stop_loss')
+        self.value = self.quantity * self.price
+        self.total_value = float(self.value.sum())
+        self.invested = float((self.quantity * self.cost).sum())
+        # Scenarios and weights may name a holding by ISIN or ticker
+        self._index = {}
+        for i, h in enumerate(priced):
+            self._index[h['isin']] = i
+            if h.get('ticker'):
+                self._index.setdefault(h['ticker'].strip(), i)
+
+    def index(self, key: str) -> Optional[int]:
+        return self._index.get(key)
+
+    def matrix(self, cases: List[Dict], default_key: str, overrides_key: str) -> np.ndarray:
+        """(cases x holdings) matrix of each case's default value, with its per-holding overrides set."""
+        matrix = np.repeat(np.array([c.get(default_key) or 0.0 for c in cases], dtype=float)[:, None],
+                           len(self.holdings), axis=1)
+        for row, case in enumerate(cases):
+            for key, value in (case.get(overrides_key) or {}).items():
+                i = self.index(key)
+                if i is None:
+                    raise ValueError(f"Not a priced holding of this portfolio: {key}")
+                matrix[row, i] = value
+        return matrix
+
+
+def _isins(snapshot: Snapshot, mask_row: np.ndarray) -> List[str]:
+    return [snapshot.holdings[i]['isin'] for i in np.flatnonzero(mask_row).tolist()]
+
+
+def validate_scenarios(scenarios: List[Dict]):
+    """Raises ValueError for a shock below -1, which would price a holding below zero."""
+    for number, scenario in enumerate(scenarios, 1):
+        shocks = [scenario.get('shock') or 0.0, *(scenario.get('shocks') or {}).values()]
+        if min(shocks) < -1:
+            name = scenario.get('name') or f"Scenario {number}"
+            raise ValueError(f"Shocks of {name} must be at least -1 (a 100% drop)")
+
+
+def run_scenarios(snapshot: Snapshot, scenarios: List[Dict]) -> List[Dict]:
+    """
+    Price shocks: each scenario moves every price by `shock` (-0.1 is a 10% drop), and the holdings
+    named in `shocks` (Format: {isin or ticker: shock}) by their own. Returns each scenario's value,
+    P&L against today and against cost, and the stop losses and targets its prices hit.
+    """
+    validate_scenarios(scenarios)
+    results = []
+    for start in range(0, len(scenarios), SCENARIO_BLOCK):
+        block = scenarios[start:start + SCENARIO_BLOCK]
+        prices = snapshot.price * (1 + snapshot.matrix(block, 'shock', 'shocks'))
+        values = prices * snapshot.quantity
+        totals = values.sum(axis=1)
+        stops = prices <= snapshot.stop_loss
+        targets = prices >= snapshot.target
+        stop_exposure = np.where(stops, values, 0.0).sum(axis=1)
+        for row, scenario in enumerate(block):
+            total = float(totals[row])
+            results.append({
+                'name': scenario.get('name') or f"Scenario {start + row + 1}",
+                'value': total,
+                'pnl': total - snapshot.total_value,
+                'pnl_percent': (total - snapshot.total_value) / snapshot.total_value * 100 if snapshot.total_value else 0.0,
+                'unrealized_pnl': total - snapshot.invested,
+                'stop_losses': _isins(snapshot, stops[row]),
+                'stop_loss_value': float(stop_exposure[row]),
+                'targets': _isins(snapshot, targets[row]),
+            })
+    return results
+
+
+def run_rebalances(snapshot: Snapshot, rebalances: List[Dict]) -> List[Dict]:
+    """
+    Target-weight rebalances: `weights` (Format: {isin or ticker: weight}) over today's value plus `cash`.
+    Holdings without a weight get `default_weight` (0, so they are sold). Trades are in whole shares unless
+    `fractional`, rounded towards holding less so they never need more than is available; the rest stays cash.
+    """
+    weights = snapshot.matrix(rebalances, 'default_weight', 'weights')
+    invalid = (weights.sum(axis=1) > 1 + 1e-9) | (weights < 0).any(axis=1)
+    if invalid.any():
+        name = rebalances[int(np.flatnonzero(invalid)[0])].get('name') or 'a rebalance'
+        raise ValueError(f"Weights of {name} must be non-negative and sum to at most 1")
+    cash = np.array([r.get('cash') or 0.0 for r in rebalances], dtype=float)
+    budgets = snapshot.total_value + cash
+    target_quantity = weights * budgets[:, None] / snapshot.price
+    whole = np.array([not r.get('fractional') for r in rebalances])[:, None]
+    target_quantity = np.where(whole, np.floor(target_quantity + 1e-9), target_quantity)
+    trades = target_quantity - snapshot.quantity
+    trade_values = trades * snapshot.price
+    cash_after = budgets - (target_quantity * snapshot.price).sum(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        drift = np.abs(np.where(budgets[:, None] > 0, target_quantity * snapshot.price / budgets[:, None], 0.0) - weights).max(axis=1, initial=0.0)
+
+    results = []
+    for row, rebalance in enumerate(rebalances):
+        traded = np.flatnonzero(np.abs(trades[row]) > 1e-9).tolist()
+        results.append({
+            'name': rebalance.get('name') or f"Rebalance {row + 1}",
+            'value': float(budgets[row]),
+            'cash_after': float(cash_after[row]),
+            'turnover': float(np.abs(trade_values[row]).sum()),
+            'max_weight_drift': float(drift[row]),
+            'trades': [{
+                'isin': snapshot.holdings[i]['isin'],
+                'ticker': snapshot.holdings[i].get('ticker'),
+                'stock_name': snapshot.holdings[i].get('stock_name'),
+                'action': 'BUY' if trades[row, i] > 0 else 'SELL',
+                'quantity': abs(float(trades[row, i])),
+                'price': float(snapshot.price[i]),
+                'value': abs(float(trade_values[row, i])),
+            } for i in traded],
+        })
+    return results
@@ -0,0 +1,850 @@
+"""
+Persistence backends for portfolios and holdings. PortfolioService only talks to
+the Storage interface; STORAGE_BACKEND picks Supabase (default) or an embedded
+SQLite file for single-node deployments, tests and offline benchmarks.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime
+from zoneinfo import ZoneInfo
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .tenants import DEFAULT_TENANT
+
+# Supabase credentials (use environment variables)
+SUPABASE_URL = os.environ.get("SUPABASE_URL")
+SUPABASE_KEY = os.environ.get("SUPABASE_KEY")
+
+STORAGE_BACKEND = os.environ.get("STORAGE_BACKEND", "supabase")
+SQLITE_PATH = os.environ.get("SQLITE_PATH", os.path.join(os.path.dirname(__file__), '..', 'portfolio.db'))
+SQLITE_CHANGE_POLL_SECONDS = float(os.environ.get("SQLITE_CHANGE_POLL_SECONDS", 1))
+
+# Per-portfolio holdings cache: seconds before a cached portfolio is re-read (0 disables the cache).
+# While a change feed is connected (HOLDINGS_REALTIME=1, long-running server) entries never expire.
+HOLDINGS_CACHE_TTL = float(os.environ.get("HOLDINGS_CACHE_TTL", 30))
+HOLDINGS_REALTIME = os.environ.get("HOLDINGS_REALTIME", "0") == "1"
+
+HOLDING_COLUMNS = (
+    'portfolio_id', 'isin', 'stock_name', 'quantity', 'average_buy_price', 'ticker', 'date_of_exit',
+    'target', 'stop_loss', 'basis_date',
+)
+CORPORATE_ACTION_COLUMNS = ('ticker', 'ex_date', 'action', 'ratio', 'amount')
+TRANSACTION_COLUMNS = (
+    'portfolio_id', 'isin', 'stock_name', 'ticker', 'type', 'trade_date', 'quantity', 'price', 'fees', 'amount',
+)
+POSITION_SNAPSHOT_COLUMNS = (
+    'portfolio_id', 'isin', 'stock_name', 'ticker', 'quantity', 'lots', 'weighted_cost',
+    'realized_fifo', 'realized_weighted', 'dividends', 'last_id', 'last_date', 'split_factor',
+)
+# Per-holding market data, superseded by the ticker-keyed quotes table
+LEGACY_MARKET_COLUMNS = ('last_price', 'last_day_change_amt', 'last_day_change_pct', 'market_data_updated_at')
+QUOTE_READ_CHUNK = 200  # Tickers per IN (...) lookup
+PAGE_SIZE = 1000  # Rows per paged read, PostgREST's default row limit silently truncates a larger response
+BAR_PAGE_SIZE = 1000  # Rows per daily bars upsert request
+
+
+class ChangeFeed:
+    """Handle on a background subscription to holdings changes made by other writers."""
+
+    def __init__(self):
+        self.connected = threading.Event()
+        self.stopped = threading.Event()
+        self._on_stop: List[Callable[[], None]] = []
+
+    def stop(self):
+        self.stopped.set()
+        self.connected.clear()
+        for fn in self._on_stop:
+            fn()
+
+
+class Storage:
+    """Portfolio and holdings persistence. Holdings are keyed by (portfolio_id, isin)."""
+
+    name = 'storage'
+
+    def list_holdings(self, portfolio_id: Optional[str] = None) -> List[Dict]:
+        """Holdings of one portfolio, or of every portfolio if portfolio_id is None."""
+        raise NotImplementedError
+
+    def list_holdings_page(self, portfolio_id: str, after_isin: Optional[str] = None, limit: int = 1000) -> List[Dict]:
+        """Up to `limit` holdings of a portfolio in ISIN order, starting after `after_isin` (keyset paging for exports)."""
+        raise NotImplementedError
+
+    def upsert_holdings(self, rows: List[Dict]):
+        """Inserts holdings, or updates the given columns of existing (portfolio_id, isin) rows."""
+        raise NotImplementedError
+
+    def update_holding(self, portfolio_id: str, isin: str, fields: Dict) -> List[Dict]:
+        """Updates one holding and returns the updated rows."""
+        raise NotImplementedError
+
+    def get_quotes(self, tickers: List[str]) -> List[Dict]:
+        """Persisted quotes (ticker, price, day_change_amount, day_change_percent, updated_at) of the given tickers."""
+        raise NotImplementedError
+
+    def upsert_quotes(self, rows: List[Dict]):
+        """Stores the latest quote per ticker."""
+        raise NotImplementedError
+
+    def delete_holdings(self, portfolio_id: str, isins: Optional[List[str]] = None):
+        """Deletes the given holdings, or every holding of the portfolio if isins is None."""
+        raise NotImplementedError
+
+    def list_corporate_actions(self, tickers: List[str]) -> List[Dict]:
+        """Splits, bonuses and dividends (ticker, ex_date, action, ratio, amount) of the given tickers."""
+        raise NotImplementedError
+
+    def upsert_corporate_actions(self, rows: List[Dict]):
+        """Stores corporate actions, keyed by (ticker, ex_date, action)."""
+        raise NotImplementedError
+
+    def list_transactions(self, portfolio_id: str, after_id: int = 0, isins: Optional[List[str]] = None) -> List[Dict]:
+        """Ledger transactions of a portfolio with an id above after_id, optionally of some ISINs only, by id."""
+        raise NotImplementedError
+
+    def add_transactions(self, rows: List[Dict]) -> List[Dict]:
+        """
+        Appends transactions and returns them with their ids, which increase in recording order. A concurrent
+        writer's lower id can still become visible after a higher one, when its commit lands later.
+        """
+        raise NotImplementedError
+
+    def delete_transactions(self, portfolio_id: str, ids: List[int]) -> List[Dict]:
+        """Deletes transactions and returns the deleted rows."""
+        raise NotImplementedError
+
+    def list_position_snapshots(self, portfolio_id: str) -> List[Dict]:
+        """Materialized ledger positions of a portfolio, one per ISIN (see ledger.py)."""
+        raise NotImplementedError
+
+    def upsert_position_snapshots(self, rows: List[Dict]):
+        """Stores position snapshots, keyed by (portfolio_id, isin)."""
+        raise NotImplementedError
+
+    def delete_position_snapshots(self, portfolio_id: str, isins: List[str]):
+        raise NotImplementedError
+
+    def list_daily_bars(self, tickers: List[str], since: str) -> List[Dict]:
+        """Daily closes (ticker, date, close) of the given tickers from `since` on."""
+        raise NotImplementedError
+
+    def upsert_daily_bars(self, rows: List[Dict]):
+        """Stores daily closes, keyed by (ticker, date)."""
+        raise NotImplementedError
+
+    def list_portfolios(self, tenant_id: Optional[str] = None) -> List[Dict]:
+        """Portfolios of one tenant, or of every tenant if tenant_id is None."""
+        raise NotImplementedError
+
+    def create_portfolio(self, name: str, tenant_id: str = DEFAULT_TENANT) -> Optional[Dict]:
+        raise NotImplementedError
+
+    def rename_portfolio(self, portfolio_id: str, name: str) -> Optional[Dict]:
+        raise NotImplementedError
+
+    def delete_portfolio(self, portfolio_id: str):
+        """Deletes a portfolio and its holdings."""
+        raise NotImplementedError
+
+    def subscribe_changes(self, callback: Callable[[Optional[str], Optional[Dict]], None]) -> Optional[ChangeFeed]:
+        """
+        Calls callback(portfolio_id, row) when holdings change, with the new row for inserts
+        and updates, row None for deletes, and (None, None) when the backend can't tell what
+        changed. Returns None if the backend has no change feed.
+        """
+        return None
+
+
+class SupabaseStorage(Storage):
+    name = 'supabase'
+
+    def __init__(self, client, url: Optional[str] = None, key: Optional[str] = None):
+        self.client = client
+        self.url = url  # Realtime needs its own async client
+        self.key = key
+
+    def _paged(self, query: Callable[[], Any]) -> List[Dict]:
+        """Every row of an ordered query, read PAGE_SIZE rows at a time; `query` builds a fresh request per page."""
+        rows, offset = [], 0
+        while True:
+            page = query().range(offset, offset + PAGE_SIZE - 1).execute().data
+            rows.extend(page)
+            if len(page) < PAGE_SIZE:
+                return rows
+            offset += PAGE_SIZE
+
+    def list_holdings(self, portfolio_id: Optional[str] = None) -> List[Dict]:
+        # Every portfolio's holdings (for the alert index) easily exceed one response
+        def query():
+            query = self.client.table('holdings').select('*')
+            if portfolio_id:
+                query = query.eq('portfolio_id', portfolio_id)
+            return query.order('portfolio_id').order('isin')
+        return self._paged(query)
+
+    def list_holdings_page(self, portfolio_id: str, after_isin: Optional[str] = None, limit: int = 1000) -> List[Dict]:
+        query = self.client.table('holdings').select('*').eq('portfolio_id', portfolio_id)
+        if after_isin is not None:
+            query = query.gt('isin', after_isin)
+        return query.order('isin').limit(limit).execute().data
+
+    def upsert_holdings(self, rows: List[Dict]):
+        if rows:
+            self.client.table('holdings').upsert(rows, on_conflict='portfolio_id,isin').execute()
+
+    def update_holding(self, portfolio_id: str, isin: str, fields: Dict) -> List[Dict]:
+        return self.client.table('holdings').update(fields).eq('portfolio_id', portfolio_id).eq('isin', isin).execute().data
+
+    def get_quotes(self, tickers: List[str]) -> List[Dict]:
+        rows = []
+        for i in range(0, len(tickers), QUOTE_READ_CHUNK):
+            rows.extend(self.client.table('quotes').select('*').in_('ticker', tickers[i:i + QUOTE_READ_CHUNK]).execute().data)
+        return rows
+
+    def upsert_quotes(self, rows: List[Dict]):
+        if rows:
+            self.client.table('quotes').upsert(rows, on_conflict='ticker').execute()
+
+    def delete_holdings(self, portfolio_id: str, isins: Optional[List[str]] = None):
+        query = self.client.table('holdings').delete().eq('portfolio_id', portfolio_id)
+        if isins is not None:
+            query = query.in_('isin', isins)
+        query.execute()
+
+    def list_corporate_actions(self, tickers: List[str]) -> List[Dict]:
+        rows = []
+        for i in range(0, len(tickers), QUOTE_READ_CHUNK):
+            rows.extend(self.client.table('corporate_actions').select('*').in_('ticker', tickers[i:i + QUOTE_READ_CHUNK]).execute().data)
+        return rows
+
+    def upsert_corporate_actions(self, rows: List[Dict]):
+        if rows:
+            self.client.table('corporate_actions').upsert(rows, on_conflict='ticker,ex_date,action').execute()
+
+    def list_transactions(self, portfolio_id: str, after_id: int = 0, isins: Optional[List[str]] = None) -> List[Dict]:
+        def query():
+            query = self.client.table('transactions').select('*').eq('portfolio_id', portfolio_id)
+            if after_id:
+                query = query.gt('id', after_id)
+            if isins is not None:
+                query = query.in_('isin', isins)
+            return query.order('id')
+        return self._paged(query)
+
+    def add_transactions(self, rows: List[Dict]) -> List[Dict]:
+        return self.client.table('transactions').insert(rows).execute().data if rows else []
+
+    def delete_transactions(self, portfolio_id: str, ids: List[int]) -> List[Dict]:
+        return self.client.table('transactions').delete().eq('portfolio_id', portfolio_id).in_('id', ids).execute().data
+
+    def list_position_snapshots(self, portfolio_id: str) -> List[Dict]:
+        return self._paged(lambda: self.client.table('position_snapshots').select('*')
+                           .eq('portfolio_id', portfolio_id).order('isin'))
+
+    def upsert_position_snapshots(self, rows: List[Dict]):
+        if rows:
+            self.client.table('position_snapshots').upsert(rows, on_conflict='portfolio_id,isin').execute()
+
+    def delete_position_snapshots(self, portfolio_id: str, isins: List[str]):
+        self.client.table('position_snapshots').delete().eq('portfolio_id', portfolio_id).in_('isin', isins).execute()
+
+    def list_daily_bars(self, tickers: List[str], since: str) -> List[Dict]:
+        rows = []
+        for i in range(0, len(tickers), QUOTE_READ_CHUNK):
+            chunk = tickers[i:i + QUOTE_READ_CHUNK]
+            # A year of closes is a few hundred rows per ticker, so results span many pages
+            rows.extend(self._paged(lambda: self.client.table('daily_bars').select('ticker,date,close')
+                                    .in_('ticker', chunk).gte('date', since).order('ticker').order('date')))
+        return rows
+
+    def upsert_daily_bars(self, rows: List[Dict]):
+        for i in range(0, len(rows), BAR_PAGE_SIZE):
+            self.client.table('daily_bars').upsert(rows[i:i + BAR_PAGE_SIZE], on_conflict='ticker,date').execute()
+
+    def list_portfolios(self, tenant_id: Optional[str] = None) -> List[Dict]:
+        query = self.client.table('portfolios').select('*')
+        if tenant_id is not None:
+            query = query.eq('tenant_id', tenant_id)
+        return query.execute().data
+
+    def create_portfolio(self, name: str, tenant_id: str = DEFAULT_TENANT) -> Optional[Dict]:
+        data = self.client.table('portfolios').insert({"name": name, "tenant_id": tenant_id}).execute().data
+        return data[0] if data else None
+
+    def rename_portfolio(self, portfolio_id: str, name: str) -> Optional[Dict]:
+        data = self.client.table('portfolios').update({"name": name}).eq('id', portfolio_id).execute().data
+        return data[0] if data else None
+
+    def delete_portfolio(self, portfolio_id: str):
+        # Cascade: Supabase normally handles this if FK is set to CASCADE,
+        # but we explicitly delete holdings just in case.
+        self.delete_holdings(portfolio_id)
+        self.client.table('portfolios').delete().eq('id', portfolio_id).execute()
+
+    def subscribe_changes(self, callback: Callable[[Optional[str], Optional[Dict]], None]) -> Optional[ChangeFeed]:
+        """Streams holdings changes from Supabase Realtime on a background event loop."""
+        if not self.url or not self.key:
+            return None
+        import asyncio
+        feed = ChangeFeed()
+        loop = asyncio.new_event_loop()
+
+        def on_change(payload):
+            data = payload.get('data') or {}
+            if data.get('record'):
+                callback(data['record'].get('portfolio_id'), data['record'])
+            else:
+                # Deletes carry the primary key columns of the old row, which include portfolio_id
+                callback((data.get('old_record') or {}).get('portfolio_id'), None)
+
+        def on_status(status, error):
+            if status == 'SUBSCRIBED':
+                feed.connected.set()
+                return
+            print(f"Supabase realtime {status}: {error}")
+            feed.connected.clear()
+            callback(None, None)  # Changes may have been missed while disconnected
+
+        async def subscribe():
+            from supabase import acreate_client
+            client = await acreate_client(self.url, self.key)
+            channel = client.channel('holdings-changes')
+            await channel.on_postgres_changes('*', on_change, table='holdings', schema='public').subscribe(on_status)
+
+        def run():
+            asyncio.set_event_loop(loop)
+            try:
+                loop.run_until_complete(subscribe())
+                loop.run_forever()
+            except Exception as e:
+                print(f"Supabase realtime error: {e}")
+            finally:
+                feed.connected.clear()
+
+        feed._on_stop.append(lambda: loop.call_soon_threadsafe(loop.stop))
+        threading.Thread(target=run, name='supabase-realtime', daemon=True).start()
+        return feed
+
+
+class SQLiteStorage(Storage):
+    """Embedded single-file storage. One shared connection, serialized by a lock."""
+
+    name = 'sqlite'
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS portfolios (
+        id TEXT PRIMARY KEY,
+        name TEXT NOT NULL,
+        created_at TEXT,
+        tenant_id TEXT NOT NULL DEFAULT 'default'
+    );
+    CREATE TABLE IF NOT EXISTS holdings (
+        portfolio_id TEXT NOT NULL REFERENCES portfolios(id) ON DELETE CASCADE,
+        isin TEXT NOT NULL,
+        stock_name TEXT,
+        quantity INTEGER,
+        average_buy_price REAL,
+        ticker TEXT,
+        date_of_exit TEXT,
+        target REAL,
+        stop_loss REAL,
+        basis_date TEXT DEFAULT CURRENT_DATE,
+        PRIMARY KEY (portfolio_id, isin)
+    ) WITHOUT ROWID;
+    CREATE TABLE IF NOT EXISTS quotes (
+        ticker TEXT PRIMARY KEY,
+        price REAL,
+        day_change_amount REAL,
+        day_change_percent REAL,
+        updated_at TEXT
+    ) WITHOUT ROWID;
+    CREATE TABLE IF NOT EXISTS corporate_actions (
+        ticker TEXT NOT NULL,
+        ex_date TEXT NOT NULL,
+        action TEXT NOT NULL,
+        ratio REAL,
+        amount REAL,
+        PRIMARY KEY (ticker, ex_date, action)
+    ) WITHOUT ROWID;
+    CREATE TABLE IF NOT EXISTS transactions (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        portfolio_id TEXT NOT NULL REFERENCES portfolios(id) ON DELETE CASCADE,
+        isin TEXT NOT NULL,
+        stock_name TEXT,
+        ticker TEXT,
+        type TEXT NOT NULL,
+        trade_date TEXT NOT NULL,
+        quantity REAL,
+        price REAL,
+        fees REAL DEFAULT 0,
+        amount REAL,
+        created_at TEXT DEFAULT CURRENT_TIMESTAMP
+    );
+    CREATE TABLE IF NOT EXISTS position_snapshots (
+        portfolio_id TEXT NOT NULL REFERENCES portfolios(id) ON DELETE CASCADE,
+        isin TEXT NOT NULL,
+        stock_name TEXT,
+        ticker TEXT,
+        quantity REAL,
+        lots TEXT,
+        weighted_cost REAL,
+        realized_fifo REAL,
+        realized_weighted REAL,
+        dividends REAL,
+        last_id INTEGER,
+        last_date TEXT,
+        split_factor REAL DEFAULT 1,
+        PRIMARY KEY (portfolio_id, isin)
+    ) WITHOUT ROWID;
+    CREATE TABLE IF NOT EXISTS daily_bars (
+        ticker TEXT NOT NULL,
+        date TEXT NOT NULL,
+        close REAL NOT NULL,
+        PRIMARY KEY (ticker, date)
+    ) WITHOUT ROWID;
+    CREATE INDEX IF NOT EXISTS idx_holdings_ticker ON holdings(ticker);
+    CREATE INDEX IF NOT EXISTS idx_holdings_missing_ticker ON holdings(portfolio_id) WHERE ticker IS NULL;
+    CREATE INDEX IF NOT EXISTS idx_transactions_portfolio ON transactions(portfolio_id, isin);
+    """
+
+    def __init__(self, path: str = SQLITE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        if path != ':memory:':
+            self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        self._conn.executescript(self.SCHEMA)
+        self._drop_legacy_columns()
+        self._add_basis_date()
+        self._add_tenant_id()
+        self._add_split_factor()
+
+    def _drop_legacy_columns(self):
+        """Databases created before the quotes table kept market data on every holding row."""
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(holdings)")}
+        for column in LEGACY_MARKET_COLUMNS:
+            if column in columns:
+                self._conn.execute(f"ALTER TABLE holdings DROP COLUMN {column}")
+
+    def _add_basis_date(self):
+        """Existing holdings are taken as recorded today, so only later corporate actions restate them."""
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(holdings)")}
+        if 'basis_date' not in columns:
+            self._conn.execute("ALTER TABLE holdings ADD COLUMN basis_date TEXT")
+            self._conn.execute("UPDATE holdings SET basis_date = date('now')")
+
+    def _add_tenant_id(self):
+        """Portfolios created before tenants existed belong to the default tenant."""
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(portfolios)")}
+        if 'tenant_id' not in columns:
+            self._conn.execute(f"ALTER TABLE portfolios ADD COLUMN tenant_id TEXT NOT NULL DEFAULT '{DEFAULT_TENANT}'")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_portfolios_tenant ON portfolios(tenant_id)")
+
+    def _add_split_factor(self):
+        """Snapshots folded before splits were folded in are replayed once, as their factor reads 1."""
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(position_snapshots)")}
+        if 'split_factor' not in columns:
+            self._conn.execute("ALTER TABLE position_snapshots ADD COLUMN split_factor REAL DEFAULT 1")
+
+    def _query(self, sql: str, params=()) -> List[Dict]:
+        with self._lock:
+            cursor = self._conn.execute(sql, params)
+            columns = [d[0] for d in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    def _write(self, sql: str, params_seq):
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.executemany(sql, params_seq)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def list_holdings(self, portfolio_id: Optional[str] = None) -> List[Dict]:
+        if portfolio_id:
+            return self._query("SELECT * FROM holdings WHERE portfolio_id = ?", (portfolio_id,))
+        return self._query("SELECT * FROM holdings")
+
+    def list_holdings_page(self, portfolio_id: str, after_isin: Optional[str] = None, limit: int = 1000) -> List[Dict]:
+        return self._query(
+            "SELECT * FROM holdings WHERE portfolio_id = ? AND isin > ? ORDER BY isin LIMIT ?",
+            (portfolio_id, after_isin or '', limit)
+        )
+
+    def upsert_holdings(self, rows: List[Dict]):
+        # Rows are grouped by their column set so each group is one executemany
+        groups: Dict[tuple, List[tuple]] = {}
+        for row in rows:
+            columns = tuple(c for c in HOLDING_COLUMNS if c in row)
+            groups.setdefault(columns, []).append(tuple(row[c] for c in columns))
+        for columns, params in groups.items():
+            updates = [c for c in columns if c not in ('portfolio_id', 'isin')]
+            conflict = f"DO UPDATE SET {', '.join(f'{c} = excluded.{c}' for c in updates)}" if updates else "DO NOTHING"
+            self._write(
+                f"INSERT INTO holdings ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))}) "
+                f"ON CONFLICT (portfolio_id, isin) {conflict}",
+                params
+            )
+
+    def update_holding(self, portfolio_id: str, isin: str, fields: Dict) -> List[Dict]:
+        columns = [c for c in HOLDING_COLUMNS if c in fields]
+        if columns:
+            self._write(
+                f"UPDATE holdings SET {', '.join(f'{c} = ?' for c in columns)} WHERE portfolio_id = ? AND isin = ?",
+                [tuple(fields[c] for c in columns) + (portfolio_id, isin)]
+            )
+        return self._query("SELECT * FROM holdings WHERE portfolio_id = ? AND isin = ?", (portfolio_id, isin))
+
+    def get_quotes(self, tickers: List[str]) -> List[Dict]:
+        rows = []
+        for i in range(0, len(tickers), QUOTE_READ_CHUNK):
+            chunk = tickers[i:i + QUOTE_READ_CHUNK]
+            rows.extend(self._query(f"SELECT * FROM quotes WHERE ticker IN ({', '.join('?' * len(chunk))})", chunk))
+        return rows
+
+    def upsert_quotes(self, rows: List[Dict]):
+        self._write(
+            "INSERT INTO quotes (ticker, price, day_change_amount, day_change_percent, updated_at) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT (ticker) DO UPDATE SET price = excluded.price, day_change_amount = excluded.day_change_amount, "
+            "day_change_percent = excluded.day_change_percent, updated_at = excluded.updated_at",
+            [(r['ticker'], r['price'], r['day_change_amount'], r['day_change_percent'], r['updated_at']) for r in rows]
+        )
+
+    def delete_holdings(self, portfolio_id: str, isins: Optional[List[str]] = None):
+        if isins is None:
+            self._write("DELETE FROM holdings WHERE portfolio_id = ?", [(portfolio_id,)])
+        else:
+            self._write("DELETE FROM holdings WHERE portfolio_id = ? AND isin = ?", [(portfolio_id, i) for i in isins])
+
+    def list_corporate_actions(self, tickers: List[str]) -> List[Dict]:
+        rows = []
+        for i in range(0, len(tickers), QUOTE_READ_CHUNK):
+            chunk = tickers[i:i + QUOTE_READ_CHUNK]
+            rows.extend(self._query(f"SELECT * FROM corporate_actions WHERE ticker IN ({', '.join('?' * len(chunk))})", chunk))
+        return rows
+
+    def upsert_corporate_actions(self, rows: List[Dict]):
+        self._write(
+            "INSERT INTO corporate_actions (ticker, ex_date, action, ratio, amount) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT (ticker, ex_date, action) DO UPDATE SET ratio = excluded.ratio, amount = excluded.amount",
+            [tuple(r.get(c) for c in CORPORATE_ACTION_COLUMNS) for r in rows]
+        )
+
+    def list_transactions(self, portfolio_id: str, after_id: int = 0, isins: Optional[List[str]] = None) -> List[Dict]:
+        sql, params = "SELECT * FROM transactions WHERE portfolio_id = ? AND id > ?", [portfolio_id, after_id]
+        if isins is not None:
+            sql += f" AND isin IN ({', '.join('?' * len(isins))})"
+            params += isins
+        return self._query(sql + " ORDER BY id", params)
+
+    def add_transactions(self, rows: List[Dict]) -> List[Dict]:
+        added = []
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                for row in rows:
+                    columns = [c for c in TRANSACTION_COLUMNS if c in row]
+                    cursor = self._conn.execute(
+                        f"INSERT INTO transactions ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+                        [row[c] for c in columns]
+                    )
+                    added.append(dict(row, id=cursor.lastrowid))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return added
+
+    def delete_transactions(self, portfolio_id: str, ids: List[int]) -> List[Dict]:
+        rows = self._query(f"SELECT * FROM transactions WHERE portfolio_id = ? AND id IN ({', '.join('?' * len(ids))})",
+                           [portfolio_id, *ids])
+        self._write("DELETE FROM transactions WHERE portfolio_id = ? AND id = ?", [(portfolio_id, r['id']) for r in rows])
+        return rows
+
+    def list_position_snapshots(self, portfolio_id: str) -> List[Dict]:
+        rows = self._query("SELECT * FROM position_snapshots WHERE portfolio_id = ?", (portfolio_id,))
+        for row in rows:
+            row['lots'] = json.loads(row['lots'] or '[]')
+        return rows
+
+    def upsert_position_snapshots(self, rows: List[Dict]):
+        updates = [c for c in POSITION_SNAPSHOT_COLUMNS if c not in ('portfolio_id', 'isin')]
+        self._write(
+            f"INSERT INTO position_snapshots ({', '.join(POSITION_SNAPSHOT_COLUMNS)}) "
+            f"VALUES ({', '.join('?' * len(POSITION_SNAPSHOT_COLUMNS))}) "
+            f"ON CONFLICT (portfolio_id, isin) DO UPDATE SET {', '.join(f'{c} = excluded.{c}' for c in updates)}",
+            [tuple(json.dumps(r['lots']) if c == 'lots' else r.get(c) for c in POSITION_SNAPSHOT_COLUMNS) for r in rows]
+        )
+
+    def delete_position_snapshots(self, portfolio_id: str, isins: List[str]):
+        self._write("DELETE FROM position_snapshots WHERE portfolio_id = ? AND isin = ?", [(portfolio_id, i) for i in isins])
+
+    def list_daily_bars(self, tickers: List[str], since: str) -> List[Dict]:
+        rows = []
+        for i in range(0, len(tickers), QUOTE_READ_CHUNK):
+            chunk = tickers[i:i + QUOTE_READ_CHUNK]
+            rows.extend(self._query(
+                f"SELECT ticker, date, close FROM daily_bars WHERE ticker IN ({', '.join('?' * len(chunk))}) AND date >= ?",
+                chunk + [since]
+            ))
+        return rows
+
+    def upsert_daily_bars(self, rows: List[Dict]):
+        self._write(
+            "INSERT INTO daily_bars (ticker, date, close) VALUES (?, ?, ?) "
+            "ON CONFLICT (ticker, date) DO UPDATE SET close = excluded.close",
+            [(r['ticker'], r['date'], r['close']) for r in rows]
+        )
+
+    def list_portfolios(self, tenant_id: Optional[str] = None) -> List[Dict]:
+        if tenant_id is not None:
+            return self._query("SELECT * FROM portfolios WHERE tenant_id = ? ORDER BY created_at", (tenant_id,))
+        return self._query("SELECT * FROM portfolios ORDER BY created_at")
+
+    def create_portfolio(self, name: str, tenant_id: str = DEFAULT_TENANT) -> Optional[Dict]:
+        portfolio = {"id": str(uuid.uuid4()), "name": name, "created_at": datetime.now(ZoneInfo("UTC")).isoformat(),
+                     "tenant_id": tenant_id}
+        self._write("INSERT INTO portfolios (id, name, created_at, tenant_id) VALUES (?, ?, ?, ?)",
+                    [(portfolio['id'], portfolio['name'], portfolio['created_at'], portfolio['tenant_id'])])
+        return portfolio
+
+    def rename_portfolio(self, portfolio_id: str, name: str) -> Optional[Dict]:
+        self._write("UPDATE portfolios SET name = ? WHERE id = ?", [(name, portfolio_id)])
+        rows = self._query("SELECT * FROM portfolios WHERE id = ?", (portfolio_id,))
+        return rows[0] if rows else None
+
+    def delete_portfolio(self, portfolio_id: str):
+        self.delete_holdings(portfolio_id)
+        self._write("DELETE FROM portfolios WHERE id = ?", [(portfolio_id,)])
+
+    def subscribe_changes(self, callback: Callable[[Optional[str], Optional[Dict]], None],
+                          interval: float = SQLITE_CHANGE_POLL_SECONDS) -> Optional[ChangeFeed]:
+        """Polls PRAGMA data_version, which only moves when another connection commits to the file."""
+        feed = ChangeFeed()
+
+        def data_version() -> int:
+            with self._lock:
+                return self._conn.execute("PRAGMA data_version").fetchone()[0]
+
+        def run():
+            last = data_version()
+            feed.connected.set()
+            while not feed.stopped.wait(interval):
+                try:
+                    current = data_version()
+                except Exception as e:
+                    print(f"SQLite change feed error: {e}")
+                    continue
+                if current != last:
+                    last = current
+                    callback(None, None)
+
+        threading.Thread(target=run, name='sqlite-change-feed', daemon=True).start()
+        return feed
+
+
+class CachedStorage(Storage):
+    """
+    Read-through per-portfolio holdings cache over another backend. Writes made through it
+    patch or invalidate the cached rows; a change feed covers edits made elsewhere.
+    """
+
+    def __init__(self, backend: Storage, ttl: float = HOLDINGS_CACHE_TTL):
+        self.backend = backend
+        self.name = backend.name
+        self.ttl = ttl
+        self.metrics = None  # Set by PortfolioService
+        self._entries: Dict[str, Tuple[List[Dict], Dict[str, Dict], float]] = {}  # Format: {portfolio_id: (rows, {isin: row}, loaded at)}
+        self._versions: Dict[str, int] = {}  # Bumped on invalidation, so a read racing a write isn't cached
+        self._generation = 0
+        self._feed: Optional[ChangeFeed] = None
+        self._lock = threading.Lock()
+
+    def _fresh(self, loaded_at: float) -> bool:
+        if self._feed is not None and self._feed.connected.is_set():
+            return True
+        return time.time() - loaded_at < self.ttl
+
+    def invalidate(self, portfolio_id: Optional[str] = None):
+        with self._lock:
+            if portfolio_id is None:
+                self._entries.clear()
+                self._generation += 1
+            else:
+                self._entries.pop(portfolio_id, None)
+                self._bump(portfolio_id)
+
+    def _bump(self, portfolio_id: str):
+        """Marks a write to the portfolio, so a miss loaded before it isn't cached. Call with the lock held."""
+        self._versions[portfolio_id] = self._versions.get(portfolio_id, 0) + 1
+
+    def apply_change(self, portfolio_id: Optional[str], row: Optional[Dict] = None):
+        """Change-feed callback: changed rows are patched in, anything less specific drops the portfolio."""
+        if portfolio_id is None or row is None:
+            self.invalidate(portfolio_id)
+            return
+        with self._lock:
+            self._bump(portfolio_id)
+            entry = self._entries.get(portfolio_id)
+            if entry is None:
+                return
+            cached = entry[1].get(row['isin'])
+            if cached is not None:
+                cached.update(row)
+            else:
+                row = dict(row)
+                entry[0].append(row)
+                entry[1][row['isin']] = row
+
+    def watch(self) -> Optional[ChangeFeed]:
+        """Starts the backend's change feed; cached portfolios then stay valid until it reports a change."""
+        if self._feed is None:
+            self._feed = self.backend.subscribe_changes(self.apply_change)
+        return self._feed
+
+    def list_holdings(self, portfolio_id: Optional[str] = None) -> List[Dict]:
+        if not portfolio_id:
+            return self.backend.list_holdings(portfolio_id)
+        with self._lock:
+            entry = self._entries.get(portfolio_id)
+            if entry is not None and self._fresh(entry[2]):
+                # Callers decorate the rows they get back, so hand out copies
+                rows = [dict(row) for row in entry[0]]
+            else:
+                rows = None
+                token = (self._generation, self._versions.get(portfolio_id, 0))
+        if self.metrics is not None:
+            self.metrics.inc('portfolio_cache_requests_total', cache='holdings', result='hit' if rows is not None else 'miss')
+        if rows is not None:
+            return rows
+
+        loaded_at = time.time()
+        rows = self.backend.list_holdings(portfolio_id)
+        with self._lock:
+            if token == (self._generation, self._versions.get(portfolio_id, 0)):
+                self._entries[portfolio_id] = (rows, {row['isin']: row for row in rows}, loaded_at)
+        return [dict(row) for row in rows]
+
+    def list_holdings_page(self, portfolio_id: str, after_isin: Optional[str] = None, limit: int = 1000) -> List[Dict]:
+        # Exports page through storage directly rather than filling the cache with whole portfolios
+        return self.backend.list_holdings_page(portfolio_id, after_isin, limit)
+
+    def upsert_holdings(self, rows: List[Dict]):
+        try:
+            self.backend.upsert_holdings(rows)
+        finally:
+            for portfolio_id in {row.get('portfolio_id') for row in rows}:
+                self.invalidate(portfolio_id)
+
+    def update_holding(self, portfolio_id: str, isin: str, fields: Dict) -> List[Dict]:
+        try:
+            result = self.backend.update_holding(portfolio_id, isin, fields)
+        except Exception:
+            self.invalidate(portfolio_id)
+            raise
+        with self._lock:
+            self._bump(portfolio_id)
+            entry = self._entries.get(portfolio_id)
+            cached = entry[1].get(isin) if entry else None
+            if cached is not None:
+                cached.update(result[0] if result else fields)
+        return result
+
+    def get_quotes(self, tickers: List[str]) -> List[Dict]:
+        return self.backend.get_quotes(tickers)
+
+    def upsert_quotes(self, rows: List[Dict]):
+        self.backend.upsert_quotes(rows)
+
+    def delete_holdings(self, portfolio_id: str, isins: Optional[List[str]] = None):
+        try:
+            self.backend.delete_holdings(portfolio_id, isins)
+        except Exception:
+            self.invalidate(portfolio_id)
+            raise
+        if isins is None:
+            self.invalidate(portfolio_id)
+            return
+        with self._lock:
+            self._bump(portfolio_id)
+            entry = self._entries.get(portfolio_id)
+            if entry is not None:
+                removed = set(isins)
+                rows = [row for row in entry[0] if row['isin'] not in removed]
+                self._entries[portfolio_id] = (rows, {row['isin']: row for row in rows}, entry[2])
+
+    def list_corporate_actions(self, tickers: List[str]) -> List[Dict]:
+        return self.backend.list_corporate_actions(tickers)
+
+    def upsert_corporate_actions(self, rows: List[Dict]):
+        self.backend.upsert_corporate_actions(rows)
+
+    def list_transactions(self, portfolio_id: str, after_id: int = 0, isins: Optional[List[str]] = None) -> List[Dict]:
+        return self.backend.list_transactions(portfolio_id, after_id, isins)
+
+    def add_transactions(self, rows: List[Dict]) -> List[Dict]:
+        return self.backend.add_transactions(rows)
+
+    def delete_transactions(self, portfolio_id: str, ids: List[int]) -> List[Dict]:
+        return self.backend.delete_transactions(portfolio_id, ids)
+
+    def list_position_snapshots(self, portfolio_id: str) -> List[Dict]:
+        return self.backend.list_position_snapshots(portfolio_id)
+
+    def upsert_position_snapshots(self, rows: List[Dict]):
+        self.backend.upsert_position_snapshots(rows)
+
+    def delete_position_snapshots(self, portfolio_id: str, isins: List[str]):
+        self.backend.delete_position_snapshots(portfolio_id, isins)
+
+    def list_daily_bars(self, tickers: List[str], since: str) -> List[Dict]:
+        return self.backend.list_daily_bars(tickers, since)
+
+    def upsert_daily_bars(self, rows: List[Dict]):
+        self.backend.upsert_daily_bars(rows)
+
+    def list_portfolios(self, tenant_id: Optional[str] = None) -> List[Dict]:
+        return self.backend.list_portfolios(tenant_id)
+
+    def create_portfolio(self, name: str, tenant_id: str = DEFAULT_TENANT) -> Optional[Dict]:
+        return self.backend.create_portfolio(name, tenant_id)
+
+    def rename_portfolio(self, portfolio_id: str, name: str) -> Optional[Dict]:
+        return self.backend.rename_portfolio(portfolio_id, name)
+
+    def delete_portfolio(self, portfolio_id: str):
+        try:
+            self.backend.delete_portfolio(portfolio_id)
+        finally:
+            self.invalidate(portfolio_id)
+
+    def subscribe_changes(self, callback: Callable[[Optional[str], Optional[Dict]], None]) -> Optional[ChangeFeed]:
+        return self.backend.subscribe_changes(callback)
+
+
+def create_storage(backend: str = STORAGE_BACKEND, cache_ttl: float = HOLDINGS_CACHE_TTL) -> Optional[Storage]:
+    """
+    Builds the configured backend, wrapped in the holdings cache unless cache_ttl is 0.
+    Returns None (and logs) if Supabase is not configured.
+    """
+    if backend == 'sqlite':
+        storage = SQLiteStorage(SQLITE_PATH)
+    elif not SUPABASE_URL or not SUPABASE_KEY:
+        print("ERROR: SUPABASE_URL or SUPABASE_KEY is missing from environment variables")
+        return None
+    else:
+        try:
+            from supabase import create_client
+            storage = SupabaseStorage(create_client(SUPABASE_URL, SUPABASE_KEY), SUPABASE_URL, SUPABASE_KEY)
+        except Exception as e:
+            print(f"ERROR: Failed to initialize Supabase client: {e}")
+            return None
+    return CachedStorage(storage, cache_ttl) if cache_ttl > 0 else storage
@@ -0,0 +1,90 @@
+"""
+Tenants and their request budgets. Every portfolio belongs to one tenant; API keys map to
+tenants through TENANT_API_KEYS. Without keys the deployment is single-tenant and every
+request acts as DEFAULT_TENANT, as before.
+"""
+import os
+import threading
+import time
+from typing import Dict, Optional, Set, Tuple
+
+DEFAULT_TENANT = 'default'
+# Format: "key1:tenant-a,key2:tenant-b"; several keys may map to the same tenant
+TENANT_API_KEYS = os.environ.get("TENANT_API_KEYS", "")
+API_KEY_HEADER = 'X-API-Key'
+# Format: "tenant-a,tenant-b"; tenants that may write shared market data (corporate actions), which
+# restates every tenant's holdings. Without API keys the single default tenant may.
+ADMIN_TENANTS = os.environ.get("ADMIN_TENANTS", "")
+
+# Token buckets per tenant (per client address when single-tenant): requests per minute, which is also the burst.
+# 0 disables a limit. A holdings request over its refresh budget is served from cached quotes instead.
+RATE_LIMIT_DISCOVER_PER_MINUTE = float(os.environ.get("RATE_LIMIT_DISCOVER_PER_MINUTE", 2))
+RATE_LIMIT_UPLOAD_PER_MINUTE = float(os.environ.get("RATE_LIMIT_UPLOAD_PER_MINUTE", 6))
+RATE_LIMIT_REFRESH_PER_MINUTE = float(os.environ.get("RATE_LIMIT_REFRESH_PER_MINUTE", 60))
+MAX_BUCKETS = 10000  # Idle buckets are pruned beyond this many clients
+
+
+def parse_api_keys(spec: str = TENANT_API_KEYS) -> Dict[str, str]:
+    """{api key: tenant} from a TENANT_API_KEYS value."""
+    keys = {}
+    for pair in (p.strip() for p in spec.split(',') if p.strip()):
+        key, _, tenant = pair.partition(':')
+        if key.strip() and tenant.strip():
+            keys[key.strip()] = tenant.strip()
+    return keys
+
+
+def parse_admin_tenants(spec: str = ADMIN_TENANTS) -> Set[str]:
+    """Tenants from an ADMIN_TENANTS value."""
+    return {t.strip() for t in spec.split(',') if t.strip()}
+
+
+class TokenBucket:
+    """Holds up to `capacity` tokens, refilled continuously at `rate` per second."""
+
+    def __init__(self, rate: float, capacity: float, now: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = now if now is not None else time.monotonic()
+
+    def take(self, now: float) -> float:
+        """Takes a token; returns 0 if one was available, else the seconds until one will be."""
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class RateLimiter:
+    """Token buckets per (client, endpoint class), so one heavy client only drains its own budget."""
+
+    def __init__(self, limits: Optional[Dict[str, float]] = None):
+        # Format: {endpoint class: requests per minute}
+        self.limits = limits if limits is not None else {
+            'discover': RATE_LIMIT_DISCOVER_PER_MINUTE,
+            'upload': RATE_LIMIT_UPLOAD_PER_MINUTE,
+            'refresh': RATE_LIMIT_REFRESH_PER_MINUTE,
+        }
+        self._buckets: Dict[Tuple[str, str], TokenBucket] = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, client: str, endpoint: str, now: Optional[float] = None) -> float:
+        """0 if the request may proceed, else the seconds to wait before retrying."""
+        per_minute = self.limits.get(endpoint, 0)
+        if per_minute <= 0:
+            return 0.0
+        now = now if now is not None else time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get((client, endpoint))
+            if bucket is None:
+                if len(self._buckets) >= MAX_BUCKETS:
+                    self._prune(now)
+                bucket = self._buckets[(client, endpoint)] = TokenBucket(per_minute / 60, per_minute, now)
+            return bucket.take(now)
+
+    def _prune(self, now: float):
+        """Drops buckets that have refilled completely, which behave exactly like new ones."""
+        self._buckets = {k: b for k, b in self._buckets.items() if b.tokens + (now - b.updated) * b.rate < b.capacity}
@@ -11,7 +11,7 @@ trap cleanup SIGINT SIGTERM
 
 echo "Starting Backend..."
 cd backend
-./venv/bin/python3 -m uvicorn main:app --reload --port 8000 &
+./venv/bin/python3 -m uvicorn main:app --reload --reload-dir . --reload-dir ../portfolio_tracker --port 8000 &
 BACKEND_PID=$!
 
 echo "Starting Frontend..."
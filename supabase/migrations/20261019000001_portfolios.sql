@@ -0,0 +1,41 @@
+-- Multi-portfolio support: a portfolios table and holdings.portfolio_id.
+-- Safe to run on databases created from the original supabase_schema.sql, where
+-- some of these objects were added by hand.
+
+CREATE EXTENSION IF NOT EXISTS pgcrypto;
+
+CREATE TABLE IF NOT EXISTS portfolios (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    name TEXT NOT NULL,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+ALTER TABLE holdings ADD COLUMN IF NOT EXISTS portfolio_id UUID;
+
+-- Market data persisted by the API (moved to the quotes table in a later migration)
+ALTER TABLE holdings ADD COLUMN IF NOT EXISTS last_price NUMERIC;
+ALTER TABLE holdings ADD COLUMN IF NOT EXISTS last_day_change_amt NUMERIC;
+ALTER TABLE holdings ADD COLUMN IF NOT EXISTS last_day_change_pct NUMERIC;
+ALTER TABLE holdings ADD COLUMN IF NOT EXISTS market_data_updated_at TIMESTAMP WITH TIME ZONE;
+
+-- Holdings from the single-portfolio days go to a default portfolio
+DO $$
+DECLARE
+    default_id UUID;
+BEGIN
+    IF EXISTS (SELECT 1 FROM holdings WHERE portfolio_id IS NULL) THEN
+        SELECT id INTO default_id FROM portfolios ORDER BY created_at LIMIT 1;
+        IF default_id IS NULL THEN
+            INSERT INTO portfolios (name) VALUES ('My Portfolio') RETURNING id INTO default_id;
+        END IF;
+        UPDATE holdings SET portfolio_id = default_id WHERE portfolio_id IS NULL;
+    END IF;
+END $$;
+
+ALTER TABLE portfolios ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS "Enable all access for authenticated users" ON portfolios;
+CREATE POLICY "Enable all access for authenticated users" ON portfolios
+    FOR ALL
+    USING (true)
+    WITH CHECK (true);
@@ -0,0 +1,31 @@
+-- Holdings are identified by (portfolio_id, isin): the same stock can sit in several
+-- portfolios. The API reads by portfolio_id, upserts on (portfolio_id, isin), looks
+-- up by ticker and scans for holdings without a ticker during auto-discovery.
+
+ALTER TABLE holdings ALTER COLUMN portfolio_id SET NOT NULL;
+
+ALTER TABLE holdings DROP CONSTRAINT IF EXISTS holdings_pkey;
+ALTER TABLE holdings ADD CONSTRAINT holdings_pkey PRIMARY KEY (portfolio_id, isin);
+
+ALTER TABLE holdings DROP CONSTRAINT IF EXISTS holdings_portfolio_id_fkey;
+ALTER TABLE holdings ADD CONSTRAINT holdings_portfolio_id_fkey
+    FOREIGN KEY (portfolio_id) REFERENCES portfolios(id) ON DELETE CASCADE;
+
+-- The primary key's leading column already serves `WHERE portfolio_id = ...`,
+-- so no separate portfolio_id index is needed.
+CREATE INDEX IF NOT EXISTS idx_holdings_ticker ON holdings(ticker);
+
+-- Auto-discovery only looks at holdings without a ticker
+CREATE INDEX IF NOT EXISTS idx_holdings_missing_ticker ON holdings(portfolio_id) WHERE ticker IS NULL;
+
+-- Only ever used for ad-hoc searches; the API never filters on it
+DROP INDEX IF EXISTS idx_holdings_stock_name;
+
+-- Change feed for the holdings cache (HOLDINGS_REALTIME=1)
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_publication WHERE pubname = 'supabase_realtime')
+       AND NOT EXISTS (SELECT 1 FROM pg_publication_tables WHERE pubname = 'supabase_realtime' AND tablename = 'holdings') THEN
+        ALTER PUBLICATION supabase_realtime ADD TABLE holdings;
+    END IF;
+END $$;
@@ -0,0 +1,29 @@
+-- Market data keyed by ticker. A price update is written once per ticker instead of
+-- once per holding row, and every portfolio holding the stock sees it.
+-- The holdings.last_* columns are kept (and backfilled from) until the API reads
+-- quotes exclusively; a later migration drops them.
+
+CREATE TABLE IF NOT EXISTS quotes (
+    ticker TEXT PRIMARY KEY,
+    price NUMERIC,
+    day_change_amount NUMERIC,
+    day_change_percent NUMERIC,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+-- Most recent persisted price per ticker
+INSERT INTO quotes (ticker, price, day_change_amount, day_change_percent, updated_at)
+SELECT DISTINCT ON (ticker)
+    ticker, last_price, last_day_change_amt, last_day_change_pct, COALESCE(market_data_updated_at, NOW())
+FROM holdings
+WHERE ticker IS NOT NULL AND last_price IS NOT NULL
+ORDER BY ticker, market_data_updated_at DESC NULLS LAST
+ON CONFLICT (ticker) DO NOTHING;
+
+ALTER TABLE quotes ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS "Enable all access for authenticated users" ON quotes;
+CREATE POLICY "Enable all access for authenticated users" ON quotes
+    FOR ALL
+    USING (true)
+    WITH CHECK (true);
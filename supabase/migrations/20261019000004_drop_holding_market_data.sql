@@ -0,0 +1,21 @@
+-- Market data now lives only in the ticker-keyed quotes table. Apply once every
+-- deployment runs a version of the API that reads quotes.
+
+-- Pick up anything written to the legacy columns since the quotes backfill
+INSERT INTO quotes (ticker, price, day_change_amount, day_change_percent, updated_at)
+SELECT DISTINCT ON (ticker)
+    ticker, last_price, last_day_change_amt, last_day_change_pct, COALESCE(market_data_updated_at, NOW())
+FROM holdings
+WHERE ticker IS NOT NULL AND last_price IS NOT NULL
+ORDER BY ticker, market_data_updated_at DESC NULLS LAST
+ON CONFLICT (ticker) DO UPDATE SET
+    price = EXCLUDED.price,
+    day_change_amount = EXCLUDED.day_change_amount,
+    day_change_percent = EXCLUDED.day_change_percent,
+    updated_at = EXCLUDED.updated_at
+WHERE quotes.updated_at < EXCLUDED.updated_at;
+
+ALTER TABLE holdings DROP COLUMN IF EXISTS last_price;
+ALTER TABLE holdings DROP COLUMN IF EXISTS last_day_change_amt;
+ALTER TABLE holdings DROP COLUMN IF EXISTS last_day_change_pct;
+ALTER TABLE holdings DROP COLUMN IF EXISTS market_data_updated_at;
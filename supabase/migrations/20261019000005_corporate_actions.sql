@@ -0,0 +1,22 @@
+-- Splits, bonuses and dividends per ticker. Holdings record the date their quantity and
+-- cost basis refer to, and the API restates them for every action after that date.
+
+-- Existing rows are taken as recorded today, so only future actions restate them
+ALTER TABLE holdings ADD COLUMN IF NOT EXISTS basis_date DATE DEFAULT CURRENT_DATE;
+
+CREATE TABLE IF NOT EXISTS corporate_actions (
+    ticker TEXT NOT NULL,
+    ex_date DATE NOT NULL,
+    action TEXT NOT NULL CHECK (action IN ('split', 'bonus', 'dividend')),
+    ratio NUMERIC,   -- Shares held after the action per share before it (splits, bonuses)
+    amount NUMERIC,  -- Dividend per share as paid
+    PRIMARY KEY (ticker, ex_date, action)
+);
+
+ALTER TABLE corporate_actions ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS "Enable all access for authenticated users" ON corporate_actions;
+CREATE POLICY "Enable all access for authenticated users" ON corporate_actions
+    FOR ALL
+    USING (true)
+    WITH CHECK (true);
@@ -0,0 +1,50 @@
+-- Transaction ledger (buys, sells, dividends) and the position snapshots folded from it.
+-- A rebuild reads the snapshots and only folds transactions with an id above their checkpoint.
+
+CREATE TABLE IF NOT EXISTS transactions (
+    id BIGINT GENERATED ALWAYS AS IDENTITY PRIMARY KEY,
+    portfolio_id UUID NOT NULL REFERENCES portfolios(id) ON DELETE CASCADE,
+    isin TEXT NOT NULL,
+    stock_name TEXT,
+    ticker TEXT,
+    type TEXT NOT NULL CHECK (type IN ('buy', 'sell', 'dividend')),
+    trade_date DATE NOT NULL,
+    quantity NUMERIC,
+    price NUMERIC,
+    fees NUMERIC DEFAULT 0,
+    amount NUMERIC,  -- Dividend received in total
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_transactions_portfolio ON transactions(portfolio_id, isin);
+
+CREATE TABLE IF NOT EXISTS position_snapshots (
+    portfolio_id UUID NOT NULL REFERENCES portfolios(id) ON DELETE CASCADE,
+    isin TEXT NOT NULL,
+    stock_name TEXT,
+    ticker TEXT,
+    quantity NUMERIC,
+    lots JSONB,  -- Open FIFO lots: [[quantity, cost per share]], oldest first
+    weighted_cost NUMERIC,
+    realized_fifo NUMERIC,
+    realized_weighted NUMERIC,
+    dividends NUMERIC,
+    last_id BIGINT,  -- Highest transaction id folded in
+    last_date DATE,  -- Latest trade date folded in
+    PRIMARY KEY (portfolio_id, isin)
+);
+
+ALTER TABLE transactions ENABLE ROW LEVEL SECURITY;
+ALTER TABLE position_snapshots ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS "Enable all access for authenticated users" ON transactions;
+CREATE POLICY "Enable all access for authenticated users" ON transactions
+    FOR ALL
+    USING (true)
+    WITH CHECK (true);
+
+DROP POLICY IF EXISTS "Enable all access for authenticated users" ON position_snapshots;
+CREATE POLICY "Enable all access for authenticated users" ON position_snapshots
+    FOR ALL
+    USING (true)
+    WITH CHECK (true);
@@ -0,0 +1,6 @@
+-- Portfolios belong to a tenant (API keys map to tenants, see TENANT_API_KEYS).
+-- Existing portfolios go to the default tenant, which single-tenant deployments keep using.
+
+ALTER TABLE portfolios ADD COLUMN IF NOT EXISTS tenant_id TEXT NOT NULL DEFAULT 'default';
+
+CREATE INDEX IF NOT EXISTS idx_portfolios_tenant ON portfolios(tenant_id);
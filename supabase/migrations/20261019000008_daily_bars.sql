@@ -0,0 +1,17 @@
+-- Daily adjusted closes for risk analytics (GET /api/risk). Only days after a ticker's last
+-- stored close are downloaded; a re-adjusted history (split, dividend) replaces the window.
+
+CREATE TABLE IF NOT EXISTS daily_bars (
+    ticker TEXT NOT NULL,
+    date DATE NOT NULL,
+    close NUMERIC NOT NULL,
+    PRIMARY KEY (ticker, date)
+);
+
+ALTER TABLE daily_bars ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS "Enable all access for authenticated users" ON daily_bars;
+CREATE POLICY "Enable all access for authenticated users" ON daily_bars
+    FOR ALL
+    USING (true)
+    WITH CHECK (true);
@@ -0,0 +1,4 @@
+-- Ledger positions fold in splits and bonuses between trades. Snapshots record the product of
+-- the ones folded in; existing snapshots read 1 and are replayed once if their ticker has split.
+
+ALTER TABLE position_snapshots ADD COLUMN IF NOT EXISTS split_factor NUMERIC DEFAULT 1;
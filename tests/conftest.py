@@ -0,0 +1,37 @@
+"""
+Shared fixtures. The service runs against an in-memory SQLite database and the offline
+fakes from benchmarks/fakes.py, so the suite needs no network or Supabase project.
+"""
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+from fakes import FakeRequests, FakeYFinance  # noqa: E402
+import portfolio_tracker.service as ps  # noqa: E402
+from portfolio_tracker.storage import SQLiteStorage  # noqa: E402
+
+
+@pytest.fixture
+def yahoo(monkeypatch):
+    fake = FakeYFinance()
+    monkeypatch.setattr(ps, 'yf', fake)
+    monkeypatch.setattr(ps, 'requests', FakeRequests())
+    return fake
+
+
+@pytest.fixture
+def service(yahoo):
+    service = ps.PortfolioService()
+    service.storage = SQLiteStorage(':memory:')
+    service.is_market_open = lambda exchange=ps.DEFAULT_EXCHANGE: True
+    return service
+
+
+@pytest.fixture
+def portfolio_id(service):
+    return service.storage.create_portfolio('Test')['id']
@@ -0,0 +1,52 @@
+from portfolio_tracker.alerts import AlertEngine, Sink
+
+HOLDING = {'portfolio_id': 'p', 'isin': 'INE001', 'stock_name': 'A', 'ticker': 'A.NS', 'quantity': 10,
+           'average_buy_price': 100.0, 'target': 120.0, 'stop_loss': 80.0}
+
+
+class ListSink(Sink):
+    def __init__(self):
+        self.alerts = []
+
+    def send(self, alerts):
+        self.alerts.extend(alerts)
+
+
+def engine(load_holdings=lambda: [HOLDING]):
+    return AlertEngine(load_holdings, sinks=[ListSink()], cooldown=0)
+
+
+def test_first_price_seeds_without_firing():
+    # A restarted process sees a price already past the target; the alert was sent before the restart
+    alerts = engine()
+    assert alerts.on_quotes(['A.NS'], [125.0], now=1) == []
+    assert alerts.on_quotes(['A.NS'], [126.0], now=2) == []
+
+
+def test_crossing_after_first_price_fires():
+    alerts = engine()
+    alerts.on_quotes(['A.NS'], [110.0], now=1)
+    fired = alerts.on_quotes(['A.NS'], [121.0], now=2)
+    assert [a['reason'] for a in fired] == ['Target Hit']
+    fired = alerts.on_quotes(['A.NS'], [79.0], now=3)
+    assert [a['reason'] for a in fired] == ['Stop Loss Hit']
+
+
+def test_target_added_below_price_fires_on_next_tick():
+    holdings = [dict(HOLDING, target=None)]
+    alerts = engine(lambda: holdings)
+    alerts.on_quotes(['A.NS'], [110.0], now=1)
+    holdings[0] = dict(HOLDING, target=105.0)
+    alerts.invalidate()
+    assert [a['reason'] for a in alerts.on_quotes(['A.NS'], [110.0], now=2)] == ['Target Hit']
+
+
+def test_index_loads_outside_the_engine_lock():
+    def load_holdings():
+        assert not alerts._lock.locked()
+        return [HOLDING]
+
+    alerts = engine(load_holdings)
+    alerts.on_quotes(['A.NS'], [110.0], now=1)
+    alerts.invalidate()
+    assert [a['reason'] for a in alerts.on_quotes(['A.NS'], [121.0], now=2)] == ['Target Hit']
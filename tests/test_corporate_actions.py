@@ -0,0 +1,58 @@
+import time
+
+import portfolio_tracker.service as ps
+
+
+def add_holding(service, portfolio_id, **fields):
+    service.storage.upsert_holdings([{'portfolio_id': portfolio_id, 'isin': 'INE001', 'stock_name': 'A',
+                                      'ticker': 'A.NS', 'quantity': 10, 'average_buy_price': 1000.0,
+                                      'basis_date': '2024-01-01', **fields}])
+
+
+def read_holding(service, portfolio_id):
+    return service.get_holdings(portfolio_id)['holdings'][0]
+
+
+def test_split_restates_holding(service, portfolio_id):
+    add_holding(service, portfolio_id, target=1500.0, stop_loss=800.0)
+    service.add_corporate_actions([{'ticker': 'A.NS', 'ex_date': '2024-06-01', 'action': 'split', 'ratio': 2}])
+    holding = read_holding(service, portfolio_id)
+    assert holding['quantity'] == 20
+    assert holding['average_buy_price'] == 500.0
+    assert holding['target'] == 750.0
+    assert holding['stop_loss'] == 400.0
+
+
+def test_settings_entered_after_split_are_not_restated_again(service, portfolio_id):
+    add_holding(service, portfolio_id, target=1500.0, stop_loss=800.0)
+    service.add_corporate_actions([{'ticker': 'A.NS', 'ex_date': '2024-06-01', 'action': 'split', 'ratio': 2}])
+    assert service.update_holding_settings(portfolio_id, 'INE001', target=800.0)['success']
+    holding = read_holding(service, portfolio_id)
+    assert holding['target'] == 800.0
+    # The rest of the holding keeps its post-split figures
+    assert holding['quantity'] == 20
+    assert holding['average_buy_price'] == 500.0
+    assert holding['stop_loss'] == 400.0
+
+
+def test_quantity_entered_after_split_keeps_restated_cost(service, portfolio_id):
+    add_holding(service, portfolio_id)
+    service.add_corporate_actions([{'ticker': 'A.NS', 'ex_date': '2024-06-01', 'action': 'split', 'ratio': 2}])
+    service.update_holding_settings(portfolio_id, 'INE001', quantity=30)
+    holding = read_holding(service, portfolio_id)
+    assert holding['quantity'] == 30
+    assert holding['average_buy_price'] == 500.0
+
+
+
+def test_local_error_in_an_actions_probe_closes_the_yahoo_circuit(service, portfolio_id, monkeypatch):
+    add_holding(service, portfolio_id)
+    def unreadable(ticker, actions):
+        raise ValueError("unexpected actions frame")
+    monkeypatch.setattr(ps, 'actions_from_yahoo', unreadable)
+    breaker = service._yahoo_breaker
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure()
+    breaker._opened_at = time.time() - breaker.reset_timeout - 1
+    assert service.sync_corporate_actions(portfolio_id)['success']
+    assert breaker.state == 'closed'
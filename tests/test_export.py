@@ -0,0 +1,80 @@
+import csv
+import io
+from datetime import datetime, timezone
+from functools import partial
+
+import pytest
+from fastapi.testclient import TestClient
+
+from portfolio_tracker.app import create_app
+from portfolio_tracker.export import EXPORT_COLUMNS
+from portfolio_tracker.tenants import RateLimiter
+
+KEYS = {'key-a': 'tenant-a', 'key-b': 'tenant-b'}
+HEADER = [name for name, _ in EXPORT_COLUMNS]
+
+
+@pytest.fixture
+def client(service, monkeypatch):
+    # Small batches, so exports span several chunks and row groups
+    monkeypatch.setattr(service, 'export_holdings', partial(service.export_holdings, batch_size=2))
+    return TestClient(create_app(service, api_keys=KEYS, rate_limiter=RateLimiter({})))
+
+
+def add_portfolio(service, tenant, name, count):
+    portfolio_id = service.create_portfolio(name, tenant)['portfolio']['id']
+    service.storage.upsert_holdings([{'portfolio_id': portfolio_id, 'isin': f'{name}{i:03d}', 'stock_name': f'{name} {i}',
+                                      'ticker': f'{name}{i}.NS', 'quantity': 10, 'average_buy_price': 100.0,
+                                      'target': 120.0} for i in range(count)])
+    service.storage.upsert_quotes([{'ticker': f'{name}{i}.NS', 'price': 100.0 + 10 * i, 'day_change_amount': 1.0,
+                                    'day_change_percent': 1.0, 'updated_at': datetime.now(timezone.utc).isoformat()}
+                                   for i in range(count)])
+    return portfolio_id
+
+
+def read_csv(response):
+    return list(csv.DictReader(io.StringIO(response.text)))
+
+
+def test_csv_export_has_the_fixed_header_and_evaluated_rows(client, service):
+    portfolio_id = add_portfolio(service, 'tenant-a', 'A', 5)
+    response = client.get(f'/api/portfolios/{portfolio_id}/export', headers={'X-API-Key': 'key-a'})
+    assert response.headers['content-type'].startswith('text/csv')
+    assert next(csv.reader(io.StringIO(response.text))) == HEADER
+    rows = read_csv(response)
+    assert [r['isin'] for r in rows] == [f'A{i:03d}' for i in range(5)]
+    assert [float(r['current_price']) for r in rows] == [100.0, 110.0, 120.0, 130.0, 140.0]
+    assert [r['state_reason'] for r in rows] == ['', '', 'Target Hit', 'Target Hit', 'Target Hit']
+    assert rows[0]['portfolio_id'] == portfolio_id
+
+
+def test_parquet_export_round_trips(client, service):
+    pq = pytest.importorskip('pyarrow.parquet')
+    portfolio_id = add_portfolio(service, 'tenant-a', 'A', 5)
+    response = client.get(f'/api/portfolios/{portfolio_id}/export', params={'format': 'parquet'},
+                          headers={'X-API-Key': 'key-a'})
+    parquet = pq.ParquetFile(io.BytesIO(response.content))
+    assert parquet.schema_arrow.names == HEADER
+    assert parquet.metadata.num_row_groups == 3  # One per batch of 2
+    table = parquet.read().to_pydict()
+    assert table['isin'] == [f'A{i:03d}' for i in range(5)]
+    assert table['current_price'] == [100.0, 110.0, 120.0, 130.0, 140.0]
+    assert table['quantity'] == [10.0] * 5
+
+
+def test_export_all_only_streams_the_tenants_portfolios(client, service):
+    a1 = add_portfolio(service, 'tenant-a', 'A', 3)
+    a2 = add_portfolio(service, 'tenant-a', 'B', 2)
+    add_portfolio(service, 'tenant-b', 'C', 4)
+    rows = read_csv(client.get('/api/export', headers={'X-API-Key': 'key-a'}))
+    assert sorted(r['isin'] for r in rows) == ['A000', 'A001', 'A002', 'B000', 'B001']
+    assert {r['portfolio_id'] for r in rows} == {a1, a2}
+    other = client.get(f'/api/portfolios/{a1}/export', headers={'X-API-Key': 'key-b'})
+    assert other.status_code == 404
+
+
+def test_unknown_format_is_rejected(client, service):
+    portfolio_id = add_portfolio(service, 'tenant-a', 'A', 1)
+    response = client.get(f'/api/portfolios/{portfolio_id}/export', params={'format': 'xlsx'},
+                          headers={'X-API-Key': 'key-a'})
+    assert response.status_code == 400
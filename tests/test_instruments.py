@@ -0,0 +1,76 @@
+import pytest
+
+from portfolio_tracker.instruments import InstrumentMaster, build_master, normalize_name, parse_bse, parse_nse
+
+NSE = """SYMBOL,NAME OF COMPANY, SERIES, DATE OF LISTING, PAID UP VALUE, MARKET LOT, ISIN NUMBER, FACE VALUE
+RELIANCE,Reliance Industries Limited,EQ,29-NOV-1995,10,1,INE002A01018,10
+LT,Larsen & Toubro Limited,EQ,23-JUN-2004,2,1,INE018A01030,2
+BAJFINANCE,Bajaj Finance Limited,EQ,06-SEP-2003,2,1,INE296A01024,2
+BAJAJFINSV,Bajaj Finserv Ltd.,EQ,26-MAY-2008,1,1,INE918I01026,1
+SMALLCO,Small Co Limited,BE,01-JAN-2010,10,1,INE999Z01011,10
+"""
+BSE = """Security Code,Issuer Name,Security Id,Security Name,Status,Group,Face Value,ISIN No,Instrument
+500325,RELIANCE INDUSTRIES LTD.,RELIANCE,RELIANCE INDUSTRIES LTD.,Active,A ,10.00,INE002A01018,Equity
+999999,SMALL CO LTD,SMALLCO,SMALL CO LTD,Active,X ,10.00,INE999Z01011,Equity
+500001,OLD CO LTD,OLDCO,OLD CO LTD,Delisted,Z ,10.00,INE000X01011,Equity
+"""
+
+
+@pytest.fixture
+def master():
+    return InstrumentMaster(parse_nse(NSE) + parse_bse(BSE))
+
+
+def test_names_are_normalized_without_legal_forms():
+    assert normalize_name('Larsen & Toubro Ltd.') == 'LARSEN TOUBRO'
+    assert normalize_name('The Reliance Industries Limited') == normalize_name('RELIANCE INDUSTRIES LTD')
+
+
+def test_isin_prefers_the_nse_listing(master):
+    assert master.resolve('INE002A01018')['ticker'] == 'RELIANCE.NS'
+    # Only trade-for-trade on NSE, still preferred to BSE
+    assert master.resolve(' ine999z01011 ')['ticker'] == 'SMALLCO.NS'
+
+
+def test_delisted_bse_rows_are_skipped(master):
+    assert master.resolve('INE000X01011') is None
+    assert len(master) == 5
+
+
+def test_unknown_isin_falls_back_to_name(master):
+    assert master.resolve('INE000000000', 'RELIANCE INDUSTRIES LTD')['ticker'] == 'RELIANCE.NS'
+    assert master.resolve('INE000000000') is None
+
+
+def test_fuzzy_name_tolerates_typos(master):
+    assert master.match_name('Larsen & Tubro Ltd')['ticker'] == 'LT.NS'
+
+
+def test_similar_companies_are_told_apart(master):
+    assert master.match_name('Bajaj Finance Ltd')['ticker'] == 'BAJFINANCE.NS'
+    assert master.match_name('BAJAJ FINSERV LIMITED')['ticker'] == 'BAJAJFINSV.NS'
+
+
+def test_ambiguous_or_distant_names_do_not_match(master):
+    # Equally close to Bajaj Finance and Bajaj Finserv, and below the threshold for both
+    assert master.match_name('Bajaj Fin') is None
+    assert master.match_name('Reliance') is None
+    assert master.match_name('Ltd') is None
+
+
+def test_threshold_is_adjustable(master):
+    assert master.match_name('Larsen T') is None
+    assert master.match_name('Larsen T', threshold=0.75)['ticker'] == 'LT.NS'
+
+
+def test_master_round_trips_through_its_file(tmp_path):
+    path = str(tmp_path / 'instruments.csv')
+    build_master(parse_nse(NSE), path)
+    assert InstrumentMaster.load(path).resolve('INE018A01030')['ticker'] == 'LT.NS'
+    assert len(InstrumentMaster.load(str(tmp_path / 'missing.csv'))) == 0
+
+
+def test_discovery_uses_the_master_before_yahoo(service, master, yahoo, monkeypatch):
+    service.instruments = master
+    monkeypatch.setattr(service, '_search_ticker', lambda isin, name: pytest.fail("searched Yahoo"))
+    assert service.auto_discover_ticker('INE000000000', 'Larsen and Toubro Limited') == 'LT.NS'
@@ -0,0 +1,83 @@
+SPLIT = {'ticker': 'A.NS', 'ex_date': '2025-06-01', 'action': 'split', 'ratio': 2}
+
+
+def trade(portfolio_id, trade_date, quantity, price, kind='buy'):
+    return {'portfolio_id': portfolio_id, 'isin': 'INE001', 'stock_name': 'A', 'ticker': 'A.NS',
+            'type': kind, 'trade_date': trade_date, 'quantity': quantity, 'price': price}
+
+
+def position(service, portfolio_id):
+    return service.get_positions(portfolio_id)['positions'][0]
+
+
+def holding(service, portfolio_id):
+    return service.storage.list_holdings(portfolio_id)[0]
+
+
+def test_split_between_trades_is_folded_in(service, portfolio_id):
+    service.add_corporate_actions([SPLIT])
+    service.add_transactions([trade(portfolio_id, '2025-01-10', 10, 100.0)])
+    service.add_transactions([trade(portfolio_id, '2025-07-10', 5, 50.0)])
+    assert position(service, portfolio_id)['quantity'] == 25
+    assert position(service, portfolio_id)['average_cost'] == 50.0
+    assert holding(service, portfolio_id)['quantity'] == 25
+    assert holding(service, portfolio_id)['average_buy_price'] == 50.0
+    # Restated up to the last trade, so reads do not apply the split again
+    assert service.get_holdings(portfolio_id)['holdings'][0]['quantity'] == 25
+
+
+def test_split_recorded_after_trades_replays_position(service, portfolio_id):
+    service.add_transactions([trade(portfolio_id, '2025-01-10', 10, 100.0),
+                              trade(portfolio_id, '2025-07-10', 5, 50.0)])
+    assert position(service, portfolio_id)['quantity'] == 15
+    service.add_corporate_actions([SPLIT])
+    assert position(service, portfolio_id)['quantity'] == 25
+    assert position(service, portfolio_id)['average_cost'] == 50.0
+
+
+def test_split_after_last_trade_restates_position(service, portfolio_id):
+    service.add_transactions([trade(portfolio_id, '2025-01-10', 10, 100.0)])
+    service.add_corporate_actions([SPLIT])
+    assert position(service, portfolio_id)['quantity'] == 20
+    assert position(service, portfolio_id)['average_cost'] == 50.0
+    assert service.get_holdings(portfolio_id)['holdings'][0]['quantity'] == 20
+
+
+def test_sell_after_split_realizes_against_restated_cost(service, portfolio_id):
+    service.add_corporate_actions([SPLIT])
+    service.add_transactions([trade(portfolio_id, '2025-01-10', 10, 100.0),
+                              trade(portfolio_id, '2025-07-10', 20, 60.0, kind='sell')])
+    summary = service.get_positions(portfolio_id, include_closed=True)['positions'][0]
+    assert summary['quantity'] == 0
+    assert summary['realized_pnl'] == 200.0
+
+
+def test_transaction_committed_behind_checkpoint_is_folded(service, portfolio_id):
+    storage = service.storage
+    # Another ISIN's trade, already folded, holds a higher id than the one committed late below
+    storage._conn.execute("INSERT INTO transactions (id, portfolio_id, isin, type, trade_date, quantity, price) "
+                          "VALUES (10, ?, 'INE002', 'buy', '2025-01-01', 1, 10)", (portfolio_id,))
+    service.get_positions(portfolio_id)
+    add = storage.add_transactions
+
+    def add_late(rows):
+        # The id was taken before the trade above, but its commit became visible after it
+        added = add(rows)
+        storage._conn.execute("UPDATE transactions SET id = 5 WHERE id = ?", (added[0]['id'],))
+        return [dict(added[0], id=5)]
+
+    storage.add_transactions = add_late
+    service.add_transactions([trade(portfolio_id, '2025-01-10', 10, 100.0)])
+    assert position(service, portfolio_id)['quantity'] == 10
+    assert holding(service, portfolio_id)['quantity'] == 10
+
+
+def test_backdated_trade_keeps_settings_entered_after_a_split(service, portfolio_id):
+    service.add_corporate_actions([SPLIT])
+    service.add_transactions([trade(portfolio_id, '2025-01-10', 10, 100.0)])
+    assert service.update_holding_settings(portfolio_id, 'INE001', target=150.0, stop_loss=40.0)['success']
+    service.add_transactions([trade(portfolio_id, '2025-03-01', 10, 100.0)])
+    restated = service.get_holdings(portfolio_id)['holdings'][0]
+    assert restated['quantity'] == 40
+    assert restated['target'] == 150.0
+    assert restated['stop_loss'] == 40.0
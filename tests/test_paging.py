@@ -0,0 +1,103 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from fakes import FakeSupabase
+from portfolio_tracker.app import create_app
+from portfolio_tracker.paging import HoldingsQuery, encode_cursor
+from portfolio_tracker.storage import SQLiteStorage, SupabaseStorage
+from portfolio_tracker.tenants import RateLimiter
+
+# Quantities repeat, so page boundaries fall inside runs of equal sort keys
+QUANTITIES = [3, 1, 2, 1, 3, 1, 2, None, 2, 1, None]
+
+
+def holdings():
+    return [{'isin': f'INE{i:03d}', 'quantity': q} for i, q in enumerate(QUANTITIES)]
+
+
+def walk(rows, limit, **params):
+    """Every page of a query, following next_cursor until it runs out."""
+    pages, cursor = [], None
+    while True:
+        page, total, cursor = HoldingsQuery(cursor=cursor, limit=limit, **params).apply(rows)
+        assert total == len(rows)
+        pages.append([h['isin'] for h in page])
+        if cursor is None:
+            return pages
+
+
+def expected(order):
+    # Holdings without a value sort as the smallest; the ISIN breaks ties
+    keyed = sorted(holdings(), key=lambda h: (h['quantity'] is not None, h['quantity'] or 0, h['isin']))
+    isins = [h['isin'] for h in keyed]
+    return isins if order == 'asc' else isins[::-1]
+
+
+@pytest.mark.parametrize('order', ['asc', 'desc'])
+@pytest.mark.parametrize('limit', [1, 2, 3, 4, 11, 20])
+def test_sorted_pages_cover_every_holding_once(order, limit):
+    pages = walk(holdings(), limit, sort='quantity', order=order)
+    assert [isin for page in pages for isin in page] == expected(order)
+    assert all(len(page) == limit for page in pages[:-1])
+
+
+@pytest.mark.parametrize('order', ['asc', 'desc'])
+def test_unsorted_pages_follow_isin_order(order):
+    isins = sorted(h['isin'] for h in holdings())
+    pages = walk(holdings(), 4, order=order)
+    assert [isin for page in pages for isin in page] == (isins if order == 'asc' else isins[::-1])
+
+
+def test_cursor_skips_rows_that_moved_behind_it():
+    rows = holdings()
+    page, _, cursor = HoldingsQuery(sort='quantity', order='asc', limit=3).apply(rows)
+    seen = {h['isin'] for h in page}
+    rows[0]['quantity'] = 0  # INE000 moves behind the cursor between requests
+    page, _, _ = HoldingsQuery(sort='quantity', order='asc', cursor=cursor, limit=100).apply(rows)
+    later = {h['isin'] for h in page}
+    assert seen.isdisjoint(later)
+    assert 'INE000' not in later
+
+
+def test_cursor_of_another_sort_is_rejected():
+    with pytest.raises(ValueError):
+        HoldingsQuery(sort='stock_name', cursor=encode_cursor((True, 1.0, 'INE001')))
+    with pytest.raises(ValueError):
+        HoldingsQuery(sort='quantity', cursor='not-a-cursor')
+
+
+def test_cursor_round_trips_through_the_api(service, portfolio_id):
+    service.storage.upsert_holdings([dict(h, portfolio_id=portfolio_id, stock_name=h['isin'], quantity=h['quantity'] or 0,
+                                          average_buy_price=100.0) for h in holdings()])
+    client = TestClient(create_app(service, api_keys={}, rate_limiter=RateLimiter({})))
+    isins, params = [], {'portfolio_id': portfolio_id, 'sort': 'quantity', 'order': 'asc', 'limit': 3}
+    while True:
+        body = client.get('/api/holdings', params=params).json()
+        isins += [h['isin'] for h in body['holdings']]
+        if body['next_cursor'] is None:
+            break
+        params['cursor'] = body['next_cursor']
+    assert sorted(isins) == sorted(h['isin'] for h in holdings())
+    assert len(isins) == len(set(isins))
+    assert client.get('/api/holdings', params=dict(params, cursor='x')).status_code == 400
+
+
+@pytest.fixture(params=['sqlite', 'supabase'])
+def storage(request):
+    if request.param == 'sqlite':
+        return SQLiteStorage(':memory:')
+    return SupabaseStorage(FakeSupabase())
+
+
+def test_storage_pages_holdings_by_isin(storage):
+    portfolio_id = storage.create_portfolio('Test')['id']
+    storage.upsert_holdings([{'portfolio_id': portfolio_id, 'isin': f'INE{i:03d}', 'stock_name': 'A', 'quantity': 1,
+                              'average_buy_price': 1.0} for i in (4, 0, 3, 1, 2)])
+    pages, after = [], None
+    while True:
+        page = storage.list_holdings_page(portfolio_id, after, 2)
+        if not page:
+            break
+        pages.append([h['isin'] for h in page])
+        after = page[-1]['isin']
+    assert pages == [['INE000', 'INE001'], ['INE002', 'INE003'], ['INE004']]
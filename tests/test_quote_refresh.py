@@ -0,0 +1,18 @@
+from datetime import datetime, timezone
+
+
+def add_holding(service, portfolio_id):
+    service.storage.upsert_holdings([{'portfolio_id': portfolio_id, 'isin': 'INE001', 'stock_name': 'A',
+                                      'ticker': 'A.NS', 'quantity': 10, 'average_buy_price': 100.0}])
+
+
+def test_blocked_ticker_shows_its_stored_quote(service, portfolio_id, yahoo, monkeypatch):
+    add_holding(service, portfolio_id)
+    service.storage.upsert_quotes([{'ticker': 'A.NS', 'price': 123.0, 'day_change_amount': 1.0,
+                                    'day_change_percent': 0.8, 'updated_at': datetime.now(timezone.utc).isoformat()}])
+    service._quote_failures.record_failure('A.NS', datetime.now(timezone.utc).timestamp())
+    downloads = []
+    monkeypatch.setattr(yahoo, 'download', lambda tickers, **kwargs: downloads.append(tickers))
+    holding = service.get_holdings(portfolio_id)['holdings'][0]
+    assert holding['current_price'] == 123.0
+    assert downloads == []  # Served from storage, the refetch stays backed off
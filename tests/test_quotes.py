@@ -0,0 +1,79 @@
+import sys
+import threading
+
+import numpy as np
+import pytest
+
+from portfolio_tracker.quotes import QuoteStore
+
+
+@pytest.fixture
+def fast_switching():
+    # Switch threads as often as possible, so unguarded slot assignment and growth interleave
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    yield
+    sys.setswitchinterval(interval)
+
+
+def test_concurrent_update_many_keeps_every_ticker(fast_switching):
+    for _ in range(20):
+        store = QuoteStore(capacity=4)
+        threads, errors = 8, []
+        batches = [[f"T{t}-{i}.NS" for i in range(512)] for t in range(threads)]
+        start = threading.Barrier(threads)
+
+        def write(tickers):
+            try:
+                start.wait()
+                for i in range(0, len(tickers), 64):
+                    chunk = tickers[i:i + 64]
+                    prices = np.arange(i, i + len(chunk), dtype=float)
+                    store.update_many(chunk, prices, prices, prices, 1.0)
+            except Exception as e:  # A worker's exception is otherwise lost
+                errors.append(e)
+
+        workers = [threading.Thread(target=write, args=(batch,)) for batch in batches]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        assert not errors
+        assert len(store) == threads * 512
+        for tickers in batches:
+            for i, ticker in enumerate(tickers):
+                assert store.get(ticker)['price'] == i
+
+
+def test_lookup_returns_nan_for_unknown_tickers():
+    store = QuoteStore()
+    store.update('A.NS', 10.0, 1.0, 10.0, 5.0)
+    result = store.lookup(['A.NS', 'B.NS'])
+    assert result[0, 0] == 10.0
+    assert np.isnan(result[:, 1]).all()
+
+
+def test_repeated_lookup_sees_new_prices_and_tickers():
+    store = QuoteStore(capacity=2)
+    store.update('A.NS', 10.0, 1.0, 10.0, 5.0)
+    assert np.isnan(store.lookup(['A.NS', 'B.NS'])[0, 1])
+    store.update('B.NS', 20.0, 2.0, 10.0, 5.0)
+    assert store.lookup(['A.NS', 'B.NS'])[0].tolist() == [10.0, 20.0]
+    # Positions kept from the last lookup still point at the right slots after growth
+    store.update_many(['C.NS', 'A.NS'], [30.0, 11.0], [0.0, 0.0], [0.0, 0.0], 6.0)
+    assert store.lookup(['A.NS', 'B.NS'])[0].tolist() == [11.0, 20.0]
+
+
+def test_sell_rules_apply_in_priority_order(service):
+    holdings = [
+        {'current_price': 150.0, 'average_buy_price': 100.0, 'target': 140.0},  # Target beats returns
+        {'current_price': 140.0, 'average_buy_price': 100.0, 'target': 200.0},
+        {'current_price': 80.0, 'average_buy_price': 100.0, 'stop_loss': 90.0},
+        {'current_price': 95.0, 'average_buy_price': 100.0, 'stop_loss': 0},
+        {'current_price': float('nan'), 'average_buy_price': 100.0, 'target': 1.0},
+        {'average_buy_price': 100.0, 'target': 1.0},
+    ]
+    service._evaluate_states(holdings)
+    assert [h.get('state_reason') for h in holdings] == ["Target Hit", "Returns > 30%", "Stop Loss Hit", None, None, None]
+    assert [h.get('total_return_percent') for h in holdings] == [50.0, 40.0, -20.0, -5.0, None, None]
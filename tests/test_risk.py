@@ -0,0 +1,118 @@
+import math
+from datetime import date
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from portfolio_tracker.risk import TRADING_DAYS, historical_var, risk_report
+
+BENCHMARK = '^NSEI'
+
+
+def closes_from_returns(returns):
+    """(dates x tickers) closes starting at 100 that move by the given daily returns."""
+    frame = pd.DataFrame(returns)
+    closes = 100 * (1 + frame).cumprod()
+    start = pd.DataFrame([[100.0] * len(frame.columns)], columns=frame.columns)
+    closes = pd.concat([start, closes], ignore_index=True)
+    closes.index = pd.bdate_range('2026-01-01', periods=len(closes)).strftime('%Y-%m-%d')
+    return closes
+
+
+@pytest.fixture
+def market():
+    rng = np.random.default_rng(7)
+    bench = rng.normal(0, 0.01, 120)
+    return {BENCHMARK: bench, 'LEV.NS': 2 * bench, 'IND.NS': rng.normal(0, 0.02, 120)}
+
+
+def test_levered_series_has_twice_the_beta_and_volatility(market):
+    report = risk_report(closes_from_returns(market), {'LEV.NS': 1000.0}, BENCHMARK, 60)
+    lev = report['tickers']['LEV.NS']
+    assert lev['beta'] == pytest.approx(2.0)
+    assert lev['volatility'] == pytest.approx(np.std(market['LEV.NS'], ddof=1) * math.sqrt(TRADING_DAYS))
+    assert report['portfolio']['beta'] == pytest.approx(2.0)
+    assert report['portfolio']['volatility'] == pytest.approx(lev['volatility'])
+
+
+def test_portfolio_var_uses_todays_weights(market):
+    values = {'LEV.NS': 3000.0, 'IND.NS': 1000.0}
+    report = risk_report(closes_from_returns(market), values, BENCHMARK, 60)
+    portfolio = 0.75 * market['LEV.NS'] + 0.25 * market['IND.NS']
+    expected = -np.quantile(portfolio, 0.05)
+    assert report['portfolio']['value'] == 4000.0
+    assert report['portfolio']['var']['95']['percent'] == pytest.approx(expected * 100)
+    assert report['portfolio']['var']['95']['amount'] == pytest.approx(expected * 4000)
+    assert report['portfolio']['var']['99']['percent'] >= report['portfolio']['var']['95']['percent']
+    assert report['tickers']['LEV.NS']['weight'] == 0.75
+
+
+def test_correlation_matrix_covers_usable_tickers(market):
+    report = risk_report(closes_from_returns(market), {'LEV.NS': 1.0, 'IND.NS': 1.0}, BENCHMARK, 60)
+    assert report['correlation']['tickers'] == ['LEV.NS', 'IND.NS']
+    matrix = report['correlation']['matrix']
+    assert matrix[0][0] == matrix[1][1] == 1.0
+    assert matrix[0][1] == pytest.approx(np.corrcoef(market['LEV.NS'], market['IND.NS'])[0, 1], abs=1e-4)
+
+
+def test_short_history_is_reported_without_figures(market):
+    closes = closes_from_returns(market)
+    closes.iloc[:100, closes.columns.get_loc('IND.NS')] = np.nan  # Listed 20 days ago
+    report = risk_report(closes, {'LEV.NS': 1.0, 'IND.NS': 1.0}, BENCHMARK, 60)
+    assert report['insufficient_history'] == ['IND.NS']
+    assert report['tickers']['IND.NS']['observations'] == 20
+    assert report['tickers']['IND.NS']['volatility'] is None
+    assert report['tickers']['IND.NS']['beta'] is None
+    assert report['correlation']['tickers'] == ['LEV.NS']
+
+
+def test_var_is_a_positive_loss():
+    assert historical_var(np.array([0.01, 0.02, 0.03]), 0.95) == 0.0
+    assert historical_var(np.linspace(-0.1, 0.1, 201), 0.95) == pytest.approx(0.09)
+    assert math.isnan(historical_var(np.array([np.nan]), 0.95))
+
+
+class BarsFeed:
+    """yf.download stand-in serving adjusted closes from a (dates x tickers) frame up to `today`."""
+
+    def __init__(self, closes, today):
+        self.closes = closes
+        self.today = today
+        self.starts = []
+
+    def download(self, tickers, start=None, **kwargs):
+        self.starts.append(start)
+        frame = self.closes.loc[start:self.today, tickers.split()]
+        frame.index = pd.DatetimeIndex(frame.index)
+        frame.columns = pd.MultiIndex.from_product([frame.columns.str.upper(), ['Close']])
+        return frame
+
+
+def test_bars_are_synced_incrementally_and_readjusted_after_a_split(service, yahoo, monkeypatch):
+    days = pd.bdate_range('2026-01-01', '2026-03-31').strftime('%Y-%m-%d')
+    raw = pd.DataFrame({'A.NS': np.linspace(200, 260, len(days)), 'B.NS': np.linspace(50, 60, len(days))}, index=days)
+    feed = BarsFeed(raw, '2026-02-13')
+    monkeypatch.setattr(yahoo, 'download', feed.download)
+    service._sync_bars(['A.NS', 'B.NS'], date(2026, 2, 13))
+    assert service._closes.loc['2026-02-13', 'A.NS'] == raw.loc['2026-02-13', 'A.NS']
+
+    # A 2:1 split of A.NS on 2026-02-16: Yahoo now reports its whole history halved
+    adjusted = raw.copy()
+    adjusted['A.NS'] /= 2
+    feed.closes, feed.today = adjusted, '2026-02-20'
+    feed.starts.clear()
+    service._sync_bars(['A.NS', 'B.NS'], date(2026, 2, 20))
+
+    assert feed.starts[0] == '2026-02-13'  # Only the days from the last stored close
+    assert feed.starts[1] < '2026-01-01'  # Then the whole window of the re-adjusted ticker
+    window = adjusted.loc[:'2026-02-20']
+    pd.testing.assert_series_equal(service._closes['A.NS'].loc[window.index], window['A.NS'], check_names=False)
+    pd.testing.assert_series_equal(service._closes['B.NS'].loc[window.index], window['B.NS'], check_names=False)
+    stored = {(r['ticker'], str(r['date'])[:10]): r['close'] for r in service.storage.list_daily_bars(['A.NS'], '2026-01-01')}
+    assert stored[('A.NS', '2026-01-01')] == pytest.approx(adjusted.loc['2026-01-01', 'A.NS'])
+
+    # Synced once per session
+    feed.starts.clear()
+    service._sync_bars(['A.NS', 'B.NS'], date(2026, 2, 20))
+    assert feed.starts == []
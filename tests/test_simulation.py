@@ -0,0 +1,33 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from portfolio_tracker.app import create_app
+from portfolio_tracker.simulation import Snapshot, run_scenarios
+from portfolio_tracker.tenants import RateLimiter
+
+HOLDINGS = [{'isin': 'INE001', 'ticker': 'A.NS', 'quantity': 10, 'average_buy_price': 100.0,
+             'current_price': 150.0, 'target': 160.0, 'stop_loss': 120.0}]
+
+
+def test_shocks_move_value_and_hit_levels():
+    crash, rally = run_scenarios(Snapshot(HOLDINGS), [{'shock': -0.2}, {'shocks': {'A.NS': 0.1}}])
+    assert crash['value'] == pytest.approx(1200.0)
+    assert crash['stop_losses'] == ['INE001']
+    assert rally['targets'] == ['INE001']
+
+
+def test_total_loss_is_allowed():
+    assert run_scenarios(Snapshot(HOLDINGS), [{'shock': -1}])[0]['value'] == 0
+
+
+@pytest.mark.parametrize('scenario', [{'shock': -2}, {'shocks': {'INE001': -1.5}}])
+def test_shock_below_total_loss_is_rejected(scenario):
+    with pytest.raises(ValueError):
+        run_scenarios(Snapshot(HOLDINGS), [scenario])
+
+
+def test_simulate_endpoint_rejects_negative_prices(service, portfolio_id):
+    client = TestClient(create_app(service, api_keys={}, rate_limiter=RateLimiter({})))
+    response = client.post('/api/simulate', json={'portfolio_id': portfolio_id, 'scenarios': [{'shock': -2}]})
+    assert response.status_code == 400
+    assert 'at least -1' in response.json()['detail']
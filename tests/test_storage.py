@@ -0,0 +1,61 @@
+import pytest
+
+import portfolio_tracker.storage as storage_module
+from fakes import FakeSupabase
+from portfolio_tracker.storage import CachedStorage, SQLiteStorage, SupabaseStorage
+
+ROW_LIMIT = 10
+
+
+@pytest.fixture
+def supabase(monkeypatch):
+    # PostgREST cuts every response off at its row limit; pages must not exceed it
+    monkeypatch.setattr(storage_module, 'PAGE_SIZE', ROW_LIMIT)
+    return SupabaseStorage(FakeSupabase(max_rows=ROW_LIMIT))
+
+
+def test_transactions_are_read_past_the_row_limit(supabase):
+    supabase.add_transactions([{'portfolio_id': 'p', 'isin': f'INE{i:03d}', 'type': 'buy', 'trade_date': '2025-01-01',
+                                'quantity': 1, 'price': 1} for i in range(25)])
+    assert [t['id'] for t in supabase.list_transactions('p')] == list(range(1, 26))
+    assert len(supabase.list_transactions('p', after_id=5)) == 20
+
+
+def test_position_snapshots_are_read_past_the_row_limit(supabase):
+    supabase.upsert_position_snapshots([{'portfolio_id': 'p', 'isin': f'INE{i:03d}', 'lots': []} for i in range(25)])
+    assert len(supabase.list_position_snapshots('p')) == 25
+
+
+def test_holdings_of_every_portfolio_are_read_past_the_row_limit(supabase):
+    supabase.upsert_holdings([{'portfolio_id': f'p{i % 3}', 'isin': f'INE{i:03d}', 'quantity': 1} for i in range(40)])
+    assert len(supabase.list_holdings()) == 40
+    assert len(supabase.list_holdings('p0')) == 14
+
+
+
+def write_during_miss(cached, write):
+    """Makes the next backend read run `write` after it has loaded its rows, as a racing request would."""
+    load = cached.backend.list_holdings
+
+    def racing_load(portfolio_id=None):
+        rows = load(portfolio_id)
+        cached.backend.list_holdings = load
+        write()
+        return rows
+    cached.backend.list_holdings = racing_load
+
+
+@pytest.mark.parametrize('write', [
+    lambda cached, pid: cached.delete_holdings(pid, ['INE001']),
+    lambda cached, pid: cached.update_holding(pid, 'INE001', {'target': 150.0}),
+    # A write made elsewhere, reported by the change feed
+    lambda cached, pid: (cached.backend.update_holding(pid, 'INE001', {'target': 150.0}),
+                         cached.apply_change(pid, {'isin': 'INE001', 'target': 150.0})),
+])
+def test_miss_racing_a_write_is_not_cached(write):
+    cached = CachedStorage(SQLiteStorage(':memory:'), ttl=3600)
+    pid = cached.backend.create_portfolio('Test')['id']
+    cached.backend.upsert_holdings([{'portfolio_id': pid, 'isin': 'INE001', 'stock_name': 'A', 'quantity': 10}])
+    write_during_miss(cached, lambda: write(cached, pid))
+    cached.list_holdings(pid)  # Returns the rows read before the write
+    assert cached.list_holdings(pid) == cached.backend.list_holdings(pid)
@@ -0,0 +1,66 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from portfolio_tracker.app import create_app
+from portfolio_tracker.tenants import RateLimiter
+
+KEYS = {'key-a': 'tenant-a', 'key-b': 'tenant-b', 'key-admin': 'ops'}
+SPLIT = {'ticker': 'A.NS', 'ex_date': '2999-01-01', 'action': 'split', 'ratio': 2}
+
+
+@pytest.fixture
+def client(service):
+    app = create_app(service, api_keys=KEYS, rate_limiter=RateLimiter({}), admin_tenants={'ops'})
+    return TestClient(app)
+
+
+def as_tenant(key):
+    return {'X-API-Key': key}
+
+
+@pytest.fixture
+def portfolio_a(client):
+    portfolio = client.post('/api/portfolios', json={'name': 'A'}, headers=as_tenant('key-a')).json()['portfolio']
+    client.post('/api/holdings/add', headers=as_tenant('key-a'), json={
+        'portfolio_id': portfolio['id'], 'isin': 'INE001', 'stock_name': 'A', 'quantity': 10,
+        'average_buy_price': 100, 'ticker': 'A.NS'})
+    return portfolio['id']
+
+
+def test_missing_key_is_rejected(client):
+    assert client.get('/api/portfolios').status_code == 401
+
+
+def test_holdings_are_scoped_to_tenant(client, portfolio_a):
+    own = client.get('/api/holdings', params={'portfolio_id': portfolio_a, 'refresh': False}, headers=as_tenant('key-a'))
+    assert len(own.json()['holdings']) == 1
+    other = client.get('/api/holdings', params={'portfolio_id': portfolio_a, 'refresh': False}, headers=as_tenant('key-b'))
+    assert other.json()['holdings'] == []
+    assert client.get('/api/portfolios', headers=as_tenant('key-b')).json() == []
+
+
+def test_export_is_scoped_to_tenant(client, portfolio_a):
+    response = client.get(f'/api/portfolios/{portfolio_a}/export', headers=as_tenant('key-b'))
+    assert response.status_code == 404
+
+
+def test_corporate_actions_need_an_admin_tenant(client, portfolio_a):
+    response = client.post('/api/corporate-actions', json=[SPLIT], headers=as_tenant('key-b'))
+    assert response.status_code == 403
+    assert client.get('/api/corporate-actions', params={'ticker': 'A.NS'}, headers=as_tenant('key-b')).json() == []
+    response = client.post('/api/corporate-actions', json=[SPLIT], headers=as_tenant('key-admin'))
+    assert response.json() == {'success': True, 'count': 1}
+
+
+def test_single_tenant_may_post_corporate_actions(service):
+    client = TestClient(create_app(service, api_keys={}, rate_limiter=RateLimiter({})))
+    assert client.post('/api/corporate-actions', json=[SPLIT]).json()['success']
+
+
+def test_metrics_need_an_admin_tenant(client, service):
+    service._record_quote_results(['A.NS'], [])
+    assert client.get('/metrics').status_code == 401
+    assert client.get('/metrics', headers=as_tenant('key-a')).status_code == 403
+    response = client.get('/metrics', headers=as_tenant('key-admin'))
+    assert 'portfolio_ticker_errors_total{kind="no_data"} 1' in response.text
+    assert 'A.NS' not in response.text
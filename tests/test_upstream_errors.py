@@ -0,0 +1,60 @@
+import time
+
+import pytest
+
+from portfolio_tracker import service as ps
+
+
+def failing_download(error):
+    def download(tickers, **kwargs):
+        raise error
+    return download
+
+
+def open_for_probe(breaker):
+    """Opens the circuit with its cooldown elapsed, so the next allowed call is the half-open probe."""
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure()
+    breaker._opened_at = time.time() - breaker.reset_timeout - 1
+
+
+def test_local_error_does_not_count_against_the_yahoo_circuit(service, yahoo, monkeypatch):
+    monkeypatch.setattr(yahoo, 'download', failing_download(ValueError("bad frame")))
+    quotes, answered = service._fetch_quote_chunk(['A.NS'], retries=0)
+    assert quotes.empty and answered == []
+    assert service._yahoo_breaker._failures == 0
+
+
+def test_local_error_in_a_probe_closes_the_yahoo_circuit(service, yahoo, monkeypatch):
+    monkeypatch.setattr(yahoo, 'download', failing_download(ValueError("bad frame")))
+    open_for_probe(service._yahoo_breaker)
+    service._fetch_quote_chunk(['A.NS'], retries=0)
+    assert service._yahoo_breaker.state == 'closed'
+    assert service._yahoo_breaker.allow()
+
+
+def test_network_error_counts_against_the_yahoo_circuit(service, yahoo, monkeypatch):
+    monkeypatch.setattr(yahoo, 'download', failing_download(ConnectionError("reset")))
+    service._fetch_quote_chunk(['A.NS'], retries=0)
+    assert service._yahoo_breaker._failures == 1
+
+
+@pytest.mark.parametrize('valuation_ttl', [60, 10 * 24 * 3600])
+def test_statements_backoff_is_bounded_independently_of_the_valuation_ttl(monkeypatch, valuation_ttl):
+    monkeypatch.setattr(ps, 'FUNDAMENTAL_VALUATION_TTL', valuation_ttl)
+    service = ps.PortfolioService()
+    assert service._valuation_failures.max_delay == valuation_ttl
+    assert service._statements_failures.max_delay == ps.FUNDAMENTAL_STATEMENTS_BACKOFF_MAX
+
+
+def test_local_error_in_daily_bars_does_not_count_against_the_yahoo_circuit(service, yahoo, monkeypatch):
+    monkeypatch.setattr(yahoo, 'download', failing_download(KeyError('Close')))
+    assert service._download_closes(['A.NS'], '2026-01-01') is None
+    assert service._yahoo_breaker._failures == 0
+
+
+def test_local_error_in_a_daily_bars_probe_closes_the_yahoo_circuit(service, yahoo, monkeypatch):
+    monkeypatch.setattr(yahoo, 'download', failing_download(KeyError('Close')))
+    open_for_probe(service._yahoo_breaker)
+    service._download_closes(['A.NS'], '2026-01-01')
+    assert service._yahoo_breaker.state == 'closed'